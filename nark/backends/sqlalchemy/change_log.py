@@ -0,0 +1,187 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""``nark`` change log, for incremental sync (see store.changes_since)."""
+
+from gettext import gettext as _
+
+from collections import namedtuple
+
+from sqlalchemy import and_, bindparam, case, exists, func, select
+from sqlalchemy.orm import aliased
+
+from .objects import changes
+
+__all__ = (
+    'Change',
+    'ChangeLog',
+)
+
+
+# - revision: The change's revision number, which only ever increases.
+# - table_name: The changed item's table: 'categories', 'activities',
+#   'tags', or 'facts'.
+# - item_id: The changed item's ID (its pk).
+# - op: 'insert', 'update', or 'delete' (which includes marking it deleted).
+Change = namedtuple('Change', ('revision', 'table_name', 'item_id', 'op'))
+
+
+class ChangeLog(object):
+    """Reads the changes table, which the item table triggers write.
+
+    A client remembers the revision of the last change it applied, and then
+    asks for the changes since, to apply just those. (The changes only say
+    which items changed; the client then fetches each item to get its data.)
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._has_change_log = None
+
+    @property
+    def has_change_log(self):
+        """True if the store has the changes table (see migration 009)."""
+        if self._has_change_log is None:
+            connection = self.store.session.connection()
+            self._has_change_log = (
+                connection.dialect.name == 'sqlite'
+                and connection.dialect.has_table(connection, 'changes')
+            )
+        return self._has_change_log
+
+    def require_change_log(self):
+        if not self.has_change_log:
+            raise NotImplementedError(_(
+                'The store has no change log. Please upgrade the database.'
+            ))
+
+    def flush(self):
+        # Session.execute does not autoflush, but the client expects to see
+        # its own pending writes (e.g., when it reads the revision after).
+        session = self.store.session
+        if session.autoflush:
+            session.flush()
+
+    # ***
+
+    @property
+    def revision(self):
+        """The latest change's revision (or 0 if nothing has changed yet)."""
+        self.require_change_log()
+        self.flush()
+        # (lb): Ask sqlite_sequence, and not MAX(revision), which would
+        # go back in time if the latest changes were pruned.
+        revision = self.store.session.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).scalar()
+        return revision or 0
+
+    def changes_since(self, revision=0, compact=True, batch_size=1000):
+        """
+        Yield each Change after the revision, oldest first.
+
+        Args:
+            revision (int): The revision of the last change the client has seen,
+                or 0 for all the changes (that have not been pruned).
+            compact (bool): If True, yield just each item's latest change, and
+                not every change to it, i.e., as many Changes as items changed.
+            batch_size (int): How many changes to read per query. The changes
+                are read in batches, by revision, so the client can write to the
+                store while iterating. (Any item it changes is yielded again, at
+                its new revision.)
+        """
+        self.require_change_log()
+        self.flush()
+        statement = self.changes_since_statement(compact)
+        session = self.store.session
+        while True:
+            rows = session.execute(statement, {
+                'revision': revision, 'batch_size': batch_size,
+            }).fetchall()
+            for row in rows:
+                yield Change(*row)
+            if len(rows) < batch_size:
+                break
+            revision = rows[-1].revision
+
+    def changes_since_statement(self, compact):
+        since = bindparam('revision')
+        criteria = [changes.c.revision > since]
+        op = changes.c.op
+        if compact:
+            # Skip any change that has a later change to the same item.
+            later = aliased(changes)
+            criteria.append(~exists().where(and_(
+                later.c.table_name == changes.c.table_name,
+                later.c.item_id == changes.c.item_id,
+                later.c.revision > changes.c.revision,
+            )))
+            # And report an item that was added since (and not deleted after)
+            # as an 'insert', and not as its latest 'update' (e.g., after a
+            # new Fact is inserted, its Tags are added, which is an 'update').
+            earlier = aliased(changes)
+            inserted = exists().where(and_(
+                earlier.c.table_name == changes.c.table_name,
+                earlier.c.item_id == changes.c.item_id,
+                earlier.c.revision > since,
+                earlier.c.op == 'insert',
+            ))
+            op = case(
+                [(and_(changes.c.op == 'update', inserted), 'insert')],
+                else_=changes.c.op,
+            )
+        return select([
+            changes.c.revision,
+            changes.c.table_name,
+            changes.c.item_id,
+            op.label('op'),
+        ]).where(and_(*criteria)).order_by(
+            changes.c.revision,
+        ).limit(bindparam('batch_size'))
+
+    def prune(self, revision):
+        """
+        Delete the changes through the revision, and commit.
+
+        Call this once every client has seen the revision. A client that
+        has not (i.e., whose revision is older than the oldest change) must
+        then re-read everything (see oldest_revision).
+        """
+        self.require_change_log()
+        session = self.store.session
+        session.execute(
+            changes.delete().where(changes.c.revision <= bindparam('revision')),
+            {'revision': revision},
+        )
+        session.commit()
+
+    @property
+    def oldest_revision(self):
+        """The revision before the oldest change that's still in the log.
+
+        A client whose revision is older than this has missed some pruned
+        changes, and must re-read everything.
+        """
+        self.require_change_log()
+        self.flush()
+        oldest = self.store.session.execute(
+            select([func.min(changes.c.revision)])
+        ).scalar()
+        if oldest is None:
+            return self.revision
+        return oldest - 1
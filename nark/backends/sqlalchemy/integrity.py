@@ -0,0 +1,274 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""``nark`` whole-store integrity checks."""
+
+from gettext import gettext as _
+
+import heapq
+from collections import namedtuple
+
+from sqlalchemy import Integer, and_, bindparam, func, or_, select
+from sqlalchemy.orm import aliased
+
+from ...managers.query_terms import QueryTerms
+from .objects import activities, categories, fact_tags, fact_time_epoch, facts, tags
+
+__all__ = (
+    'IntegrityChecker',
+    'IntegrityIssue',
+)
+
+
+# - kind: The problem, one of the IntegrityChecker.ISSUE_KINDS.
+# - pks: The IDs of the items involved. See ISSUE_KINDS for what each is.
+# - message: A description of the problem, for the user.
+IntegrityIssue = namedtuple('IntegrityIssue', ('kind', 'pks', 'message'))
+
+
+class IntegrityChecker(object):
+    """Finds the problems in a store that the item managers would not allow.
+
+    E.g., Facts that overlap, or more than one active Fact. Each check is one
+    query, which uses the indexes (and, for overlaps, one ordered scan of the
+    Facts, which keeps the ones still open in a heap), so the whole store is
+    checked in O(n log n) time, and the issues are yielded as they're found.
+    """
+
+    ISSUE_KINDS = {
+        # pks: (earlier Fact ID, later Fact ID)
+        'overlap': _('Facts overlap'),
+        # pks: (active Fact ID, ...)
+        'endless': _('More than one active Fact'),
+        # pks: (fact_id, tag_id)
+        'orphan_fact_tag': _('Fact Tag references a missing Fact or Tag'),
+        # pks: (Fact ID, activity_id)
+        'orphan_fact': _('Fact references a missing Activity'),
+        # pks: (Activity ID, category_id)
+        'orphan_activity': _('Activity references a missing Category'),
+        # pks: (Fact ID, split_from_id)
+        'split_from': _('Fact has a broken split_from chain'),
+    }
+
+    def __init__(self, store):
+        self.store = store
+
+    def check(self, parallel_chunks=0):
+        """
+        Yield an IntegrityIssue for each problem found in the store.
+
+        Args:
+            parallel_chunks (int): If more than 1, and if the store is a SQLite
+                file (see gather_parallel_store_eligible), split the overlap
+                check into this many time chunks, and check them in parallel,
+                on their own read-only connections.
+        """
+        yield from self.check_overlaps(parallel_chunks)
+        yield from self.check_endless()
+        yield from self.check_orphans()
+        yield from self.check_split_from()
+
+    # ***
+
+    def check_overlaps(self, parallel_chunks=0):
+        """Yield an 'overlap' issue for each pair of undeleted Facts that overlap.
+
+        The Facts are walked in order (by start, end, and ID), keeping the ones
+        still open in a heap, by end. As each Fact is reached, the Facts that end
+        by its start are dropped from the heap, and any left overlap it. So each
+        Fact is pushed and popped just once. The active Fact is considered to
+        end now.
+        """
+        store = self.store
+        session = store.session
+        if session.autoflush:
+            session.flush()
+        now_epoch = fact_time_epoch(store.now)
+        span_end = func.coalesce(facts.c.end_epoch, bindparam('now_epoch', now_epoch))
+
+        def _check_overlaps():
+            statement = _overlaps_statement()
+            for rows in _fetch_chunks(statement):
+                yield from _sweep_overlaps(rows)
+
+        def _overlaps_statement():
+            chunk_since = bindparam('chunk_since', type_=facts.c.start_time.type)
+            chunk_until = bindparam('chunk_until', type_=facts.c.start_time.type)
+            # Each chunk checks the Facts that start within it, but it also reads
+            # the earlier Facts that end within it, which might overlap them.
+            return select([
+                facts.c.id,
+                facts.c.start_time,
+                facts.c.end_time,
+                facts.c.start_epoch,
+                span_end.label('span_end'),
+                (facts.c.start_time >= chunk_since).label('in_chunk'),
+            ]).where(and_(
+                facts.c.deleted == False,  # noqa: E712
+                facts.c.start_time < chunk_until,
+                or_(
+                    facts.c.end_time > chunk_since,
+                    facts.c.end_time == None,  # noqa: E711
+                ),
+            )).order_by(facts.c.start_time, facts.c.end_time, facts.c.id)
+
+        def _fetch_chunks(statement):
+            params = {'now_epoch': now_epoch}
+            chunks = None
+            if parallel_chunks and parallel_chunks > 1:
+                if store.facts.gather_parallel_store_eligible():
+                    qt = QueryTerms(parallel_chunks=parallel_chunks)
+                    chunks = store.facts.gather_parallel_chunks(qt)
+            if chunks is None:
+                chunk = {
+                    'chunk_since': store.facts.CHUNK_SINCE_MIN,
+                    'chunk_until': store.facts.CHUNK_UNTIL_MAX,
+                }
+                chunk.update(params)
+                return [session.execute(statement, chunk)]
+            for chunk in chunks:
+                chunk.update(params)
+            return store.facts.gather_parallel_fetch(statement, chunks)
+
+        def _sweep_overlaps(rows):
+            # The Facts seen so far that might still be open, as
+            # (span_end, sweep_idx, row), so the earliest to end is on top.
+            still_open = []
+            for sweep_idx, row in enumerate(rows):
+                while still_open and still_open[0][0] <= row.start_epoch:
+                    heapq.heappop(still_open)
+                if row.in_chunk:
+                    for _end, _idx, earlier in sorted(still_open, key=lambda x: x[1]):
+                        yield _overlap_issue(earlier, row)
+                heapq.heappush(still_open, (row.span_end, sweep_idx, row))
+
+        def _overlap_issue(earlier, row):
+            message = _('{}: {} ({} to {}) and {} ({} to {})').format(
+                self.ISSUE_KINDS['overlap'],
+                earlier.id, earlier.start_time, earlier.end_time,
+                row.id, row.start_time, row.end_time,
+            )
+            return IntegrityIssue('overlap', (earlier.id, row.id), message)
+
+        return _check_overlaps()
+
+    # ***
+
+    def check_endless(self):
+        """Yield an 'endless' issue if there's more than one active Fact."""
+        pks = [row.id for row in self.store.session.execute(
+            select([facts.c.id]).where(and_(
+                facts.c.end_time == None,  # noqa: E711
+                facts.c.deleted == False,  # noqa: E712
+            )).order_by(facts.c.id)
+        )]
+        if len(pks) > 1:
+            message = _('{}: {}').format(
+                self.ISSUE_KINDS['endless'], ', '.join(str(pk) for pk in pks),
+            )
+            yield IntegrityIssue('endless', tuple(pks), message)
+
+    # ***
+
+    def check_orphans(self):
+        """Yield an issue for each row that references a missing item."""
+        session = self.store.session
+
+        def _orphans(kind, statement):
+            for row in session.execute(statement):
+                pks = tuple(row)
+                message = _('{}: {}').format(self.ISSUE_KINDS[kind], pks)
+                yield IntegrityIssue(kind, pks, message)
+
+        yield from _orphans('orphan_fact_tag', select([
+            fact_tags.c.fact_id, fact_tags.c.tag_id,
+        ]).select_from(
+            fact_tags
+            .outerjoin(facts, facts.c.id == fact_tags.c.fact_id)
+            .outerjoin(tags, tags.c.id == fact_tags.c.tag_id)
+        ).where(or_(
+            facts.c.id == None,  # noqa: E711
+            tags.c.id == None,  # noqa: E711
+        )).order_by(fact_tags.c.fact_id, fact_tags.c.tag_id))
+
+        yield from _orphans('orphan_fact', select([
+            facts.c.id, facts.c.activity_id,
+        ]).select_from(
+            facts.outerjoin(activities, activities.c.id == facts.c.activity_id)
+        ).where(and_(
+            facts.c.activity_id != None,  # noqa: E711
+            activities.c.id == None,  # noqa: E711
+        )).order_by(facts.c.id))
+
+        yield from _orphans('orphan_activity', select([
+            activities.c.id, activities.c.category_id,
+        ]).select_from(
+            activities.outerjoin(
+                categories, categories.c.id == activities.c.category_id,
+            )
+        ).where(and_(
+            activities.c.category_id != None,  # noqa: E711
+            categories.c.id == None,  # noqa: E711
+        )).order_by(activities.c.id))
+
+    # ***
+
+    def check_split_from(self):
+        """Yield a 'split_from' issue for each Fact whose split_from is not valid.
+
+        When a Fact is edited, its new version is saved as a new Fact (with a
+        greater ID) that's split_from the old version, which is then marked
+        deleted. So it's a problem if the old version is missing, or not deleted,
+        or if its ID is not less (which would make the chain a loop), or if more
+        than one Fact is split from it (which would make the chain a tree).
+        """
+        original = aliased(facts)
+        n_splits = select([
+            facts.c.split_from_id, func.count().label('n_splits'),
+        ]).group_by(facts.c.split_from_id).alias('n_splits')
+        statement = select([
+            facts.c.id,
+            facts.c.split_from_id,
+            original.c.id.label('original_id'),
+            original.c.deleted.label('original_deleted'),
+            n_splits.c.n_splits,
+        ]).select_from(
+            facts
+            .outerjoin(original, original.c.id == facts.c.split_from_id)
+            .join(n_splits, n_splits.c.split_from_id == facts.c.split_from_id)
+        ).where(
+            facts.c.split_from_id != None,  # noqa: E711
+        ).where(or_(
+            original.c.id == None,  # noqa: E711
+            original.c.deleted == False,  # noqa: E712
+            facts.c.split_from_id >= facts.c.id,
+            n_splits.c.n_splits > bindparam('max_splits', 1, Integer),
+        )).order_by(facts.c.id)
+        for row in self.store.session.execute(statement):
+            if row.original_id is None:
+                problem = _('split_from is missing')
+            elif row.split_from_id >= row.id:
+                problem = _('split_from is not older')
+            elif not row.original_deleted:
+                problem = _('split_from is not deleted')
+            else:
+                problem = _('split_from is split {} ways').format(row.n_splits)
+            message = _('{}: {} ({}: {})').format(
+                self.ISSUE_KINDS['split_from'], row.id, problem, row.split_from_id,
+            )
+            yield IntegrityIssue('split_from', (row.id, row.split_from_id), message)
@@ -0,0 +1,67 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""``nark`` gather() item interning table."""
+
+from ...items.tag import Tag
+
+__all__ = (
+    'ItemInterner',
+)
+
+
+class ItemInterner(object):
+    """Per-query table of the Activity, Category, and Tag items hydrated so far.
+
+    When gather() hydrates Facts, it looks up each Fact's Activity, Category,
+    and Tags here first, so that every Fact that references the same item
+    shares the one instance, rather than each Fact getting its own copy.
+    E.g., a report of 50,000 Facts using 40 Activities creates 40 Activity
+    items, and not 50,000.
+
+    The shared items should be treated as read-only. To edit a Fact's items
+    in place, call ``Fact.unshare_items`` first (or ask gather() for private
+    items, via ``QueryTerms.private_items``).
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, kind, key):
+        """Returns the item previously put for the kind and key, or None."""
+        return self.items.get((kind, key))
+
+    def put(self, kind, key, item):
+        """Remembers and returns the item."""
+        self.items[(kind, key)] = item
+        return item
+
+    def tag(self, name):
+        """Returns the PK-less Tag for the name (as gather() concatenates them).
+
+        If passed a Tag instead (e.g., as loaded by batch_tags), returns it as-is.
+        """
+        if isinstance(name, Tag):
+            return name
+        tag = self.items.get(('tag_name', name))
+        if tag is None:
+            tag = self.put('tag_name', name, Tag(name=name))
+        return tag
@@ -19,9 +19,10 @@
 
 """Shared storage object manager utility functions."""
 
-from sqlalchemy import asc, desc
+from sqlalchemy import asc, bindparam, desc
 
 __all__ = (
+    'count_apply_limit_offset',
     'query_apply_limit_offset',
     'query_apply_true_or_not',
     'query_prepare_datetime',
@@ -46,13 +47,28 @@ def query_apply_limit_offset(query, limit=None, offset=None):
     Returns:
         list: The query passed in, possibly updated with limit and/or offset.
     """
+    # Use named bind parameters, so a cached query can be reused with other values.
     if limit and limit > 0:
-        query = query.limit(limit)
+        query = query.limit(bindparam('limit', limit))
     if offset and offset > 0:
-        query = query.offset(offset)
+        query = query.offset(bindparam('offset', offset))
     return query
 
 
+def count_apply_limit_offset(count, limit=None, offset=None):
+    """
+    Applies 'limit' and 'offset' to a count of results, as the query would have.
+
+    (The count planners count the matching items without the limit and offset,
+    rather than wrapping the limited query in a subquery, as query.count() does.)
+    """
+    if offset and offset > 0:
+        count = max(count - offset, 0)
+    if limit and limit > 0:
+        count = min(count, limit)
+    return count
+
+
 def query_apply_true_or_not(query, column, condition):
     if condition is not None:
         return query.filter(column == condition)
@@ -75,7 +91,9 @@ def query_prepare_datetime(datetm):
     #   "2018-06-29 16:32:00", but the datetime we use for the compare
     #   gets translated without, e.g., "2018-06-29 16:32". And we
     #   all know that "2018-06-29 16:32:00" > "2018-06-29 16:32".
-    # See also: func.datetime(AlchemyFact.start/end).
+    # - This is also the canonical format in which the Fact start and end
+    #   times are stored (see FactDateTime), so the managers compare the raw
+    #   columns against this value, which keeps the predicates index-friendly.
     cmp_fmt = '%Y-%m-%d %H:%M:%S'
     text = datetm.strftime(cmp_fmt)
     return text
@@ -169,6 +169,7 @@ class ActivityManager(BaseAlchemyManager, BaseActivityManager):
             activity.category, raw=True,
         )
         alchemy_activity.deleted = bool(activity.deleted)
+        self.store.bump_write_generation()
         try:
             self.store.session.commit()
         except IntegrityError as err:
@@ -225,6 +226,7 @@ class ActivityManager(BaseAlchemyManager, BaseActivityManager):
             self.store.activities._update(alchemy_activity)
         else:
             self.store.session.delete(alchemy_activity)
+        self.store.bump_write_generation()
         self.store.session.commit()
         self.store.logger.debug("Deleted: {!r}".format(activity))
 
@@ -131,6 +131,7 @@ class CategoryManager(BaseAlchemyManager, BaseCategoryManager):
             self.store.logger.error(message)
             raise KeyError(message)
         alchemy_category.name = category.name
+        self.store.bump_write_generation()
 
         try:
             self.store.session.commit()
@@ -177,6 +178,7 @@ class CategoryManager(BaseAlchemyManager, BaseCategoryManager):
             raise KeyError(message)
 
         self.store.session.delete(alchemy_category)
+        self.store.bump_write_generation()
         self.store.session.commit()
         self.store.logger.debug("Deleted: {!r}".format(category))
 
@@ -17,12 +17,16 @@
 
 """Base aggregate item fetch implementation."""
 
-from sqlalchemy import func
+import logging
+
+from sqlalchemy import bindparam, func
 from sqlalchemy.sql.expression import and_, or_
 
 from ..objects import AlchemyActivity, AlchemyCategory, AlchemyFact, AlchemyTag
+from ..query_profile import QueryProfile
 
 from . import (
+    count_apply_limit_offset,
     query_apply_limit_offset,
     query_prepare_datetime,
     query_sort_order_at_index,
@@ -38,6 +42,8 @@ class GatherBaseAlchemyManager(object):
 
     def __init__(self, *args, **kwargs):
         super(GatherBaseAlchemyManager, self).__init__(*args, **kwargs)
+        # The QueryProfile being recorded, while gather_profiled runs gather().
+        self._query_profile = None
 
     # ***
 
@@ -85,8 +91,57 @@ class GatherBaseAlchemyManager(object):
         def _gather_items():
             self.store.logger.debug(qt)
 
+            if qt.count_results:
+                return _gather_count()
+
             query, agg_cols = _gather_query_start()
 
+            query = _gather_query_filter(query)
+
+            query = query_group_by_aggregate(query, agg_cols)
+
+            has_facts = requires_fact_table
+            query = self.query_order_by_sort_cols(query, qt, has_facts, *agg_cols)
+
+            query = query_apply_limit_offset(query, qt.limit, qt.offset)
+
+            query = query_select_with_entities(query, agg_cols)
+
+            self.query_prepared_trace(query)
+
+            results = self.query_profile_fetch(query.all)
+            results = self.query_profile_hydrate(_gather_process_results, results)
+
+            return results
+
+        def _gather_count():
+            # Count the matching items, without the aggregates and the ORDER BY,
+            # rather than wrapping the whole query in a subquery, as query.count()
+            # would. (Which is also why the limit and offset are applied after.)
+            if not requires_fact_table:
+                query = self._gather_query_start_timeless(qt, alchemy_cls)
+                query = _gather_query_filter(query)
+                # The timeless joins are many-to-one, so each item is one row.
+                query = query.with_entities(func.count(alchemy_cls.pk))
+            else:
+                query = self._gather_query_start_aggregate(qt, [])
+                query = _gather_query_filter(query)
+                # The Fact joins yield a row per item use, so count the distinct
+                # items (including the NULL item, e.g., the Category of Activities
+                # without one, like the GROUP BY would).
+                distinct_items = query.with_entities(alchemy_cls.pk).distinct()
+                query = self.store.session.query(func.count()).select_from(
+                    distinct_items.subquery(),
+                )
+
+            self.query_prepared_trace(query)
+
+            count = self.query_profile_fetch(query.scalar, count_rows=None)
+            return count_apply_limit_offset(count, qt.limit, qt.offset)
+
+        # ***
+
+        def _gather_query_filter(query):
             query = self.query_filter_by_fact_times(
                 query, qt.since, qt.until, qt.endless, qt.partial,
             )
@@ -111,24 +166,7 @@ class GatherBaseAlchemyManager(object):
             #  from . import query_apply_true_or_not
             #  query = query_apply_true_or_not(query, alchemy_cls.deleted, qt.deleted)
 
-            query = query_group_by_aggregate(query, agg_cols)
-
-            has_facts = requires_fact_table
-            query = self.query_order_by_sort_cols(query, qt, has_facts, *agg_cols)
-
-            query = query_apply_limit_offset(query, qt.limit, qt.offset)
-
-            query = query_select_with_entities(query, agg_cols)
-
-            self.query_prepared_trace(query)
-
-            if qt.count_results:
-                results = query.count()
-            else:
-                results = query.all()
-                results = _gather_process_results(results)
-
-            return results
+            return query
 
         # ***
 
@@ -150,9 +188,11 @@ class GatherBaseAlchemyManager(object):
                     count_col = func.count().label('uses')
                     agg_cols.append(count_col)
                 if qt.include_stats or qt.sort_cols_has_any('time'):
-                    time_col = func.sum(
-                        func.julianday(AlchemyFact.end)
-                        - func.julianday(AlchemyFact.start)
+                    # Sum the integer epoch columns, and convert to days
+                    # at the end (rather than summing julianday() floats).
+                    time_col = (
+                        func.sum(AlchemyFact.end_epoch - AlchemyFact.start_epoch)
+                        / 86400.0
                     ).label('span')
                     agg_cols.append(time_col)
                 query = self._gather_query_start_aggregate(qt, agg_cols)
@@ -236,7 +276,7 @@ class GatherBaseAlchemyManager(object):
     def query_filter_by_item_pk(self, query, alchemy_cls, key):
         if key is None:
             return query
-        return query.filter(alchemy_cls.pk == key)
+        return query.filter(alchemy_cls.pk == bindparam('key', key))
 
     # ***
 
@@ -244,8 +284,13 @@ class GatherBaseAlchemyManager(object):
         self, query, since=None, until=None, endless=False, partial=False,
     ):
         def _query_filter_by_fact_times(query, since, until, endless, partial):
-            fmt_since = query_prepare_datetime(since) if since else None
-            fmt_until = query_prepare_datetime(until) if until else None
+            # Use named bind parameters, so that a cached statement can be
+            # reused with different times (see GatherFactManager.gather).
+            fmt_since = fmt_until = None
+            if since:
+                fmt_since = bindparam('since', query_prepare_datetime(since))
+            if until:
+                fmt_until = bindparam('until', query_prepare_datetime(until))
             if partial:
                 query = _get_partial_overlaps(query, fmt_since, fmt_until)
             else:
@@ -254,34 +299,34 @@ class GatherBaseAlchemyManager(object):
 
         def _get_partial_overlaps(query, since, until):
             """Return all facts where either start or end falls within the timeframe."""
-            if since and not until:
+            if since is not None and until is None:
                 # (lb): Checking AlchemyFact.end >= since is sorta redundant,
                 # because AlchemyFact.start >= since should guarantee that.
                 query = query.filter(
                     or_(
-                        func.datetime(AlchemyFact.start) >= since,
-                        func.datetime(AlchemyFact.end) >= since,
+                        AlchemyFact.start >= since,
+                        AlchemyFact.end >= since,
                     ),
                 )
-            elif not since and until:
+            elif since is None and until is not None:
                 # (lb): Checking AlchemyFact.start <= until is sorta redundant,
                 # because AlchemyFact.end <= until should guarantee that.
                 # - Except maybe for an Active Fact?
                 query = query.filter(
                     or_(
-                        func.datetime(AlchemyFact.start) <= until,
-                        func.datetime(AlchemyFact.end) <= until,
+                        AlchemyFact.start <= until,
+                        AlchemyFact.end <= until,
                     ),
                 )
-            elif since and until:
+            elif since is not None and until is not None:
                 query = query.filter(or_(
                     and_(
-                        func.datetime(AlchemyFact.start) >= since,
-                        func.datetime(AlchemyFact.start) <= until,
+                        AlchemyFact.start >= since,
+                        AlchemyFact.start <= until,
                     ),
                     and_(
-                        func.datetime(AlchemyFact.end) >= since,
-                        func.datetime(AlchemyFact.end) <= until,
+                        AlchemyFact.end >= since,
+                        AlchemyFact.end <= until,
                     ),
                 ))
             else:
@@ -290,10 +335,15 @@ class GatherBaseAlchemyManager(object):
 
         def _get_complete_overlaps(query, since, until, endless=False):
             """Return all facts with start and end within the timeframe."""
-            if since:
-                query = query.filter(func.datetime(AlchemyFact.start) >= since)
-            if until:
-                query = query.filter(func.datetime(AlchemyFact.end) <= until)
+            if since is not None:
+                query = query.filter(AlchemyFact.start >= since)
+            if until is not None:
+                query = query.filter(AlchemyFact.end <= until)
+                if since is not None:
+                    # (lb): Redundant (start <= end <= until), but bounding the
+                    # start on both sides lets SQLite range-scan the start_time
+                    # index, rather than reading every Fact before `until`.
+                    query = query.filter(AlchemyFact.start <= until)
             elif endless:
                 query = query.filter(AlchemyFact.end == None)  # noqa: E711
             return query
@@ -309,12 +359,13 @@ class GatherBaseAlchemyManager(object):
 
     def query_criteria_filter_by_activities(self, query, qt):
         criteria = []
-        for activity in qt.match_activities or []:
-            criterion = self.query_filter_by_activity(activity)
+        for idx, activity in enumerate(qt.match_activities or []):
+            criterion = self.query_filter_by_activity(activity, idx)
             criteria.append(criterion)
         return query, criteria
 
-    def query_filter_by_activity(self, activity):
+    def query_filter_by_activity(self, activity, idx=0):
+        bind_name = self.query_match_bind_name('activity', idx)
         if activity is not None:
             activity_name = self.query_filter_by_activity_name(activity)
             if activity_name is None:
@@ -328,12 +379,12 @@ class GatherBaseAlchemyManager(object):
                 # method, there's no production code that does that; you'd only
                 # get here from a new test. Or maybe for some reason wiring
                 # this path for some new feature.
-                criterion = (AlchemyActivity.pk == activity.pk)
+                criterion = (AlchemyActivity.pk == bindparam(bind_name, activity.pk))
             else:
                 # NOTE: Strict name matching, case and exactness.
                 #       Not, say, func.lower(name) == func.lower(...),
                 #       or using sqlalchemy ilike().
-                criterion = (AlchemyActivity.name == activity_name)
+                criterion = (AlchemyActivity.name == bindparam(bind_name, activity_name))
         else:
             # activity is None.
             # (lb): Note that there's no production path that'll bring execution here.
@@ -362,21 +413,22 @@ class GatherBaseAlchemyManager(object):
 
     def query_criteria_filter_by_categories(self, query, qt):
         criteria = []
-        for category in qt.match_categories or []:
-            criterion = self.query_filter_by_category(category)
+        for idx, category in enumerate(qt.match_categories or []):
+            criterion = self.query_filter_by_category(category, idx)
             criteria.append(criterion)
         return query, criteria
 
-    def query_filter_by_category(self, category):
+    def query_filter_by_category(self, category, idx=0):
+        bind_name = self.query_match_bind_name('category', idx)
         if category is not None:
             category_name = self.query_filter_by_category_name(category)
             if category_name is None:
                 # See comment in query_filter_by_activity: this path not
                 # reachable via production code.
-                criterion = (AlchemyCategory.pk == category.pk)
+                criterion = (AlchemyCategory.pk == bindparam(bind_name, category.pk))
             else:
                 # NOTE: Strict name matching. Case and exactness count.
-                criterion = (AlchemyCategory.name == category_name)
+                criterion = (AlchemyCategory.name == bindparam(bind_name, category_name))
         else:
             # (lb): I tried to avoid delinting (the noqa) using is_, e.g.,
             #   criterion = (AlchemyActivity.category.is_(None))
@@ -404,20 +456,21 @@ class GatherBaseAlchemyManager(object):
 
     def query_criteria_filter_by_tags(self, qt):
         criteria = []
-        for tag in qt.match_tags or []:
-            criterion = self.query_filter_by_tag(tag)
+        for idx, tag in enumerate(qt.match_tags or []):
+            criterion = self.query_filter_by_tag(tag, idx)
             criteria.append(criterion)
         return criteria
 
-    def query_filter_by_tag(self, tag):
+    def query_filter_by_tag(self, tag, idx=0):
+        bind_name = self.query_match_bind_name('tag', idx)
         if tag is not None:
             tag_name = self.query_filter_by_tag_name(tag)
             if tag_name is None:
                 # See comment in query_filter_by_activity: this path not
                 # reachable via production code.
-                criterion = (AlchemyTag.pk == tag.pk)
+                criterion = (AlchemyTag.pk == bindparam(bind_name, tag.pk))
             else:
-                criterion = (AlchemyTag.name == tag_name)
+                criterion = (AlchemyTag.name == bindparam(bind_name, tag_name))
         else:
             # tag is None.
             criterion = (AlchemyFact.tags == None)  # noqa: E711
@@ -434,6 +487,33 @@ class GatherBaseAlchemyManager(object):
 
     # ***
 
+    def query_match_bind_name(self, kind, idx):
+        return 'match_{}_{}'.format(kind, idx)
+
+    def query_match_bind_params(self, kind, items, name_getter):
+        """Returns the shape and the bind values of the match_<items> criteria.
+
+        The shape lists which criterion each item uses ('name', 'pk', or None),
+        and the params map the bind names to the values that the criteria
+        built by query_filter_by_<item> (e.g., query_filter_by_activity) use.
+        """
+        shape = []
+        params = {}
+        for idx, item in enumerate(items or []):
+            if item is None:
+                shape.append(None)
+                continue
+            item_name = name_getter(item)
+            if item_name is None:
+                shape.append('pk')
+                params[self.query_match_bind_name(kind, idx)] = item.pk
+            else:
+                shape.append('name')
+                params[self.query_match_bind_name(kind, idx)] = item_name
+        return tuple(shape), params
+
+    # ***
+
     def query_order_by_sort_cols(self, query, query_terms, has_facts, *agg_cols):
         for idx, sort_col in enumerate(query_terms.sort_cols or []):
             direction = query_sort_order_at_index(query_terms.sort_orders, idx)
@@ -542,17 +622,76 @@ class GatherBaseAlchemyManager(object):
     # ***
 
     def query_prepared_trace(self, query):
+        # Compiling the query to a string is not free, so skip it unless logged.
         if self.store.config['dev.catch_errors']:
             # 2020-05-21: I don't generally like more noise in my tmux dev environment
             # logger pane, but I do like seeing the query, especially with all the
             # recent gather() development (improved grouping, sorting, and aggregates).
             logf = self.store.logger.warning
-        else:
+        elif self.store.logger.isEnabledFor(logging.DEBUG):
             logf = self.store.logger.debug
+        else:
+            return
         logf('Query: {}'.format(str(query)))
 
     # ***
 
+    def gather_profiled(self, query_terms, **kwargs):
+        """Runs gather(), recording its queries and timings in a QueryProfile.
+
+        The QueryProfile is saved as the store's ``last_query_profile``.
+        """
+        qt = query_terms
+        profile = QueryProfile(explain=qt.explain)
+        self._query_profile = profile
+        try:
+            with profile.capture(self.query_profile_engines(qt)):
+                results = self.gather(qt, **kwargs)
+        finally:
+            self._query_profile = None
+        if qt.explain:
+            profile.explain_statements(self.store.session.connection())
+        self.store.last_query_profile = profile
+        self.store.logger.debug('Profile: {}'.format(profile))
+        return results
+
+    def query_profile_engines(self, query_terms):
+        """Returns the engines whose queries gather_profiled should record."""
+        return [self.store.session.get_bind()]
+
+    def query_profile_fetch(self, fetch, count_rows=len):
+        """Returns fetch(), timing it as the profile's sql_time, if profiling.
+
+        The (first) statement that fetch() runs is marked as the profile's main
+        query (and if gather() falls back to another query, that one is).
+
+        Args:
+            fetch: The callable that runs the query and returns the rows.
+
+            count_rows: The callable that counts the rows fetched. Or None,
+                if the query returns a scalar (which counts as one row).
+        """
+        profile = self._query_profile
+        if profile is None:
+            return fetch()
+        main_index = len(profile.statements)
+        with profile.timing('sql_time'):
+            records = fetch()
+        if len(profile.statements) > main_index:
+            profile.main_index = main_index
+        profile.row_count = count_rows(records) if count_rows is not None else 1
+        return records
+
+    def query_profile_hydrate(self, hydrate, records):
+        """Returns hydrate(records), timing it as the profile's hydrate_time."""
+        profile = self._query_profile
+        if profile is None:
+            return hydrate(records)
+        with profile.timing('hydrate_time'):
+            return hydrate(records)
+
+    # ***
+
     def query_process_results(
         self,
         records,
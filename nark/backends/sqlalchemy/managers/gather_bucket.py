@@ -0,0 +1,144 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from sqlalchemy import Integer, bindparam, cast, func, select
+
+__all__ = (
+    'GatherBucketManager',
+)
+
+
+class GatherBucketManager(object):
+    """Time-sliced (spliced at hour, day, week, or month) gather() support.
+
+    When grouping by time period (see QueryTerms.time_bucket), gather() joins
+    each matching Fact to its slices, i.e., the parts of the Fact that fall in
+    each period, which a recursive CTE generates (see time_bucket_slices). The
+    aggregates are then computed from the slices, rather than from the Facts,
+    so a Fact that runs past midnight counts toward both days, and so on.
+
+    All the period math uses the Facts' epoch columns (see fact_time_epoch),
+    which treat the naive Fact times as UTC, so there's no DST to worry about.
+    The day, week, and month periods start at the config's time.day_start.
+    """
+
+    # The first Monday after the epoch (1970-01-01 was a Thursday).
+    EPOCH_FIRST_MONDAY = 4 * 86400
+
+    # ***
+
+    @property
+    def time_bucket_day_start_secs(self):
+        """The time.day_start, in seconds after midnight."""
+        day_start = self.store.config['time.day_start']
+        if not isinstance(day_start, datetime.time):
+            return 0
+        return day_start.hour * 3600 + day_start.minute * 60 + day_start.second
+
+    # ***
+
+    def time_bucket_start(self, bucket, epoch):
+        """Return the SQL expression for the start (epoch) of epoch's period."""
+        day_start = bindparam('day_start_secs', self.time_bucket_day_start_secs)
+        if bucket == 'hour':
+            return (epoch / 3600) * 3600
+        elif bucket == 'day':
+            return ((epoch - day_start) / 86400) * 86400 + day_start
+        elif bucket == 'week':
+            monday = self.EPOCH_FIRST_MONDAY
+            return ((epoch - day_start - monday) / 604800) * 604800 + monday + day_start
+        elif bucket == 'month':
+            return self.time_bucket_strftime_epoch(epoch, day_start, 'start of month')
+        raise ValueError(bucket)
+
+    def time_bucket_next(self, bucket, epoch):
+        """Return the SQL expression for the start (epoch) of the next period."""
+        if bucket == 'hour':
+            return self.time_bucket_start(bucket, epoch) + 3600
+        elif bucket == 'day':
+            return self.time_bucket_start(bucket, epoch) + 86400
+        elif bucket == 'week':
+            return self.time_bucket_start(bucket, epoch) + 604800
+        elif bucket == 'month':
+            day_start = bindparam('day_start_secs', self.time_bucket_day_start_secs)
+            return self.time_bucket_strftime_epoch(
+                epoch, day_start, 'start of month', '+1 month',
+            )
+        raise ValueError(bucket)
+
+    def time_bucket_label(self, bucket, epoch):
+        """Return the SQL expression for the name of epoch's period.
+
+        The name is the date the period starts (e.g., '2020-05-01' for May, 2020),
+        or, for hours, the date and hour (e.g., '2020-05-01 13:00').
+        """
+        if bucket == 'hour':
+            return func.strftime('%Y-%m-%d %H:00', epoch, 'unixepoch')
+        day_start = bindparam('day_start_secs', self.time_bucket_day_start_secs)
+        period_start = self.time_bucket_start(bucket, epoch)
+        return func.date(period_start - day_start, 'unixepoch')
+
+    def time_bucket_strftime_epoch(self, epoch, day_start, *modifiers):
+        # Use SQLite's calendar math for months, which vary in length.
+        return cast(
+            func.strftime('%s', epoch - day_start, 'unixepoch', *modifiers), Integer,
+        ) + day_start
+
+    # ***
+
+    def time_bucket_slices(self, bucket, facts_subquery):
+        """
+        Return a recursive CTE that splices each Fact at the period boundaries.
+
+        Args:
+            bucket (str): The period, 'hour', 'day', 'week', or 'month'.
+
+            facts_subquery: The matching Facts, as (fact_id, slice_start, fact_end)
+                epoch seconds (already clipped to the query's time window, and
+                with the active Fact's end set to 'now').
+
+        Returns:
+            The (fact_id, slice_start, slice_end, fact_end) CTE, with one row
+            for each period that each Fact spans.
+        """
+        anchor = select([
+            facts_subquery.c.fact_id,
+            facts_subquery.c.slice_start,
+            func.min(
+                facts_subquery.c.fact_end,
+                self.time_bucket_next(bucket, facts_subquery.c.slice_start),
+            ).label('slice_end'),
+            facts_subquery.c.fact_end,
+        ]).where(
+            facts_subquery.c.slice_start <= facts_subquery.c.fact_end,
+        )
+        slices = anchor.cte('fact_slices', recursive=True)
+        splice = select([
+            slices.c.fact_id,
+            slices.c.slice_end,
+            func.min(
+                slices.c.fact_end,
+                self.time_bucket_next(bucket, slices.c.slice_end),
+            ),
+            slices.c.fact_end,
+        ]).where(
+            slices.c.slice_end < slices.c.fact_end,
+        )
+        return slices.union_all(splice)
@@ -17,24 +17,59 @@
 
 from gettext import gettext as _
 
+import base64
+import json
 from collections import namedtuple
-
-from sqlalchemy import case, distinct, func, literal_column
-from sqlalchemy.sql.expression import or_
-
+from itertools import islice
+
+from sqlalchemy import (
+    asc,
+    bindparam,
+    desc,
+    distinct,
+    false,
+    func,
+    inspect,
+    literal_column,
+    select,
+    type_coerce
+)
+from sqlalchemy.ext import baked
+from sqlalchemy.sql.elements import UnaryExpression
+from sqlalchemy.sql.expression import and_, or_
+from sqlalchemy.sql.operators import custom_op
+
+from ....items.activity import Activity
+from ....items.category import Category
+from ....items.fact import Fact
+from ....items.tag import Tag
 from ....managers.fact import BaseFactManager
+from ....managers.query_terms import ResultsPage
+from ..item_interner import ItemInterner
 from ..objects import (
+    FACTS_FTS_TERM_MIN_LENGTH,
     AlchemyActivity,
     AlchemyCategory,
     AlchemyFact,
     AlchemyTag,
-    fact_tags
+    FactDateTime,
+    activities,
+    categories,
+    fact_tags,
+    fact_time_epoch,
+    facts,
+    facts_fts
 )
 from . import (
+    count_apply_limit_offset,
     query_apply_limit_offset,
     query_apply_true_or_not,
-    query_prepare_datetime
+    query_prepare_datetime,
+    query_sort_order_at_index
 )
+from .gather_bucket import GatherBucketManager
+from .gather_parallel import GatherParallelManager
+from .gather_rollup import GatherRollupManager
 from .manager_base import BaseAlchemyManager
 
 __all__ = (
@@ -42,11 +77,198 @@ __all__ = (
 )
 
 
-class GatherFactManager(BaseAlchemyManager, BaseFactManager):
+class GatherFactManager(
+    GatherBucketManager,
+    GatherParallelManager,
+    GatherRollupManager,
+    BaseAlchemyManager,
+    BaseFactManager,
+):
     """Fact class aggregate query implementation for FactManager."""
 
     def __init__(self, *args, **kwargs):
         super(GatherFactManager, self).__init__(*args, **kwargs)
+        self._has_facts_fts = None
+        # Cache of gather() queries (and their compiled SQL), by query shape.
+        self.gather_bakery = baked.bakery(size=self.GATHER_BAKERY_SIZE)
+
+    # ***
+
+    @property
+    def has_facts_fts(self):
+        """True if the store has the (optional) facts_fts full-text index."""
+        if self._has_facts_fts is None:
+            self._has_facts_fts = self.store_has_table('facts_fts')
+        return self._has_facts_fts
+
+    def query_filter_description_matches(self, term, idx=0):
+        """Return a filter that matches Facts whose description contains term."""
+        like_term, phrase = self.query_search_term_binds(term)
+        if phrase is None:
+            like_bind = bindparam('search_like_{}'.format(idx), like_term)
+            return AlchemyFact.description.ilike(like_bind)
+        phrase_bind = bindparam('search_fts_{}'.format(idx), phrase)
+        matches = select([facts_fts.c.rowid]).where(
+            facts_fts.c.description.match(phrase_bind),
+        )
+        return AlchemyFact.pk.in_(matches)
+
+    def query_search_term_binds(self, term):
+        """Return the LIKE pattern, and the FTS5 phrase (or None), for the term."""
+        like_term = '%{}%'.format(term)
+        if (
+            not self.has_facts_fts
+            or len(term) < FACTS_FTS_TERM_MIN_LENGTH
+            # Let LIKE handle its own wildcards, as it always has.
+            or '%' in term
+            or '_' in term
+        ):
+            return like_term, None
+        # Quote the term, so FTS5 treats it as a (substring) phrase, and not
+        # as a query expression (e.g., "AND", "NOT", "col:", etc.).
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return like_term, phrase
+
+    # ***
+
+    # The columns selected when bulk hydrating (see QueryTerms.bulk_hydrate),
+    # in the order that bulk_hydrate_fact expects them.
+    BULK_HYDRATE_COLUMNS = (
+        facts.c.id,
+        facts.c.deleted,
+        facts.c.split_from_id,
+        facts.c.start_time,
+        facts.c.end_time,
+        facts.c.description,
+        activities.c.id,
+        activities.c.name,
+        activities.c.deleted,
+        activities.c.hidden,
+        categories.c.id,
+        categories.c.name,
+        categories.c.deleted,
+        categories.c.hidden,
+    )
+
+    def bulk_hydrate_fact(self, row, tags=None, set_freqs=False, interner=None):
+        """Return a new Fact built from a row of BULK_HYDRATE_COLUMNS values.
+
+        This is the row-tuple equivalent of ``AlchemyFact.as_hamster``, except
+        that the Fact's split_from is the original Fact's ID, not the item.
+        """
+        fact_pk, fact_deleted, split_from_id, start, end, description = row[:6]
+
+        activity = self.bulk_hydrate_activity(row, interner)
+
+        if tags and interner is not None and not set_freqs:
+            # (lb): Not when set_freqs, because each Tag's freq is per-result.
+            tags = [interner.tag(name) for name in tags]
+
+        fact_cls = self.store.fact_cls or Fact
+
+        fact = fact_cls(
+            pk=fact_pk,
+            deleted=bool(fact_deleted),
+            split_from=split_from_id,
+            activity=activity,
+            start=start,
+            end=end,
+            description=description,
+            # Skip tags_replace'ing twice, unless counting tag frequencies.
+            tags=None if set_freqs else tags,
+        )
+
+        if set_freqs:
+            fact.tags_replace(tags, set_freqs=set_freqs)
+
+        return fact
+
+    def bulk_hydrate_activity(self, row, interner=None):
+        activity_pk, activity_name, activity_deleted, activity_hidden = row[6:10]
+        if activity_pk is None:
+            return None
+
+        if interner is not None:
+            activity = interner.get('activity', activity_pk)
+            if activity is not None:
+                return activity
+
+        activity = Activity(
+            pk=activity_pk,
+            name=activity_name,
+            category=self.bulk_hydrate_category(row, interner),
+            deleted=bool(activity_deleted),
+            hidden=bool(activity_hidden),
+        )
+
+        if interner is not None:
+            interner.put('activity', activity_pk, activity)
+
+        return activity
+
+    def bulk_hydrate_category(self, row, interner=None):
+        category_pk, category_name, category_deleted, category_hidden = row[10:14]
+        if category_pk is None:
+            return None
+
+        if interner is not None:
+            category = interner.get('category', category_pk)
+            if category is not None:
+                return category
+
+        category = Category(
+            pk=category_pk,
+            name=category_name,
+            deleted=bool(category_deleted),
+            hidden=bool(category_hidden),
+        )
+
+        if interner is not None:
+            interner.put('category', category_pk, category)
+
+        return category
+
+    # ***
+
+    # The number of Fact IDs per batch_tags query. SQLite limits the number of
+    # bound parameters per statement (999, before SQLite 3.32.0).
+    BATCH_TAGS_CHUNK_SIZE = 500
+
+    def gather_fact_tags(self, fact_pks, interner=None):
+        """Return a dict of each Fact ID's Tags, loaded in batched IN queries.
+
+        Unlike the Tag names that gather() concatenates, these Tags are complete
+        (with their PKs), and unlike lazy-loading each AlchemyFact.tags, this
+        runs just one query per BATCH_TAGS_CHUNK_SIZE Facts.
+        """
+        tags_by_fact = {fact_pk: [] for fact_pk in fact_pks}
+        unique_pks = list(tags_by_fact)
+        session = self.store.session
+        for offset in range(0, len(unique_pks), self.BATCH_TAGS_CHUNK_SIZE):
+            chunk_pks = unique_pks[offset:offset + self.BATCH_TAGS_CHUNK_SIZE]
+            query = select([
+                fact_tags.c.fact_id,
+                AlchemyTag.pk,
+                AlchemyTag.name,
+                AlchemyTag.deleted,
+                AlchemyTag.hidden,
+            ]).select_from(
+                fact_tags.join(AlchemyTag, AlchemyTag.pk == fact_tags.c.tag_id),
+            ).where(
+                fact_tags.c.fact_id.in_(chunk_pks),
+            )
+            for fact_pk, tag_pk, name, deleted, hidden in session.execute(query):
+                tag = None
+                if interner is not None:
+                    tag = interner.get('tag', tag_pk)
+                if tag is None:
+                    tag = Tag(
+                        pk=tag_pk, name=name, deleted=bool(deleted), hidden=bool(hidden),
+                    )
+                    if interner is not None:
+                        interner.put('tag', tag_pk, tag)
+                tags_by_fact[fact_pk].append(tag)
+        return tags_by_fact
 
     # ***
 
@@ -62,6 +284,12 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
         'start_date',
     ))
 
+    # The number of rows to fetch per batch when streaming (see QueryTerms.stream).
+    STREAM_YIELD_PER = 1000
+
+    # The number of gather() query shapes to cache (see _get_all_query_shape).
+    GATHER_BAKERY_SIZE = 200
+
     RESULT_GRP_INDEX = {
         'duration': 0,
         'group_count': 1,
@@ -120,6 +348,9 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
         Returns:
             list: A list of matching item instances or (item, *statistics) tuples.
+            Or, if ``query_terms.stream``, an iterator over the same. Or, if paging
+            (``limit`` or ``seek``) ungrouped Facts by start, a ResultsPage (a
+            list with the continuation token to seek the next page).
         """
         qt = query_terms
 
@@ -140,20 +371,147 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             errmsg = _('Cannot request lazy_tags when grouping results.')
             raise Exception(errmsg)
 
+        # Aggregate the time window in chunks, in parallel, if asked and able.
+        parallel = self.gather_parallel_eligible(qt, lazy_tags)
+
+        # Bulk hydration builds Facts from plain columns, so it cannot return
+        # AlchemyFacts (raw), or lazy-load their Tags (lazy_tags). (The parallel
+        # chunks' rows are plain columns, too, so they're always bulk hydrated.)
+        bulk_hydrate = (
+            (qt.bulk_hydrate or parallel) and not qt.raw and not lazy_tags
+        )
+        n_bulk_cols = len(GatherFactManager.BULK_HYDRATE_COLUMNS)
+
+        # Load the Facts' Tags (with PKs) in a second query (see gather_fact_tags),
+        # rather than concatenating Tag names in the main query. Except when
+        # grouping, because then each result's Tags are the group's Tag names
+        # (with frequencies), and not any one Fact's Tags.
+        batch_tags = (
+            qt.batch_tags and not qt.raw and not lazy_tags and not qt.is_grouped
+        )
+        # The Tag names are still needed in the main query to sort by them, or
+        # to filter by Tags (the filter is applied to the tags subquery).
+        concat_tags = not lazy_tags and (
+            not batch_tags or qt.match_tags or qt.sort_cols_has_any('tag')
+        )
+
+        # Unless the caller plans to edit the items in place, have all the
+        # Facts that reference the same Activity, Category, or Tag share the
+        # one item instance, rather than each Fact getting its own copies.
+        interner = None if qt.private_items else ItemInterner()
+
+        # Use keyset pagination when the caller is paging (or has a page token),
+        # and the results are ordered by Fact start (the only seekable order).
+        seekable = (qt.limit or qt.seek) and qt.is_seekable
+        if qt.seek and not seekable:
+            errmsg = _('Cannot seek unless listing ungrouped Facts sorted by start.')
+            raise ValueError(errmsg)
+
+        def _gather():
+            # Answer day-grouped reports from the daily rollups, if possible.
+            if self.gather_rollups_eligible(qt, lazy_tags):
+                results = self.gather_rollups(qt)
+                if results is not None:
+                    if qt.stream and not qt.count_results:
+                        # (lb): One row per day (and group), so no need to batch.
+                        return iter(results)
+                    return results
+            return _get_all_facts()
+
         def _get_all_facts():
             self.store.logger.debug(qt)
 
             must_support_db_engine_funcs()
 
-            query = self.store.session.query(AlchemyFact)
+            if parallel:
+                return _gather_parallel()
 
-            query, tags_subquery = _get_all_prepare_tags_subquery(query)
+            if qt.count_results:
+                return _gather_count()
+
+            if qt.stream:
+                # Not worth caching: Fetching the batches dwarfs the query setup.
+                # - Also, yield_per does not apply to baked queries.
+                query = _get_all_prepare_query(self.store.session)
+                return _gather_stream_results(query)
+
+            if bulk_hydrate:
+                # Run the SELECT via Core, which returns plain row tuples, and
+                # skips the ORM's per-row instance loading and identity map.
+                # - The query setup is not cached (baked), because its cost is
+                #   negligible compared to hydrating a large result.
+                query = _get_all_prepare_query(self.store.session)
+                records = self.query_profile_fetch(
+                    lambda: _execute_core_query(query).fetchall()
+                )
+                results = self.query_profile_hydrate(_gather_process_results, records)
+                if seekable:
+                    results = _gather_results_page(results)
+                return results
+
+            # Build the query once per shape (i.e., per the set of flags and the
+            # number of filter terms), and thereafter reuse it (and its compiled
+            # statement), binding just the parameter values for this call.
+            baked_query = self.gather_bakery(
+                _get_all_prepare_query, *_get_all_query_shape()
+            )
+            query = baked_query(self.store.session).params(**_get_all_query_params())
 
-            query, span_cols = _get_all_prepare_span_cols(query)
+            # Profiling: 2018-07-15: (lb): ~ 0.120 s. to fetch latest of 20K Facts.
+            records = self.query_profile_fetch(query.all)
+            results = self.query_profile_hydrate(_gather_process_results, records)
+            if seekable:
+                results = _gather_results_page(results)
+
+            return results
+
+        def _gather_count():
+            # The count query is cached by shape, too (see _get_all_prepare_count).
+            baked_query = self.gather_bakery(
+                _get_all_prepare_count, *_get_all_query_shape()
+            )
+            query = baked_query(self.store.session).params(**_get_all_query_params())
+            count = self.query_profile_fetch(query.scalar, count_rows=None)
+            return count_apply_limit_offset(count, qt.limit, qt.offset)
+
+        def _gather_parallel():
+            # The query setup is not cached (baked), because it's run on other
+            # connections, and because its cost is negligible by comparison.
+            query = _get_all_prepare_query(self.store.session)
+            chunks = self.gather_parallel_chunks(qt)
+            chunks_rows = self.query_profile_fetch(
+                lambda: self.gather_parallel_fetch(query.statement, chunks),
+                count_rows=lambda chunks_rows: sum(len(rows) for rows in chunks_rows),
+            )
+            records = self.gather_parallel_merge(
+                qt, chunks_rows, n_bulk_cols, magic_tag_sep,
+            )
+            if qt.count_results:
+                return len(records)
+            return self.query_profile_hydrate(_gather_process_results, records)
+
+        def _execute_core_query(query):
+            session = self.store.session
+            # Unlike Query, Session.execute does not autoflush, so flush pending
+            # changes ourselves, lest the SELECT not see them.
+            if session.autoflush:
+                session.flush()
+            return session.execute(query.statement)
+
+        def _get_all_prepare_query(session):
+            query = session.query(AlchemyFact)
+
+            page_ids = _get_all_prepare_page_ids()
+
+            query, tags_subquery = _get_all_prepare_tags_subquery(query, page_ids)
+
+            query, slices = _get_all_prepare_time_slices(query)
+
+            query, span_cols = _get_all_prepare_span_cols(query, slices)
 
             query, actg_cols = _get_all_prepare_actg_cols(query)
 
-            query, start_date = _get_all_prepare_start_date(query)
+            query, start_date = _get_all_prepare_start_date(query, slices)
 
             query = _get_all_prepare_joins(query)
 
@@ -173,29 +531,218 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
             query = _get_all_filter_by_ongoing(query)
 
+            query = _get_all_filter_by_seek(query)
+
+            query = _get_all_filter_by_chunk(query)
+
+            if page_ids is not None:
+                query = query.filter(AlchemyFact.pk.in_(page_ids))
+
             query = query_group_by_aggregate(query, tags_subquery)
 
-            has_facts = True
-            query = self.query_order_by_sort_cols(
-                query, qt, has_facts, span_cols, start_date, tags_subquery,
-            )
+            if not parallel:
+                # (The parallel chunks are sorted and limited after merging.)
+                has_facts = True
+                query = self.query_order_by_sort_cols(
+                    query, qt, has_facts, span_cols, start_date, tags_subquery,
+                )
+                if qt.is_grouped and span_cols is not None:
+                    # Break any ties by the groups' times, as the rollups and
+                    # the parallel chunks do (see gather_rollups_sort).
+                    query = self.query_order_by_group_start(query, asc, span_cols)
+                if seekable and not qt.sort_cols:
+                    # Pages need a predictable order, so use the default sort.
+                    query = self.query_order_by_start(query, asc)
 
-            query = query_apply_limit_offset(query, qt.limit, qt.offset)
+                query = query_apply_limit_offset(query, qt.limit, qt.offset)
 
             query = query_select_with_entities(
                 query, span_cols, actg_cols, start_date, tags_subquery,
             )
 
+            # (lb): Note that this only traces when the query shape is first seen.
             self.query_prepared_trace(query)
 
-            if qt.count_results:
-                results = query.count()
+            return query
+
+        # Rather than wrap the whole query in a subquery (i.e., query.count()),
+        # count just the matching Facts, or their distinct groups, without the
+        # aggregates, the Tag names, the ORDER BY, or any join that none of the
+        # filters or groups need. E.g., counting the Facts in a time window is
+        # then answered from the (deleted, start_time) index alone.
+
+        def _get_all_prepare_count(session):
+            query = session.query(AlchemyFact.pk)
+
+            tags_subquery = None
+            if qt.match_tags or qt.group_tags:
+                query, tags_subquery = _get_all_prepare_tags_subquery(query, None)
+
+            query, slices = _get_all_prepare_time_slices(query)
+
+            query = _get_all_prepare_count_joins(query)
+
+            query = self.query_filter_by_fact_times(
+                query, qt.since, qt.until, qt.endless, qt.partial,
+            )
+            query = self.query_filter_by_activities(query, qt)
+            query = self.query_filter_by_categories(query, qt)
+            query = query_filter_by_search_term(query)
+            query = self.query_filter_by_item_pk(query, AlchemyFact, qt.key)
+            query = query_apply_true_or_not(query, AlchemyFact.deleted, qt.deleted)
+            query = _get_all_filter_by_ongoing(query)
+            query = _get_all_filter_by_seek(query)
+
+            group_cols = _get_all_prepare_count_group_cols(tags_subquery, slices)
+            if not group_cols:
+                # The joins are all many-to-one (and the tags subquery is one
+                # row per Fact), so each Fact is one row.
+                query = query.with_entities(func.count(AlchemyFact.pk))
             else:
-                # Profiling: 2018-07-15: (lb): ~ 0.120 s. to fetch latest of 20K Facts.
-                records = query.all()
-                results = _gather_process_results(records)
+                distinct_groups = query.with_entities(*group_cols).distinct()
+                query = session.query(func.count()).select_from(
+                    distinct_groups.subquery(),
+                )
 
-            return results
+            self.query_prepared_trace(query)
+
+            return query
+
+        def _get_all_prepare_count_joins(query):
+            # The groups need at most the activities table (for the Activity
+            # name, or the Category ID), and matching Categories by name needs
+            # the categories table. (And the Activity ID is on the Fact.)
+            join_category = qt.match_categories
+            if (
+                join_category
+                or qt.match_activities
+                or bool(qt.group_activity) != bool(qt.group_category)
+            ):
+                query = query.outerjoin(AlchemyFact.activity)
+            if join_category:
+                query = query.outerjoin(AlchemyActivity.category)
+            return query
+
+        def _get_all_prepare_count_group_cols(tags_subquery, slices):
+            # Mirror query_group_by_meta and _get_all_prepare_start_date.
+            group_cols = []
+            if qt.group_activity and qt.group_category:
+                group_cols.append(AlchemyFact.activity_id)
+            elif qt.group_activity:
+                group_cols.append(AlchemyActivity.name)
+            elif qt.group_category:
+                group_cols.append(AlchemyActivity.category_id)
+            if qt.group_tags:
+                group_cols.append(tags_subquery.c.facts_tags)
+            if slices is not None:
+                group_cols.append(
+                    self.time_bucket_label(qt.time_bucket, slices.c.slice_start)
+                )
+            elif qt.group_days:
+                group_cols.append(func.date(AlchemyFact.start))
+            return group_cols
+
+        # ***
+
+        # The query shape is everything about the query terms that changes the
+        # structure of the SQL statement, and not just its parameter values.
+        # - Every value that _get_all_prepare_query uses must be a named bind
+        #   parameter, and the name and value must be added by the function
+        #   _get_all_query_params. Otherwise a cached query would reuse the
+        #   value from when it was first built.
+
+        def _get_all_query_shape():
+            activities_shape, _params = self.query_match_bind_params(
+                'activity', qt.match_activities, self.query_filter_by_activity_name,
+            )
+            categories_shape, _params = self.query_match_bind_params(
+                'category', qt.match_categories, self.query_filter_by_category_name,
+            )
+            tags_shape, _params = self.query_match_bind_params(
+                'tag', qt.match_tags, self.query_filter_by_tag_name,
+            )
+            search_shape = tuple(
+                self.query_search_term_binds(term)[1] is None
+                for term in qt.search_terms or []
+            )
+            return (
+                bool(lazy_tags),
+                bool(bulk_hydrate),
+                bool(batch_tags),
+                bool(add_aggregates),
+                bool(seekable),
+                bool(qt.since),
+                bool(qt.until),
+                bool(qt.endless),
+                bool(qt.partial),
+                qt.deleted,
+                bool(qt.exclude_ongoing),
+                qt.key is not None,
+                search_shape,
+                bool(qt.broad_match),
+                activities_shape,
+                categories_shape,
+                tags_shape,
+                bool(qt.group_activity),
+                bool(qt.group_category),
+                bool(qt.group_tags),
+                bool(qt.group_days),
+                qt.time_bucket,
+                tuple(qt.sort_cols or ()),
+                tuple(qt.sort_orders or ()),
+                bool(qt.limit and qt.limit > 0),
+                bool(qt.offset and qt.offset > 0),
+                _get_all_query_shape_seek(),
+            )
+
+        def _get_all_query_shape_seek():
+            if not qt.seek:
+                return None
+            _seek_start, seek_end, _seek_pk = self.seek_token_decode(qt.seek)
+            return seek_end is None
+
+        def _get_all_query_params():
+            params = {}
+            if qt.since:
+                params['since'] = query_prepare_datetime(qt.since)
+            if qt.until:
+                params['until'] = query_prepare_datetime(qt.until)
+            if add_aggregates:
+                params['now_epoch'] = fact_time_epoch(self.store.now)
+            if qt.time_bucket:
+                params['day_start_secs'] = self.time_bucket_day_start_secs
+                if qt.since:
+                    params['since_epoch'] = fact_time_epoch(qt.since)
+                if qt.until:
+                    params['until_epoch'] = fact_time_epoch(qt.until)
+            if qt.key is not None:
+                params['key'] = qt.key
+            for idx, term in enumerate(qt.search_terms or []):
+                like_term, phrase = self.query_search_term_binds(term)
+                params['search_like_{}'.format(idx)] = like_term
+                if phrase is not None:
+                    params['search_fts_{}'.format(idx)] = phrase
+            params.update(self.query_match_bind_params(
+                'activity', qt.match_activities, self.query_filter_by_activity_name,
+            )[1])
+            params.update(self.query_match_bind_params(
+                'category', qt.match_categories, self.query_filter_by_category_name,
+            )[1])
+            params.update(self.query_match_bind_params(
+                'tag', qt.match_tags, self.query_filter_by_tag_name,
+            )[1])
+            if qt.seek:
+                seek_start, seek_end, seek_pk = self.seek_token_decode(qt.seek)
+                params['seek_start'] = seek_start
+                if seek_end is not None:
+                    params['seek_end'] = seek_end
+                params['seek_pk'] = seek_pk
+            if qt.limit and qt.limit > 0:
+                params['limit'] = qt.limit
+                params['page_limit'] = qt.limit + max(qt.offset or 0, 0)
+            if qt.offset and qt.offset > 0:
+                params['offset'] = qt.offset
+            return params
 
         # ***
 
@@ -220,6 +767,74 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
                 return _gather_process_facts_only(records)
             return _gather_process_facts_and_aggs(records)
 
+        def _gather_results_page(results):
+            continuation = None
+            if qt.limit and len(results) == qt.limit:
+                last_result = results[-1]
+                if not isinstance(last_result, (AlchemyFact, Fact)):
+                    last_result = last_result[0]
+                continuation = self.seek_token(last_result)
+            return ResultsPage(results, continuation)
+
+        def _gather_stream_results(query):
+            # Note that, unlike query.all(), yield_per fetches rows from the
+            # cursor in batches, and the generator hydrates each result only
+            # as the caller asks for it, so memory use stays flat.
+            if bulk_hydrate:
+                # Core row tuples never enter the session, so there's nothing
+                # to expunge. (SQLite's cursor fetches the rows as we iterate.)
+                rows = _execute_core_query(query)
+                for batch in _gather_stream_batches(rows):
+                    tags_by_fact = _gather_batch_tags(batch)
+                    for row in batch:
+                        yield _process_record(*_split_record(row), tags_by_fact)
+                return
+
+            records = query.yield_per(qt.yield_per or self.STREAM_YIELD_PER)
+            facts_only = not qt.include_stats and not add_aggregates and lazy_tags
+            # Remember which AlchemyFacts were already in the session, so that
+            # we only expunge the ones that this query loaded (and not ones the
+            # caller might still be using).
+            session = self.store.session
+            preloaded = set(session.identity_map.keys())
+            for batch in _gather_stream_batches(records):
+                tags_by_fact = None if facts_only else _gather_batch_tags(batch)
+                for record in batch:
+                    if facts_only:
+                        fact = record
+                        result = _gather_process_facts_only([record])[0]
+                    else:
+                        fact, cols = _split_record(record)
+                        result = _process_record(fact, cols, tags_by_fact)
+                    # Unless the caller wants the AlchemyFacts, let them go, so
+                    # the session's identity map does not grow with the results.
+                    if not qt.raw and inspect(fact).key not in preloaded:
+                        session.expunge(fact)
+                    yield result
+
+        def _gather_stream_batches(records):
+            # Hydrate the streamed results a batch at a time, so that batch_tags
+            # can load the Tags for each batch of Facts with one query.
+            records = iter(records)
+            batch_size = qt.yield_per or self.STREAM_YIELD_PER
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    return
+                yield batch
+
+        def _gather_batch_tags(records):
+            if not batch_tags:
+                return None
+            fact_pks = [_fact_pk(_split_record(record)[0]) for record in records]
+            return self.gather_fact_tags(fact_pks, interner=interner)
+
+        def _fact_pk(fact):
+            if bulk_hydrate:
+                # The first of the BULK_HYDRATE_COLUMNS, facts.c.id.
+                return fact[0]
+            return fact.pk
+
         # The list of results returned to the user is one of:
         # - A list of raw AlchemyFact objects;
         # - A list of hydrated Fact objects (or of a caller-specified subclass); or
@@ -244,21 +859,39 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             # Because not add_aggregates, results are single items, AlchemyFact.
             # Note also that we ignore qt.named_tuples here (which does not
             # apply unless also qt.include_stats, which is not True here).
-            records = [fact.as_hamster(self.store) for fact in records]
+            records = [
+                fact.as_hamster(self.store, interner=interner) for fact in records
+            ]
             return records
 
         def _gather_process_facts_and_aggs(records):
             results = []
+            tags_by_fact = _gather_batch_tags(records)
             # PROFILING: Here's a loop over all the results!
             # If the user didn't limit or restrict their query,
             # this could be all the Facts!
-            for fact, *cols in records:
-                fact_or_tuple = _process_record(fact, cols)
+            for record in records:
+                fact, cols = _split_record(record)
+                fact_or_tuple = _process_record(fact, cols, tags_by_fact)
                 results.append(fact_or_tuple)
             return results
 
-        def _process_record(fact, cols):
+        def _split_record(record):
+            # Split the Fact (or, if bulk_hydrate, its row values) from any
+            # aggregate and tags columns that follow it.
+            if bulk_hydrate:
+                return record[:n_bulk_cols], list(record[n_bulk_cols:])
+            if isinstance(record, AlchemyFact):
+                # Because batch_tags (and no aggregates), the AlchemyFact is
+                # the only entity selected.
+                return record, []
+            fact, *cols = record
+            return fact, cols
+
+        def _process_record(fact, cols, tags_by_fact=None):
             new_tags = _process_record_tags(cols)
+            if tags_by_fact is not None:
+                new_tags = tags_by_fact[_fact_pk(fact)]
             new_fact = _process_record_prepare_fact(fact, new_tags)
             _process_record_reduce_aggregates(cols)
             return _process_record_new_fact_or_tuple(new_fact, cols)
@@ -268,7 +901,7 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
         def _process_record_tags(cols):
             # If tags were fetched, they'll be coalesced in the final column.
             new_tags = None
-            if cols and not lazy_tags:
+            if cols and concat_tags:
                 tags = cols.pop()
                 new_tags = tags.split(magic_tag_sep) if tags else []
             return new_tags
@@ -276,13 +909,18 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
         # +++
 
         def _process_record_prepare_fact(fact, new_tags):
+            if bulk_hydrate:
+                return self.bulk_hydrate_fact(
+                    fact, new_tags, set_freqs=qt.is_grouped, interner=interner,
+                )
+
             # Unless the caller wants raw results, create a Fact.
             if not qt.raw:
                 # Create a new, first-class Fact (or FactDressed). And if
                 # the results are aggregate, create a frequency distribution,
                 # or number of uses per tag (stored at tag.freq).
                 return fact.as_hamster(
-                    self.store, new_tags, set_freqs=qt.is_grouped,
+                    self.store, new_tags, set_freqs=qt.is_grouped, interner=interner,
                 )
 
             # Even if user wants raw results, still attach the tags.
@@ -350,9 +988,12 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
         # ***
 
-        def _get_all_prepare_tags_subquery(query):
+        def _get_all_prepare_tags_subquery(query, page_ids):
             if lazy_tags and not qt.match_tags:
                 return query, None
+            if not concat_tags and not lazy_tags:
+                # Because batch_tags, and not filtering or sorting by Tag.
+                return query, None
 
             tags_subquery = query
             # (lb): Always include tags. We could let SQLAlchemy lazy load,
@@ -380,7 +1021,22 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             if qt.match_tags:
                 tags_subquery = self.query_filter_by_tags(tags_subquery, qt)
 
-            tags_subquery = tags_subquery.group_by(AlchemyFact.pk)
+            # Restrict the subquery to the same Facts as the outer query (as far
+            # as can be done without joins), otherwise SQLite materializes the
+            # tag names of every Fact in the store (the outer join on pk would
+            # discard the extras, anyway).
+            if page_ids is not None:
+                tags_subquery = tags_subquery.filter(AlchemyFact.pk.in_(page_ids))
+            else:
+                tags_subquery = _get_all_filter_by_facts_only(tags_subquery)
+
+            # Group by ``+facts.id``, not ``facts.id`` (which makes the same
+            # groups), otherwise SQLite scans every Fact, in pk order, to save
+            # sorting the groups, rather than using the time window indexes.
+            # (The unary plus is SQLite's idiom for disqualifying a term.)
+            tags_subquery = tags_subquery.group_by(UnaryExpression(
+                AlchemyFact.pk.__clause_element__(), operator=custom_op('+'),
+            ))
 
             # (lb): 2019-01-22: Old comment re: joinedload. Leaving here as
             # documentation in case I try using joinedload again in future.
@@ -396,12 +1052,89 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
             return query, tags_subquery
 
+        def _get_all_filter_by_facts_only(query):
+            # Apply the outer query's filters that only reference facts.
+            query = self.query_filter_by_fact_times(
+                query, qt.since, qt.until, qt.endless, qt.partial,
+            )
+            # (The deleted column leads the time window indexes.)
+            query = query_apply_true_or_not(query, AlchemyFact.deleted, qt.deleted)
+            query = query_filter_by_search_term(query)
+            query = _get_all_filter_by_seek(query)
+            query = _get_all_filter_by_chunk(query)
+            return query
+
+        def _get_all_prepare_page_ids():
+            # If the query is for a page of Facts, and if the filters that only
+            # reference facts are all the query's filters, then the page of Fact
+            # IDs can be found by an index seek, without joins or grouping. The
+            # query (and its tags subquery) can then just look up those Facts.
+            # - Otherwise, SQLite groups every matching Fact (in a temp B-tree)
+            #   before it sorts them, and only then does it apply the limit.
+            if (
+                not seekable
+                or not qt.limit
+                or qt.match_activities
+                or qt.match_categories
+                or qt.match_tags
+                or qt.key
+                or qt.exclude_ongoing
+            ):
+                return None
+            page_query = self.store.session.query(AlchemyFact.pk)
+            page_query = _get_all_filter_by_facts_only(page_query)
+            direction = query_sort_order_at_index(qt.sort_orders, 0)
+            page_query = self.query_order_by_start(page_query, direction)
+            # (The outer query applies the offset, so include the skipped rows.)
+            page_query = page_query.limit(
+                bindparam('page_limit', qt.limit + max(qt.offset or 0, 0)),
+            )
+            page_ids = page_query.subquery('page_ids')
+            return select([page_ids.c.id])
+
         # ***
 
-        def _get_all_prepare_span_cols(query):
+        def _get_all_prepare_time_slices(query):
+            if not qt.time_bucket:
+                return query, None
+
+            # Clip the Facts to the time window, and end the active Fact 'now'.
+            start_col = AlchemyFact.start_epoch
+            if qt.since:
+                start_col = func.max(start_col, bindparam('since_epoch'))
+            end_col = func.coalesce(
+                AlchemyFact.end_epoch,
+                bindparam('now_epoch', fact_time_epoch(self.store.now)),
+            )
+            if qt.until:
+                end_col = func.min(end_col, bindparam('until_epoch'))
+
+            # Like the tags subquery, only splice the Facts that match the
+            # filters that only reference facts, and let the outer query's
+            # join discard any extras.
+            facts_query = self.store.session.query(
+                AlchemyFact.pk.label('fact_id'),
+                start_col.label('slice_start'),
+                end_col.label('fact_end'),
+            )
+            facts_query = _get_all_filter_by_facts_only(facts_query)
+
+            slices = self.time_bucket_slices(
+                qt.time_bucket, facts_query.subquery('bucket_facts'),
+            )
+            query = query.join(slices, slices.c.fact_id == AlchemyFact.pk)
+
+            return query, slices
+
+        # ***
+
+        def _get_all_prepare_span_cols(query, slices):
             if not add_aggregates:
                 return query, None
 
+            if slices is not None:
+                return _get_all_prepare_span_cols_slices(query, slices)
+
             span_cols = []
 
             query, group_span_col = _get_all_prepare_span_cols_group_span(query)
@@ -418,46 +1151,53 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
             return query, span_cols
 
+        def _get_all_prepare_span_cols_slices(query, slices):
+            # Same columns as the other span_cols, but of the Fact slices.
+            group_span_col = (
+                func.sum(slices.c.slice_end - slices.c.slice_start) / 86400.0
+            ).label('duration')
+
+            query, group_count_col = _get_all_prepare_span_cols_group_count(query)
+
+            first_start_col = type_coerce(
+                func.datetime(func.min(slices.c.slice_start), 'unixepoch'),
+                FactDateTime,
+            ).label('first_start')
+
+            final_end_col = type_coerce(
+                func.datetime(func.max(slices.c.slice_end), 'unixepoch'),
+                FactDateTime,
+            ).label('final_end')
+
+            span_cols = [group_span_col, group_count_col, first_start_col, final_end_col]
+            query = query.add_columns(group_span_col, first_start_col, final_end_col)
+
+            return query, span_cols
+
         def _get_all_prepare_span_cols_group_span(query):
             # For most Facts, we could calculate the time window span with
             # simple end-minus-start math, e.g.,
-            #   func.julianday(AlchemyFact.end)
-            #    - func.julianday(AlchemyFact.start)
+            #   AlchemyFact.end_epoch - AlchemyFact.start_epoch
             # But this would miss the final ongoing, active Fact. So check
             # first if end is None, and use the 'now' time if so.
-            endornow_col = case(
-                [(AlchemyFact.end != None, AlchemyFact.end)],  # noqa: E711
-                else_=query_prepare_datetime(self.store.now),
+            # - (lb): We used to use julianday(end) - julianday(start), but
+            #   that parses two text timestamps per row, and it accumulates
+            #   float error. The epoch columns are integers, so the sum is
+            #   exact to the second, and we only divide (to days) at the end.
+            endornow_col = func.coalesce(
+                AlchemyFact.end_epoch,
+                bindparam('now_epoch', fact_time_epoch(self.store.now)),
             )
 
-            span_col = _get_all_prepare_span_cols_group_span_dbms_specific(endornow_col)
+            span_col = endornow_col - AlchemyFact.start_epoch
 
-            group_span_col = func.sum(
-                span_col
+            # Report the duration in days, as the callers expect.
+            group_span_col = (
+                func.sum(span_col) / 86400.0
             ).label('duration')
             query = query.add_columns(group_span_col)
             return query, group_span_col
 
-        def _get_all_prepare_span_cols_group_span_dbms_specific(endornow_col):
-            # MAYBE/2020-05-15: Implement this feature for other DBMS engines.
-            # - The julianday function is SQLite-specific.
-            #   - A "pure" fix might mean doing the calculation after getting
-            #     all the results (i.e., post-processing the SQL response).
-            #   - (lb): But I like how easy julianday is. It works, and I personally
-            #     have no stake in using another DBMS engine. We can add additional
-            #     support as needed (i.e., as users' non-SQLite interests dictate).
-            if self.store.config['db.engine'] == 'sqlite':
-                return _get_all_prepare_span_cols_group_span_sqlite(endornow_col)
-            else:  # pragma: no cover
-                # See exception thrown by must_support_db_engine_funcs() if not SQLite.
-                assert False  # Not reachable.
-
-        def _get_all_prepare_span_cols_group_span_sqlite(endornow_col):
-            span_col = (
-                func.julianday(endornow_col) - func.julianday(AlchemyFact.start)
-            )
-            return span_col
-
         def _get_all_prepare_span_cols_group_count(query):
             group_count_col = func.count(
                 distinct(AlchemyFact.pk)
@@ -531,7 +1271,7 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             elif qt.group_category:
                 # One Category per result, but one or more Activities were flattened.
                 query, activities_col = _get_all_prepare_actg_cols_activities(query)
-            elif qt.group_tags or qt.group_days:
+            elif qt.group_tags or qt.is_grouped_by_time:
                 # When grouping by tags, both Activities and Categories are grouped.
                 query, actegories_col = _get_all_prepare_actg_cols_actegories(query)
 
@@ -570,36 +1310,34 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
         # ***
 
-        # MAYBE/2020-05-19: Splice Facts at midnight so that each
-        # day is reported as 24 hours, rather than reported as the
-        # sum of all the complete Facts that start on the day (in
-        # which case, a Fact that starts the day before that runs
-        # into the day will not be counted (undercount); and a Fact
-        # that starts on the day by ends on the next will be have
-        # all its time counted (over-count).
-
-        def _get_all_prepare_start_date(query):
+        # Note that plain group_days groups Facts by the date they start, so a
+        # Fact that starts the day before and runs into the day is not counted
+        # (undercount), and a Fact that starts on the day but ends on the next
+        # has all its time counted (over-count). (The daily rollups use these
+        # same semantics.) To splice the Facts at midnight (or day_start), so
+        # each day is reported as (at most) 24 hours, use splice_days; or use
+        # group_hours, group_weeks, or group_months (see GatherBucketManager).
+        # - MAYBE: Prepare Sprint reports using... not sure.
+        #     if group_sprint???
+
+        def _get_all_prepare_start_date(query, slices):
             # If we were not going to return the start_date with the results,
             # rather than checking `not add_aggregates`, we would instead
-            # check `not qt.group_days` and return if so.
+            # check `not qt.is_grouped_by_time` and return if so.
             if not add_aggregates:
                 return query, None
 
-            # FIXME/MAYBE/2020-05-19: Prepare other time-grouped reports. See:
-            #   https://www.sqlite.org/lang_datefunc.html
-            # - MAYBE: Prepare monthly reports using 'start of month':
-            #     SELECT date('now', 'start of month');
-            #     if group_months: ...
-            # - MAYBE: Prepare weekly reports using `weekday N` (0=Sunday);
-            #     if group_weeks: ...
-            # - MAYBE: Prepare Sprint reports using... not sure.
-            #     if group_sprint???
-
-            start_date = func.date(
-                AlchemyFact.start,
-            ).label("start_date")
+            if slices is not None:
+                # The name of the time period, e.g., its start date.
+                start_date = self.time_bucket_label(
+                    qt.time_bucket, slices.c.slice_start,
+                ).label("start_date")
+            else:
+                start_date = func.date(
+                    AlchemyFact.start,
+                ).label("start_date")
             query = query.add_columns(start_date)
-            if qt.group_days:
+            if qt.is_grouped_by_time:
                 query = query.group_by(start_date)
 
             return query, start_date
@@ -613,6 +1351,8 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
                 or qt.search_terms
                 or qt.sort_cols_has_any('activity')
                 or qt.sort_cols_has_any('category')
+                # b/c BULK_HYDRATE_COLUMNS
+                or bulk_hydrate
             )
             if (
                 add_aggregates
@@ -639,18 +1379,100 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
                 return query
 
             filters = []
-            for term in qt.search_terms:
-                filters.append(AlchemyFact.description.ilike('%{}%'.format(term)))
+            for idx, term in enumerate(qt.search_terms):
+                filters.append(self.query_filter_description_matches(term, idx))
                 if qt.broad_match:
-                    filters.append(AlchemyActivity.name.ilike('%{}%'.format(term)))
-                    filters.append(AlchemyCategory.name.ilike('%{}%'.format(term)))
-                    filters.append(AlchemyTag.name.ilike('%{}%'.format(term)))
+                    filters.extend(query_filter_names_match(term, idx))
             query = query.filter(or_(*filters))
 
             return query
 
+        def query_filter_names_match(term, idx):
+            # Match the names in the (relatively small) item tables, and then
+            # use the IDs to find the Facts, so that the (relatively large)
+            # facts table is not scanned, and LIKE is not run on every Fact.
+            like_term = bindparam('search_like_{}'.format(idx), '%{}%'.format(term))
+            activity_ids = select([AlchemyActivity.pk]).where(
+                AlchemyActivity.name.ilike(like_term),
+            )
+            category_activity_ids = select([AlchemyActivity.pk]).where(
+                AlchemyActivity.category_id.in_(
+                    select([AlchemyCategory.pk]).where(
+                        AlchemyCategory.name.ilike(like_term),
+                    ),
+                ),
+            )
+            tag_fact_ids = select([fact_tags.c.fact_id]).where(
+                fact_tags.c.tag_id.in_(
+                    select([AlchemyTag.pk]).where(AlchemyTag.name.ilike(like_term)),
+                ),
+            )
+            return [
+                AlchemyFact.activity_id.in_(activity_ids),
+                AlchemyFact.activity_id.in_(category_activity_ids),
+                AlchemyFact.pk.in_(tag_fact_ids),
+            ]
+
         # ***
 
+        def _get_all_filter_by_seek(query):
+            if not qt.seek:
+                return query
+            seek_start, seek_end, seek_pk = self.seek_token_decode(qt.seek)
+            seek_start = bindparam('seek_start', seek_start)
+            seek_pk = bindparam('seek_pk', seek_pk)
+            if seek_end is not None:
+                seek_end = bindparam('seek_end', seek_end)
+            descending = (
+                qt.sort_cols
+                and query_sort_order_at_index(qt.sort_orders, 0) is desc
+            )
+            # Filter for the Facts ordered after the token, i.e.,
+            #   (start, end, pk) > (seek_start, seek_end, seek_pk),
+            # or < if descending. But the end is NULL for the active Fact,
+            # which SQLite sorts before any time, so spell out the comparison.
+            # - Lead with a plain start bound, so SQLite seeks the start index.
+            if not descending:
+                start_bound = AlchemyFact.start >= seek_start
+                start_after = AlchemyFact.start > seek_start
+                pk_after = AlchemyFact.pk > seek_pk
+                if seek_end is None:
+                    end_after = AlchemyFact.end != None  # noqa: E711
+                else:
+                    end_after = AlchemyFact.end > seek_end
+            else:
+                start_bound = AlchemyFact.start <= seek_start
+                start_after = AlchemyFact.start < seek_start
+                pk_after = AlchemyFact.pk < seek_pk
+                if seek_end is None:
+                    end_after = false()
+                else:
+                    end_after = or_(
+                        AlchemyFact.end < seek_end,
+                        AlchemyFact.end == None,  # noqa: E711
+                    )
+            if seek_end is None:
+                end_same = AlchemyFact.end == None  # noqa: E711
+            else:
+                end_same = AlchemyFact.end == seek_end
+            query = query.filter(start_bound, or_(
+                start_after,
+                and_(
+                    AlchemyFact.start == seek_start,
+                    or_(end_after, and_(end_same, pk_after)),
+                ),
+            ))
+            return query
+
+        def _get_all_filter_by_chunk(query):
+            if not parallel:
+                return query
+            # The chunk bounds are bound per chunk (see gather_parallel_chunks).
+            return query.filter(and_(
+                AlchemyFact.start >= bindparam('chunk_since'),
+                AlchemyFact.start < bindparam('chunk_until'),
+            ))
+
         def _get_all_filter_by_ongoing(query):
             if not qt.exclude_ongoing:
                 return query
@@ -727,7 +1549,10 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             # (and in a specific order). We'd also have to at least specify
             # AlchemyFact.pk so that SQLAlchemy uses `FROM facts`, and not,
             # e.g., `FROM category`. So use all Fact cols to start the select.
-            columns = [AlchemyFact]
+            if not bulk_hydrate:
+                columns = [AlchemyFact]
+            else:
+                columns = list(GatherFactManager.BULK_HYDRATE_COLUMNS)
 
             # The order of the columns added here is reflected by RESULT_GRP_INDEX.
             # - Note also if `add_aggregates` is True, then both span_cols and
@@ -755,7 +1580,40 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
 
         # ***
 
-        return _get_all_facts()
+        return _gather()
+
+    # ***
+
+    def query_order_by_group_start(self, query, direction, span_cols):
+        """Order the groups by their first start, then by their final end.
+
+        (lb): Not by the Fact columns, which, in a grouped query, are from
+        whichever of the group's Facts SQLite happened to read last. The
+        final end is NULL if the group's only Fact is the active Fact, which
+        sorts last, as though it ends at the end of time.
+        """
+        first_start = span_cols[GatherFactManager.RESULT_GRP_INDEX['first_start']]
+        final_end = span_cols[GatherFactManager.RESULT_GRP_INDEX['final_end']]
+        order_cols = [first_start, final_end.is_(None), final_end]
+        return self.query_order_by_cols(query, direction, order_cols)
+
+    # ***
+
+    def seek_token(self, fact):
+        """Return the continuation token that seeks to the Facts after ``fact``."""
+        end = query_prepare_datetime(fact.end) if fact.end else None
+        payload = json.dumps([query_prepare_datetime(fact.start), end, fact.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def seek_token_decode(self, token):
+        """Return the (start, end, pk) from a token made by ``seek_token``."""
+        try:
+            payload = base64.urlsafe_b64decode(token.encode())
+            start, end, pk = json.loads(payload.decode())
+        except (AttributeError, TypeError, ValueError):
+            errmsg = _('Unrecognized continuation token: ‘{}’').format(token)
+            raise ValueError(errmsg)
+        return start, end, pk
 
     # ***
 
@@ -776,7 +1634,10 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
         assert has_facts
 
         if sort_col == 'start' or not sort_col:
-            query = self.query_order_by_start(query, direction)
+            if qt.is_grouped and span_cols is not None:
+                query = self.query_order_by_group_start(query, direction, span_cols)
+            else:
+                query = self.query_order_by_start(query, direction)
         elif sort_col == 'time':
             i_duration = GatherFactManager.RESULT_GRP_INDEX['duration']
             query = query.order_by(direction(span_cols[i_duration]))
@@ -794,7 +1655,7 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             if (
                 qt.group_activity
                 or qt.group_tags
-                or qt.group_days
+                or qt.is_grouped_by_time
                 or not qt.group_category
             ):
                 query = query.order_by(direction(AlchemyActivity.name))
@@ -807,7 +1668,7 @@ class GatherFactManager(BaseAlchemyManager, BaseFactManager):
             if (
                 qt.group_category
                 or qt.group_tags
-                or qt.group_days
+                or qt.is_grouped_by_time
                 or not qt.group_activity
             ):
                 query = query.order_by(direction(AlchemyCategory.name))
@@ -0,0 +1,297 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.pool import NullPool
+
+from ..objects import AlchemyFact
+
+__all__ = (
+    'GatherParallelManager',
+)
+
+
+class GatherParallelManager(object):
+    """Range-partitioned, parallel gather() aggregation (see parallel_chunks).
+
+    The grouped query is built once, with an additional filter on the Fact
+    start time, and then run once per time chunk, each on its own read-only
+    connection, from a pool of threads. (The sqlite3 module releases the GIL
+    while SQLite steps through a statement, so the chunks' queries run in
+    parallel.) Because each Fact starts in exactly one chunk, the chunks'
+    groups can be merged by summing their spans and counts, taking the least
+    first start and the greatest final end, and concatenating their name and
+    Tag aggregates, which the usual result processing then reduces to sets
+    and Tag frequencies, just as if the groups came from the one query.
+    """
+
+    # The open ends of the first and final chunks.
+    CHUNK_SINCE_MIN = datetime.datetime.min
+    CHUNK_UNTIL_MAX = datetime.datetime.max
+
+    # The sort_cols that the merged groups can be ordered by.
+    PARALLEL_SORT_COLS = set(['start', 'time', 'usage', 'day'])
+
+    def __init__(self, *args, **kwargs):
+        super(GatherParallelManager, self).__init__(*args, **kwargs)
+        self._gather_parallel_engine = None
+
+    # ***
+
+    def gather_parallel_eligible(self, query_terms, lazy_tags=False):
+        """Return True if gather() can aggregate the time chunks in parallel."""
+        qt = query_terms
+
+        def _gather_parallel_eligible():
+            return (
+                qt.parallel_chunks
+                and qt.parallel_chunks > 1
+                and qt.is_grouped
+                and not qt.raw
+                and not lazy_tags
+                and not qt.stream
+                and set(qt.sort_cols or []).issubset(self.PARALLEL_SORT_COLS)
+                and self.gather_parallel_store_eligible()
+            )
+
+        return bool(_gather_parallel_eligible())
+
+    def gather_parallel_store_eligible(self):
+        """Return True if the store can be read on other connections, in parallel."""
+        # Each chunk needs its own connection to the same database, so
+        # the store must be a file (each :memory: connection is its own
+        # database). And the other connections cannot see the session's
+        # pending changes, nor its flushed but uncommitted ones, so don't
+        # bother if there are any. Nor can they read from gather_many's
+        # snapshot.
+        session = self.store.session
+        return (
+            self.store.config['db.engine'] == 'sqlite'
+            and self.store.config['db.path'] != ':memory:'
+            and not (session.new or session.dirty or session.deleted)
+            and not self.store.read_snapshot_active
+            and not self.store.write_pending()
+        )
+
+    # ***
+
+    @property
+    def gather_parallel_engine(self):
+        """The (read-only, unpooled) engine that runs the chunks' queries."""
+        if self._gather_parallel_engine is None:
+            path = os.path.abspath(self.store.config['db.path'])
+            url = 'sqlite:///file:{}?mode=ro&uri=true'.format(quote(path))
+            engine = create_engine(url, poolclass=NullPool)
+            # The journal_mode cannot be changed on a read-only connection
+            # (and the WAL mode, if used, persists in the database, anyway).
+            pragmas = self.store.sqlite_pragmas
+            pragmas.pop('journal_mode', None)
+            if pragmas:
+                self.store.listen_sqlite_pragmas(engine, pragmas)
+            self._gather_parallel_engine = engine
+        return self._gather_parallel_engine
+
+    def query_profile_engines(self, query_terms):
+        engines = super(GatherParallelManager, self).query_profile_engines(query_terms)
+        if self.gather_parallel_eligible(query_terms):
+            # Also record the chunks' queries (see gather_profiled).
+            engines.append(self.gather_parallel_engine)
+        return engines
+
+    def gather_parallel_chunks(self, query_terms):
+        """
+        Return the (chunk_since, chunk_until) bind parameters for each chunk.
+
+        Splits the query's time window (or, if open-ended, the span of the
+        stored Facts' start times) into parallel_chunks equal parts. The
+        first and final chunks are open-ended, so that every Fact the query
+        matches (including, e.g., a partial Fact that starts before since)
+        starts in exactly one chunk.
+        """
+        qt = query_terms
+        since, until = qt.since, qt.until
+        if since is None or until is None:
+            first_start, final_start = self.store.session.query(
+                func.min(AlchemyFact.start), func.max(AlchemyFact.start),
+            ).filter(AlchemyFact.deleted == False).one()  # noqa: E712
+            since = since or first_start
+            until = until or final_start
+        bounds = [self.CHUNK_SINCE_MIN]
+        if since is not None and until is not None and since < until:
+            step = (until - since) / qt.parallel_chunks
+            bounds.extend(since + step * idx for idx in range(1, qt.parallel_chunks))
+        bounds.append(self.CHUNK_UNTIL_MAX)
+        return [
+            {'chunk_since': chunk_since, 'chunk_until': chunk_until}
+            for chunk_since, chunk_until in zip(bounds, bounds[1:])
+        ]
+
+    def gather_parallel_fetch(self, statement, chunks):
+        """Run the statement once per chunk, in parallel, and return all the rows.
+
+        Returns a list of each chunk's list of rows, in chunk order.
+        """
+        engine = self.gather_parallel_engine
+
+        def _fetch_chunk(params):
+            with engine.connect() as conn:
+                return conn.execute(statement, params).fetchall()
+
+        max_workers = min(len(chunks), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_fetch_chunk, chunks))
+
+    # ***
+
+    def gather_parallel_merge(self, query_terms, chunks_rows, n_fact_cols, tag_sep):
+        """
+        Merge the chunks' grouped rows, as if they were from the one query.
+
+        Args:
+            query_terms: The QueryTerms used to group the rows.
+
+            chunks_rows: Each chunk's list of rows, i.e., the BULK_HYDRATE_COLUMNS
+                values, followed by the aggregate columns (see RESULT_GRP_INDEX),
+                and ending with the concatenated Tag names.
+
+            n_fact_cols: The number of leading (BULK_HYDRATE_COLUMNS) values.
+
+            tag_sep: The group_concat separator.
+
+        Returns:
+            The merged rows, as lists, ordered by the query's sort_cols, and
+            with the query's limit and offset applied.
+        """
+        qt = query_terms
+        i_duration = n_fact_cols + self.RESULT_GRP_INDEX['duration']
+        i_group_count = n_fact_cols + self.RESULT_GRP_INDEX['group_count']
+        i_first_start = n_fact_cols + self.RESULT_GRP_INDEX['first_start']
+        i_final_end = n_fact_cols + self.RESULT_GRP_INDEX['final_end']
+        i_start_date = n_fact_cols + self.RESULT_GRP_INDEX['start_date']
+        i_concat_cols = [
+            n_fact_cols + self.RESULT_GRP_INDEX['activities'],
+            n_fact_cols + self.RESULT_GRP_INDEX['actegories'],
+            n_fact_cols + self.RESULT_GRP_INDEX['categories'],
+            # The Tag names are always the final column.
+            -1,
+        ]
+        # The activities.c.id, activities.c.name, and categories.c.id columns.
+        i_activity_id, i_activity_name, i_category_id = 6, 7, 10
+
+        def _gather_parallel_merge():
+            groups = OrderedDict()
+            for rows in chunks_rows:
+                for row in rows:
+                    group_key = _group_key(row)
+                    group = groups.get(group_key)
+                    if group is None:
+                        group = list(row)
+                        group[i_duration] = _seconds(row[i_duration])
+                        groups[group_key] = group
+                    else:
+                        _merge_row(group, row)
+            merged = list(groups.values())
+            for group in merged:
+                # Same as the query's SUM(seconds) / 86400.0.
+                group[i_duration] = group[i_duration] / 86400.0
+            merged = _sort_rows(merged)
+            return _apply_limit_offset(merged)
+
+        def _group_key(row):
+            # Mirror gather()'s GROUP BY (see query_group_by_meta).
+            group_key = []
+            if qt.group_activity and qt.group_category:
+                group_key.append(row[i_activity_id])
+            elif qt.group_activity:
+                group_key.append(row[i_activity_name])
+            elif qt.group_category:
+                group_key.append(row[i_category_id])
+            if qt.group_tags:
+                group_key.append(frozenset((row[-1] or '').split(tag_sep)))
+            if qt.is_grouped_by_time:
+                group_key.append(row[i_start_date])
+            return tuple(group_key)
+
+        def _seconds(duration):
+            # Sum the spans as whole seconds (as the query does), and not as days,
+            # lest the merged duration differ from the one query's in the last bit.
+            return round((duration or 0) * 86400)
+
+        def _merge_row(group, row):
+            group[i_duration] += _seconds(row[i_duration])
+            group[i_group_count] += row[i_group_count]
+            group[i_first_start] = _least(group[i_first_start], row[i_first_start])
+            group[i_final_end] = _greatest(group[i_final_end], row[i_final_end])
+            for index in i_concat_cols:
+                group[index] = _concat(group[index], row[index])
+
+        def _least(lhs, rhs):
+            # Like MIN() and MAX(), ignore NULLs.
+            if lhs is None or rhs is None:
+                return lhs if rhs is None else rhs
+            return min(lhs, rhs)
+
+        def _greatest(lhs, rhs):
+            if lhs is None or rhs is None:
+                return lhs if rhs is None else rhs
+            return max(lhs, rhs)
+
+        def _concat(lhs, rhs):
+            # The 0 placeholder (an aggregate that's not selected) stays put.
+            if lhs == 0:
+                return lhs
+            if not lhs:
+                return rhs
+            if not rhs:
+                return lhs
+            return lhs + tag_sep + rhs
+
+        def _sort_rows(rows):
+            max_end = self.CHUNK_UNTIL_MAX
+            sort_keys = {
+                'start': lambda row: (row[i_first_start], row[i_final_end] or max_end),
+                'time': lambda row: row[i_duration] or 0,
+                'usage': lambda row: row[i_group_count],
+                'day': lambda row: row[i_start_date] or '',
+            }
+            rows = sorted(rows, key=sort_keys['start'])
+            # Like gather_rollups_sort, apply the sorts from last to first.
+            sort_cols = list(enumerate(qt.sort_cols or []))
+            for idx, sort_col in reversed(sort_cols):
+                try:
+                    reverse = qt.sort_orders[idx] == 'desc'
+                except (IndexError, TypeError):
+                    reverse = False
+                rows = sorted(rows, key=sort_keys[sort_col], reverse=reverse)
+            return rows
+
+        def _apply_limit_offset(rows):
+            # Same semantics as query_apply_limit_offset.
+            if qt.offset and qt.offset > 0:
+                rows = rows[qt.offset:]
+            if qt.limit and qt.limit > 0:
+                rows = rows[:qt.limit]
+            return rows
+
+        return _gather_parallel_merge()
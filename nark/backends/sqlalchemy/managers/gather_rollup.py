@@ -0,0 +1,446 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from gettext import gettext as _
+
+from collections import Counter, OrderedDict
+from datetime import time
+
+from sqlalchemy import select
+
+from ....items.fact import Fact
+from ....items.tag import Tag
+from ..objects import AlchemyActivity, AlchemyTag, fact_rollups
+
+__all__ = (
+    'GatherRollupManager',
+)
+
+
+# The aggregate that (re)builds the fact_rollups rows, either for the whole
+# store, or just for the partitions listed in fact_rollups_dirty.
+# - Keep this in sync with the fact_rollups definition in objects.py.
+FACT_ROLLUPS_AGGREGATE = (
+    "SELECT day, activity_id, tag_key,"
+    " SUM(end_epoch - start_epoch), COUNT(*), MIN(start_time), MAX(end_time)"
+    " FROM ("
+    "SELECT date(facts.start_time) AS day, facts.activity_id,"
+    " COALESCE(("
+    "SELECT group_concat(tag_id) FROM ("
+    "SELECT DISTINCT fact_tags.tag_id FROM fact_tags"
+    " WHERE fact_tags.fact_id = facts.id ORDER BY fact_tags.tag_id"
+    ")"
+    "), '') AS tag_key,"
+    " facts.start_epoch, facts.end_epoch, facts.start_time, facts.end_time"
+    " FROM facts{join}"
+    " WHERE NOT facts.deleted"
+    " AND facts.start_time IS NOT NULL"
+    " AND facts.end_time IS NOT NULL"
+    ")"
+    " GROUP BY day, activity_id, tag_key"
+)
+
+FACT_ROLLUPS_DIRTY_JOIN = (
+    " JOIN (SELECT DISTINCT day, activity_id FROM fact_rollups_dirty) AS dirty"
+    " ON facts.activity_id IS dirty.activity_id"
+    " AND facts.start_time >= dirty.day"
+    " AND facts.start_time < date(dirty.day, '+1 day')"
+)
+
+FACT_ROLLUPS_INSERT = (
+    "INSERT INTO fact_rollups"
+    " (day, activity_id, tag_key, seconds, fact_count, first_start, final_end) "
+)
+
+FACT_ROLLUPS_COLUMNS = (
+    "SELECT day, activity_id, tag_key, seconds, fact_count, first_start, final_end"
+    " FROM fact_rollups"
+)
+
+
+class GatherRollupManager(object):
+    """Daily rollups (pre-aggregated Fact totals) support for FactManager."""
+
+    def __init__(self, *args, **kwargs):
+        super(GatherRollupManager, self).__init__(*args, **kwargs)
+        self._has_fact_rollups = None
+
+    # ***
+
+    @property
+    def has_fact_rollups(self):
+        """True if the store has the fact_rollups table (see migration 008)."""
+        if self._has_fact_rollups is None:
+            self._has_fact_rollups = (
+                self.store.config['db.engine'] == 'sqlite'
+                and self.store_has_table('fact_rollups')
+            )
+        return self._has_fact_rollups
+
+    # ***
+
+    def refresh_rollups(self):
+        """
+        Re-aggregate the daily rollups of any Facts changed since last time.
+
+        This writes, so the store calls it just before each commit (see
+        SQLAlchemyStore.session_before_commit), and the refresh is committed,
+        or rolled back, with the writes that dirtied the rollups. Reads do not
+        call it; while the rollups are stale, gather() uses the Facts instead.
+        """
+        session = self.store.session
+        # Write any pending Facts, so the triggers mark their partitions.
+        session.flush()
+        if self.rollups_current():
+            return
+        session.execute(
+            "DELETE FROM fact_rollups WHERE EXISTS ("
+            "SELECT 1 FROM fact_rollups_dirty AS dirty"
+            " WHERE dirty.day = fact_rollups.day"
+            " AND dirty.activity_id IS fact_rollups.activity_id"
+            ")"
+        )
+        session.execute(
+            FACT_ROLLUPS_INSERT
+            + FACT_ROLLUPS_AGGREGATE.format(join=FACT_ROLLUPS_DIRTY_JOIN)
+        )
+        session.execute('DELETE FROM fact_rollups_dirty')
+
+    def rollups_current(self):
+        """Return True unless some Facts changed since the rollups were refreshed."""
+        session = self.store.session
+        if session.autoflush:
+            # Like a Query would, so the triggers mark any pending changes.
+            session.flush()
+        return not session.execute('SELECT 1 FROM fact_rollups_dirty LIMIT 1').scalar()
+
+    def rebuild_rollups(self):
+        """Discard and re-aggregate all the daily rollups, and commit."""
+        session = self.store.session
+        session.flush()
+        session.execute('DELETE FROM fact_rollups')
+        session.execute(FACT_ROLLUPS_INSERT + FACT_ROLLUPS_AGGREGATE.format(join=''))
+        session.execute('DELETE FROM fact_rollups_dirty')
+        session.commit()
+        self.store.logger.debug(_('Rebuilt the daily rollups.'))
+
+    def check_rollups(self):
+        """
+        Compare the daily rollups against the Facts they summarize.
+
+        Returns:
+            list: The (day, activity_id, tag_key) of each inconsistent rollup
+            (sorted, and without duplicates); an empty list if all's well.
+            (The rollups that are waiting to be refreshed, i.e., of Facts
+            changed since the last commit, are not checked.)
+        """
+        if self.store.session.autoflush:
+            self.store.session.flush()
+        aggregate = FACT_ROLLUPS_AGGREGATE.format(join='')
+        mismatches = self.store.session.execute(
+            "SELECT day, activity_id, tag_key FROM ("
+            "SELECT day, activity_id, tag_key FROM ("
+            "{columns} EXCEPT {aggregate}"
+            ") UNION SELECT day, activity_id, tag_key FROM ("
+            "{aggregate} EXCEPT {columns}"
+            ")) AS mismatch WHERE NOT EXISTS ("
+            "SELECT 1 FROM fact_rollups_dirty AS dirty"
+            " WHERE dirty.day = mismatch.day"
+            " AND dirty.activity_id IS mismatch.activity_id"
+            ")".format(columns=FACT_ROLLUPS_COLUMNS, aggregate=aggregate)
+        ).fetchall()
+        return sorted(
+            [tuple(mismatch) for mismatch in mismatches],
+            key=lambda key: (key[0], key[1] or 0, key[2]),
+        )
+
+    # ***
+
+    # The sort_cols the rollups can order by (see gather_rollups_sort).
+    ROLLUP_SORT_COLS = set(['start', 'time', 'usage', 'day'])
+
+    def gather_rollups_eligible(self, query_terms, lazy_tags=False):
+        """Return True if gather() can answer from the daily rollups."""
+        qt = query_terms
+
+        def _gather_rollups_eligible():
+            return (
+                qt.group_days
+                # The rollups are by start date, and not spliced.
+                and qt.time_bucket is None
+                and not qt.raw
+                and not lazy_tags
+                and _eligible_filters()
+                and _eligible_sort_cols()
+                and self.has_fact_rollups
+                and _eligible_window()
+            )
+
+        def _eligible_filters():
+            # The rollups only know undeleted, complete Facts, by day,
+            # Activity, and Tags, so any other criteria needs the Facts.
+            return (
+                qt.deleted is False
+                and not qt.key
+                and not qt.endless
+                and not qt.partial
+                and not qt.search_terms
+                and not qt.match_activities
+                and not qt.match_categories
+                and not qt.match_tags
+            )
+
+        def _eligible_sort_cols():
+            return set(qt.sort_cols or []).issubset(self.ROLLUP_SORT_COLS)
+
+        def _eligible_window():
+            # The rollups are whole days, so the window must be, too.
+            if qt.since is not None and not _is_midnight(qt.since):
+                return False
+            if qt.until is not None:
+                return _is_midnight(qt.until)
+            # Without an until, gather() includes the active Fact, which
+            # is not rolled up (it has no end). Unless it's not included.
+            return qt.exclude_ongoing or not any(
+                fact for fact in self.endless()
+                if qt.since is None or fact.start >= qt.since
+            )
+
+        def _is_midnight(datetm):
+            return datetm.time() == time(0)
+
+        return bool(_gather_rollups_eligible())
+
+    def gather_rollups(self, query_terms):
+        """
+        Return the day-grouped gather() results, aggregated from the rollups.
+
+        The results match what gather() returns from the Facts, except that
+        each group's representative Fact is synthesized (it has no pk, nor
+        description), spanning the group's first start and final end.
+
+        If a rollup straddles the until time (because it includes a Fact that
+        runs past until, which gather() excludes), or if the rollups are stale
+        (see refresh_rollups), returns None, so that the caller falls back to
+        querying the Facts.
+        """
+        qt = query_terms
+
+        def _gather_rollups():
+            if not self.rollups_current():
+                return None
+            rows = _fetch_rollups()
+            if qt.until is not None and any(row.final_end > qt.until for row in rows):
+                return None
+            activities = _fetch_activities(rows)
+            tag_names = _fetch_tag_names(rows)
+            groups = _group_rollups(rows, activities)
+            groups = self.gather_rollups_sort(qt, groups)
+            groups = _apply_limit_offset(groups)
+            if qt.count_results:
+                return len(groups)
+            return self.query_profile_hydrate(
+                lambda groups: [
+                    _process_group(group, activities, tag_names) for group in groups
+                ],
+                groups,
+            )
+
+        # ***
+
+        def _fetch_rollups():
+            query = select([fact_rollups])
+            if qt.since is not None:
+                query = query.where(fact_rollups.c.day >= qt.since.strftime('%Y-%m-%d'))
+            if qt.until is not None:
+                # (lb): Include the until day, to check for straddlers.
+                query = query.where(fact_rollups.c.day <= qt.until.strftime('%Y-%m-%d'))
+            rows = self.query_profile_fetch(
+                lambda: self.store.session.execute(query).fetchall()
+            )
+            if qt.until is not None:
+                # The until day's rollups start at or after until (midnight),
+                # so skip them, except for the (zero-length) Facts right at
+                # until, which gather() would include.
+                rows = [row for row in rows if row.first_start <= qt.until]
+            return rows
+
+        def _fetch_activities(rows):
+            activity_ids = set(row.activity_id for row in rows)
+            activity_ids.discard(None)
+            if not activity_ids:
+                return {}
+            query = self.store.session.query(AlchemyActivity).filter(
+                AlchemyActivity.pk.in_(activity_ids),
+            )
+            return {
+                activity.pk: activity.as_hamster(self.store)
+                for activity in query.all()
+            }
+
+        def _fetch_tag_names(rows):
+            tag_ids = set()
+            for row in rows:
+                tag_ids.update(_row_tag_ids(row))
+            if not tag_ids:
+                return {}
+            query = self.store.session.query(AlchemyTag.pk, AlchemyTag.name).filter(
+                AlchemyTag.pk.in_(tag_ids),
+            )
+            return dict(query.all())
+
+        def _row_tag_ids(row):
+            return [int(tag_id) for tag_id in row.tag_key.split(',') if tag_id]
+
+        # ***
+
+        def _group_rollups(rows, activities):
+            groups = OrderedDict()
+            for row in rows:
+                group_key = _group_key(row, activities.get(row.activity_id))
+                groups.setdefault(group_key, []).append(row)
+            return [_summarize_group(group) for group in groups.values()]
+
+        def _group_key(row, activity):
+            # Mirror gather()'s GROUP BY (see query_group_by_activity_and_category).
+            group_key = [row.day]
+            category = activity.category if activity else None
+            if qt.group_activity and qt.group_category:
+                group_key.append(row.activity_id)
+            elif qt.group_activity:
+                group_key.append(activity.name if activity else None)
+            elif qt.group_category:
+                group_key.append(category.pk if category else None)
+            if qt.group_tags:
+                group_key.append(row.tag_key)
+            return tuple(group_key)
+
+        def _summarize_group(rows):
+            return {
+                'rows': rows,
+                'day': rows[0].day,
+                'seconds': sum(row.seconds for row in rows),
+                'fact_count': sum(row.fact_count for row in rows),
+                'first_start': min(row.first_start for row in rows),
+                'final_end': max(row.final_end for row in rows),
+            }
+
+        def _apply_limit_offset(groups):
+            # Same semantics as query_apply_limit_offset.
+            if qt.offset and qt.offset > 0:
+                groups = groups[qt.offset:]
+            if qt.limit and qt.limit > 0:
+                groups = groups[:qt.limit]
+            return groups
+
+        # ***
+
+        def _process_group(group, activities, tag_names):
+            rows = group['rows']
+            group_activities = [activities.get(row.activity_id) for row in rows]
+            new_fact = _process_group_prepare_fact(
+                group, group_activities[0], tag_names,
+            )
+            if not qt.include_stats:
+                return new_fact
+            cols = [
+                group['seconds'] / 86400.0,
+                group['fact_count'],
+                group['first_start'],
+                group['final_end'],
+            ]
+            cols.extend(_process_group_actg_cols(group_activities))
+            cols.append(group['day'])
+            if not qt.named_tuples:
+                return [new_fact] + cols
+            return self.FactStatsTuple(new_fact, *cols)
+
+        def _process_group_prepare_fact(group, activity, tag_names):
+            fact_cls = self.store.fact_cls or Fact
+            new_fact = fact_cls(
+                activity=activity,
+                start=group['first_start'],
+                end=group['final_end'],
+            )
+            # Build the Tag frequency distribution, i.e., the number of
+            # Facts that used each Tag, like gather(set_freqs=True) does.
+            tag_freqs = Counter()
+            for row in group['rows']:
+                for tag_id in _row_tag_ids(row):
+                    tag_freqs[tag_names[tag_id]] += row.fact_count
+            new_fact.tags_replace([
+                Tag(name=name, freq=freq) for name, freq in tag_freqs.items()
+            ])
+            return new_fact
+
+        def _process_group_actg_cols(group_activities):
+            # Mirror gather()'s aggregate name columns (see
+            # _get_all_prepare_actg_cols), as reduced to sets of names.
+            activities_col = 0
+            actegories_col = 0
+            categories_col = 0
+            if qt.group_activity and qt.group_category:
+                pass
+            elif qt.group_activity:
+                categories_col = _unique_names(
+                    activity.category.name
+                    for activity in group_activities
+                    if activity and activity.category
+                )
+            elif qt.group_category:
+                activities_col = _unique_names(
+                    activity.name for activity in group_activities if activity
+                )
+            else:
+                actegories_col = _unique_names(
+                    '{}@{}'.format(activity.name, activity.category.name)
+                    for activity in group_activities
+                    if activity and activity.category
+                )
+            return [activities_col, actegories_col, categories_col]
+
+        def _unique_names(names):
+            # Like group_concat, skip NULLs, and like (the caller of)
+            # _process_record_reduce_aggregate_value, use '' if nothing.
+            names = [name for name in names if name is not None]
+            if not any(names):
+                return ''
+            return set(names)
+
+        return _gather_rollups()
+
+    def gather_rollups_sort(self, query_terms, groups):
+        """Order the rollup groups the same as gather() would order them."""
+        qt = query_terms
+        sort_keys = {
+            'start': lambda group: (group['first_start'], group['final_end']),
+            'time': lambda group: group['seconds'],
+            'usage': lambda group: group['fact_count'],
+            'day': lambda group: group['day'],
+        }
+        groups = sorted(groups, key=sort_keys['start'])
+        # Apply the sorts from last to first, which works because sorted() is
+        # stable, so ties retain the order from the less significant sorts.
+        sort_cols = list(enumerate(qt.sort_cols or []))
+        for idx, sort_col in reversed(sort_cols):
+            try:
+                reverse = qt.sort_orders[idx] == 'desc'
+            except (IndexError, TypeError):
+                reverse = False
+            groups = sorted(groups, key=sort_keys[sort_col], reverse=reverse)
+        return groups
@@ -38,6 +38,15 @@ class BaseAlchemyManager(GatherBaseAlchemyManager):
 
     # ***
 
+    def store_has_table(self, table_name):
+        """Return True if the table (e.g., an optional virtual table) exists."""
+        # (lb): Use the session's connection, and not the engine, so that we
+        # see what the session sees (and so we don't check out a connection).
+        connection = self.store.session.connection()
+        return connection.dialect.has_table(connection, table_name)
+
+    # ***
+
     def add_and_commit(self, alchemy_item, raw=False, skip_commit=False):
         """
         Adds the item to the data store, and perhaps calls commit.
@@ -57,6 +66,7 @@ class BaseAlchemyManager(GatherBaseAlchemyManager):
 
         def session_add():
             self.store.session.add(alchemy_item)
+            self.store.bump_write_generation()
 
         def session_commit_maybe():
             if skip_commit:
@@ -83,6 +93,45 @@ class BaseAlchemyManager(GatherBaseAlchemyManager):
 
     # ***
 
+    def _get_all_gather(self, query_terms, **kwargs):
+        """Returns the gather() results, from the store's result cache if possible.
+
+        The cache key is the normalized QueryTerms (with since and until already
+        resolved to datetimes), plus the gather kwargs and the store's 'now' (which
+        is used to compute the span of the active Fact). Results that reference
+        session objects (raw, or lazy_tags), or that are streamed, are not cached.
+        Nor are profiled results (explain, or profile; see gather_profiled).
+        """
+        qt = query_terms
+        if qt.explain or qt.profile:
+            # Profile the queries themselves, and not a cache lookup.
+            return self.gather_profiled(qt, **kwargs)
+        cache = self.store.result_cache
+        if (
+            not cache.enabled
+            or qt.raw
+            or qt.stream
+            or kwargs.get('lazy_tags', False)
+        ):
+            return self.gather(qt, **kwargs)
+        try:
+            cache_key = (
+                self.__class__.__name__,
+                cache.normalize_key(qt.as_tuple()),
+                cache.normalize_key(kwargs),
+                self.store.now,
+            )
+        except TypeError:
+            # Unhashable query term, e.g., an unexpected search_terms type.
+            return self.gather(qt, **kwargs)
+        found, results = cache.get(cache_key)
+        if not found:
+            results = self.gather(qt, **kwargs)
+            cache.put(cache_key, results)
+        return results
+
+    # ***
+
     def get_all(self, query_terms=None, **kwargs):
         """Returns matching items from the data store; and stats, if requested.
 
@@ -135,6 +135,7 @@ class TagManager(BaseAlchemyManager, BaseTagManager):
             self.store.logger.error(message)
             raise KeyError(message)
         alchemy_tag.name = tag.name
+        self.store.bump_write_generation()
 
         try:
             self.store.session.commit()
@@ -181,6 +182,7 @@ class TagManager(BaseAlchemyManager, BaseTagManager):
             raise KeyError(message)
 
         self.store.session.delete(alchemy_tag)
+        self.store.bump_write_generation()
         self.store.session.commit()
         self.store.logger.debug("Deleted: {!r}".format(tag))
 
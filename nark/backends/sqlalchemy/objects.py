@@ -41,6 +41,9 @@ Note:
     cause be added here.
 """
 
+import calendar
+import datetime
+
 # Profiling: Loading sqlalchemy takes about ~ 0.150 secs.
 # (lb): And there's probably not a way to avoid it.
 from sqlalchemy import (
@@ -48,14 +51,21 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     Table,
     Unicode,
     UnicodeText,
-    UniqueConstraint
+    UniqueConstraint,
+    and_,
+    event,
+    false
 )
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import mapper, relationship
+from sqlalchemy.sql import column, table
 
 from ...items.activity import Activity
 from ...items.category import Category
@@ -79,8 +89,13 @@ class AlchemyCategory(Category):
         self.deleted = bool(deleted)
         self.hidden = bool(hidden)
 
-    def as_hamster(self, store):
+    def as_hamster(self, store, interner=None):
         """Return store object as a real ``nark.Category`` instance."""
+        if interner is not None:
+            category = interner.get('category', self.pk)
+            if category is None:
+                category = interner.put('category', self.pk, self.as_hamster(store))
+            return category
         return Category(
             pk=self.pk,
             name=self.name,
@@ -108,10 +123,20 @@ class AlchemyActivity(Activity):
         self.deleted = bool(deleted)
         self.hidden = bool(hidden)
 
-    def as_hamster(self, store):
+    def as_hamster(self, store, interner=None):
         """Return new ``nark.Activity`` representation of SQLAlchemy instance."""
+        if interner is not None:
+            activity = interner.get('activity', self.pk)
+            if activity is None:
+                activity = interner.put(
+                    'activity', self.pk, self._as_hamster(store, interner),
+                )
+            return activity
+        return self._as_hamster(store, interner)
+
+    def _as_hamster(self, store, interner):
         if self.category:
-            category = self.category.as_hamster(store)
+            category = self.category.as_hamster(store, interner)
         else:
             category = None
         activity_name = self.name
@@ -138,8 +163,13 @@ class AlchemyTag(Tag):
         self.deleted = bool(deleted)
         self.hidden = bool(hidden)
 
-    def as_hamster(self, store):
+    def as_hamster(self, store, interner=None):
         """Provide an convenient way to return it as a ``nark.Tag`` instance."""
+        if interner is not None:
+            tag = interner.get('tag', self.pk)
+            if tag is None:
+                tag = interner.put('tag', self.pk, self.as_hamster(store))
+            return tag
         return Tag(
             pk=self.pk,
             name=self.name,
@@ -176,8 +206,12 @@ class AlchemyFact(Fact):
         # Tags can only be assigned after the fact has been created.
         self.tags = list()
 
-    def as_hamster(self, store, tags=None, set_freqs=False):
-        """Provide an convenient way to return it as a ``nark.Fact`` instance."""
+    def as_hamster(self, store, tags=None, set_freqs=False, interner=None):
+        """Provide an convenient way to return it as a ``nark.Fact`` instance.
+
+        If an ``ItemInterner`` is specified, the Fact shares its Activity,
+        Category, and Tags with the other Facts hydrated using the same interner.
+        """
         # NOTE: (lb): By default, self.tags is lazy loaded, which causes a fetch
         #   when it's looked up, once per Fact. This is normally not an issue, but
         #   I noticed a significant delay processing 15K Facts. My first attempt
@@ -187,7 +221,10 @@ class AlchemyFact(Fact):
         #   going to leave this here to make it easy to test performance issues
         #   as I continue to investigate this issue.
         if tags is None:
-            nark_tags = set([tag.as_hamster(store) for tag in self.tags])
+            nark_tags = set([tag.as_hamster(store, interner) for tag in self.tags])
+        elif interner is not None and not set_freqs:
+            # (lb): Not when set_freqs, because each Tag's freq is per-result.
+            nark_tags = [interner.tag(name) for name in tags]
         else:
             nark_tags = tags
 
@@ -197,7 +234,7 @@ class AlchemyFact(Fact):
             pk=self.pk,
             deleted=bool(self.deleted),
             split_from=self.split_from,
-            activity=self.activity.as_hamster(store),
+            activity=self.activity.as_hamster(store, interner),
             start=self.start,
             end=self.end,
             description=self.description,
@@ -262,6 +299,24 @@ mapper(AlchemyTag, tags, properties={
     'pk': tags.c.id,
 })
 
+# The canonical on-disk Fact time format, "YYYY-MM-DD HH:MM:SS". SQLAlchemy's
+# SQLite DATETIME otherwise appends microseconds (".ffffff"), which breaks the
+# lexicographic compare against legacy (Hamster) rows that are stored without.
+# By storing a single format, the managers can compare the raw columns (and
+# not, e.g., func.datetime(start_time)), which lets SQLite use the indexes.
+# - Reading still accepts either format (the default parser handles both),
+#   and migration 003 normalizes any existing rows.
+# - Keep this format in sync with query_prepare_datetime.
+FactDateTime = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format=(
+            '%(year)04d-%(month)02d-%(day)02d'
+            ' %(hour)02d:%(minute)02d:%(second)02d'
+        ),
+    ),
+    'sqlite',
+)
+
 facts = Table(
     'facts', metadata,
     Column('id', Integer, primary_key=True),
@@ -273,8 +328,13 @@ facts = Table(
     # is more of a suggestion in SQLite, which stores both types as strings,
     # and the strings are your typical datetime (iso8601 without the 'T',
     # and with a timezone), "YYYY-MM-DD HH:MM:SS".
-    Column('start_time', DateTime),
-    Column('end_time', DateTime),
+    Column('start_time', FactDateTime),
+    Column('end_time', FactDateTime),
+    # Integer shadows of start_time and end_time, in seconds since the epoch,
+    # so that duration math is integer arithmetic, and not julianday() floats.
+    # (Maintained by the mapper hooks below; see fact_time_epoch.)
+    Column('start_epoch', Integer, nullable=True),
+    Column('end_epoch', Integer, nullable=True),
     Column('activity_id', Integer, ForeignKey(activities.c.id)),
 
     # FIXME/2018-05-20: (lb): Why the hard limit? And why isn't it documented?
@@ -287,6 +347,34 @@ facts = Table(
     Column('description', UnicodeText()),
 )
 
+# The Fact time window indexes serve the predicates that the FactManager
+# issues most often, e.g., gather(), antecedent(), subsequent(), etc., all
+# of which restrict to ``deleted = 0``, compare start_time and/or end_time,
+# and order by (start_time, end_time, id). (Note that SQLite appends the
+# rowid to each index entry, so there's no need to list 'id' explicitly.)
+Index(
+    'ix_facts_deleted_start_time_end_time',
+    facts.c.deleted, facts.c.start_time, facts.c.end_time,
+)
+Index(
+    'ix_facts_deleted_end_time_start_time',
+    facts.c.deleted, facts.c.end_time, facts.c.start_time,
+)
+Index('ix_facts_activity_id_start_time', facts.c.activity_id, facts.c.start_time)
+Index('ix_facts_split_from_id', facts.c.split_from_id)
+
+# The active Fact index is a partial index that contains at most one entry
+# (well, unless the store is corrupt), so that FactManager.endless() -- and
+# thereby get_current_fact() and find_latest_fact(), which dob calls on just
+# about every command -- is a single index probe, no matter the store size.
+# - Note that the WHERE must match what the query renders, i.e., SQLAlchemy
+#   renders ``AlchemyFact.deleted == False`` as ``deleted = 0`` for SQLite.
+Index(
+    'ix_facts_active',
+    facts.c.end_time,
+    sqlite_where=and_(facts.c.end_time.is_(None), facts.c.deleted == false()),
+)
+
 mapper(AlchemyFact, facts, properties={
     'pk': facts.c.id,
     'activity': relationship(AlchemyActivity, backref='facts'),
@@ -304,6 +392,177 @@ mapper(AlchemyFact, facts, properties={
     )
 })
 
+
+def fact_time_epoch(datetm):
+    """Return the epoch seconds of the naive (local) Fact time, or None."""
+    if datetm is None:
+        return None
+    # (lb): Treat the naive time as if UTC, which is what SQLite does, e.g.,
+    # strftime('%s', start_time), so the epochs match what migration 004
+    # backfilled. We only ever subtract them, so the offset doesn't matter.
+    return calendar.timegm(datetm.timetuple())
+
+
+def fact_time_from_epoch(epoch):
+    """Return the naive Fact time for the epoch seconds (see fact_time_epoch)."""
+    if epoch is None:
+        return None
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=epoch)
+
+
+@event.listens_for(AlchemyFact, 'before_insert')
+@event.listens_for(AlchemyFact, 'before_update')
+def fact_set_epochs(mapper, connection, alchemy_fact):
+    # Maintain the shadow columns on every ORM write, which covers
+    # FactManager._add() and _update(), but also anything else that
+    # saves an AlchemyFact directly (like the test factories).
+    alchemy_fact.start_epoch = fact_time_epoch(alchemy_fact.start)
+    alchemy_fact.end_epoch = fact_time_epoch(alchemy_fact.end)
+
+
+# The optional facts_rtree is a SQLite R*Tree (interval index) over the
+# undeleted Facts' (start_epoch, end_epoch) bounds, which the FactManager
+# uses to find overlapping and surrounding Facts without scanning. It's
+# kept in sync by triggers, so it works no matter how the Fact is saved.
+# - The R*Tree stores 32-bit floats, which it rounds outward, so it's only
+#   a candidate filter; the caller still compares the real time columns.
+# - The active Fact, which has no end, is stored as ending at the end of time.
+# - The R*Tree rejects an interval that ends before it starts, which a legacy
+#   (Hamster) store might have, so the bounds are stored as min() and max().
+# - The R*Tree module is a compile-time option, so if SQLite was built without
+#   it, creating the table fails, and the FactManager falls back to scanning.
+# - Keep these definitions in sync with migration 006.
+FACTS_RTREE_END_OF_TIME = 253402300799  # 9999-12-31 23:59:59.
+
+FACTS_RTREE_START_EPOCH = "CAST(strftime('%s', NEW.start_time) AS INTEGER)"
+
+FACTS_RTREE_END_EPOCH = (
+    "COALESCE(CAST(strftime('%s', NEW.end_time) AS INTEGER), {})"
+    .format(FACTS_RTREE_END_OF_TIME)
+)
+
+FACTS_RTREE_EPOCHS = "min({0}, {1}), max({0}, {1})".format(
+    FACTS_RTREE_START_EPOCH, FACTS_RTREE_END_EPOCH,
+)
+
+FACTS_RTREE_DDL = (
+    "CREATE VIRTUAL TABLE facts_rtree USING rtree(id, start_epoch, end_epoch)",
+    (
+        "CREATE TRIGGER facts_rtree_insert AFTER INSERT ON facts"
+        " WHEN NOT NEW.deleted AND NEW.start_time IS NOT NULL"
+        " BEGIN"
+        " INSERT INTO facts_rtree VALUES (NEW.id, {});"
+        " END"
+    ).format(FACTS_RTREE_EPOCHS),
+    (
+        "CREATE TRIGGER facts_rtree_update AFTER UPDATE ON facts"
+        " BEGIN"
+        " DELETE FROM facts_rtree WHERE id = OLD.id;"
+        " INSERT INTO facts_rtree SELECT NEW.id, {}"
+        " WHERE NOT NEW.deleted AND NEW.start_time IS NOT NULL;"
+        " END"
+    ).format(FACTS_RTREE_EPOCHS),
+    (
+        "CREATE TRIGGER facts_rtree_delete AFTER DELETE ON facts"
+        " BEGIN"
+        " DELETE FROM facts_rtree WHERE id = OLD.id;"
+        " END"
+    ),
+)
+
+
+# A lightweight (Core) handle for querying the R*Tree. (It's not part of the
+# metadata, so that create_all() does not try to make it a regular table.)
+facts_rtree = table(
+    'facts_rtree',
+    column('id'),
+    column('start_epoch'),
+    column('end_epoch'),
+)
+
+
+def create_facts_rtree(connection):
+    """Create the optional facts_rtree, and return True if successful."""
+    # E.g., fails with "no such module: rtree".
+    return create_optional_ddl(connection, FACTS_RTREE_DDL)
+
+
+# The optional facts_fts is a SQLite FTS5 full-text index of the Facts'
+# descriptions, which gather() uses for search_terms, rather than running
+# ``description LIKE '%term%'`` against every Fact. It uses the trigram
+# tokenizer, so that a search term still matches any part of a word
+# (which is what users of the LIKE search have come to expect).
+# - It's an external content table (the text is stored just once, in facts),
+#   so its triggers must pass FTS5 the old description to remove (the 'delete'
+#   command), as it cannot read what was indexed from facts after the change.
+# - The trigram tokenizer needs SQLite 3.34.0 or better. If unavailable,
+#   creating the table fails, and gather() falls back to using LIKE.
+# - Keep these definitions in sync with migration 007.
+FACTS_FTS_DDL = (
+    (
+        "CREATE VIRTUAL TABLE facts_fts USING fts5("
+        "description, content='facts', content_rowid='id', tokenize='trigram'"
+        ")"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_insert AFTER INSERT ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (rowid, description)"
+        " VALUES (NEW.id, NEW.description);"
+        " END"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_update AFTER UPDATE OF description ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (facts_fts, rowid, description)"
+        " VALUES ('delete', OLD.id, OLD.description);"
+        " INSERT INTO facts_fts (rowid, description)"
+        " VALUES (NEW.id, NEW.description);"
+        " END"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_delete AFTER DELETE ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (facts_fts, rowid, description)"
+        " VALUES ('delete', OLD.id, OLD.description);"
+        " END"
+    ),
+)
+
+# The trigram tokenizer cannot match anything shorter than three characters.
+FACTS_FTS_TERM_MIN_LENGTH = 3
+
+facts_fts = table(
+    'facts_fts',
+    column('rowid'),
+    column('description'),
+)
+
+
+def create_facts_fts(connection):
+    """Create the optional facts_fts, and return True if successful."""
+    # E.g., fails with "no such tokenizer: trigram".
+    return create_optional_ddl(connection, FACTS_FTS_DDL)
+
+
+def create_optional_ddl(connection, ddls):
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        with connection.begin_nested():
+            for ddl in ddls:
+                connection.execute(ddl)
+    except OperationalError:
+        return False
+    return True
+
+
+@event.listens_for(facts, 'after_create')
+def facts_after_create(target, connection, **kw):
+    create_facts_rtree(connection)
+    create_facts_fts(connection)
+
+
 # 2018-04-22: (lb): ProjectHamster renamed fact_tags to facttags. But
 # that term isn't used in the code other than in this Table mapping
 # (which no other code uses; though maybe SQLAlchemy uses it internally?).
@@ -313,3 +572,159 @@ fact_tags = Table(
     Column('tag_id', Integer, ForeignKey(tags.c.id)),
 )
 
+# Index both directions, for loading a Fact's Tags, and for finding a Tag's Facts.
+Index('ix_fact_tags_fact_id_tag_id', fact_tags.c.fact_id, fact_tags.c.tag_id)
+Index('ix_fact_tags_tag_id_fact_id', fact_tags.c.tag_id, fact_tags.c.fact_id)
+
+
+# The daily rollups are the pre-aggregated totals of the undeleted, complete
+# (not active) Facts, one row per (day, Activity, set of Tags), which gather()
+# uses to answer day-grouped reports without re-reading every Fact.
+# - The day is the start_time date, i.e., the same day that group_days uses.
+# - The tag_key is the Fact's sorted, comma-separated Tag IDs ('' if none),
+#   so renaming a Tag (or an Activity or Category) never stales a rollup.
+# - The rollups are maintained incrementally: The triggers below mark each
+#   (day, activity_id) partition that a Fact write touches as dirty, and the
+#   FactManager re-aggregates just the dirty partitions before it next reads
+#   the rollups. (See GatherRollupManager.)
+# - Keep these definitions in sync with migration 008.
+fact_rollups = Table(
+    'fact_rollups', metadata,
+    Column('day', Unicode(10), nullable=False),
+    Column('activity_id', Integer, ForeignKey(activities.c.id), nullable=True),
+    Column('tag_key', UnicodeText(), nullable=False),
+    Column('seconds', Integer, nullable=False),
+    Column('fact_count', Integer, nullable=False),
+    Column('first_start', FactDateTime),
+    Column('final_end', FactDateTime),
+)
+
+Index(
+    'ix_fact_rollups_day_activity_id_tag_key',
+    fact_rollups.c.day, fact_rollups.c.activity_id, fact_rollups.c.tag_key,
+)
+
+fact_rollups_dirty = Table(
+    'fact_rollups_dirty', metadata,
+    Column('day', Unicode(10), nullable=False),
+    Column('activity_id', Integer, nullable=True),
+    UniqueConstraint('day', 'activity_id'),
+)
+
+FACT_ROLLUPS_MARK_DIRTY = (
+    " INSERT OR IGNORE INTO fact_rollups_dirty (day, activity_id)"
+    " SELECT date({row}.start_time), {row}.activity_id"
+    " WHERE {row}.start_time IS NOT NULL;"
+)
+
+FACT_ROLLUPS_MARK_DIRTY_BY_FACT_ID = (
+    " INSERT OR IGNORE INTO fact_rollups_dirty (day, activity_id)"
+    " SELECT date(start_time), activity_id FROM facts"
+    " WHERE id = {row}.fact_id AND start_time IS NOT NULL;"
+)
+
+FACT_ROLLUPS_DDL = (
+    (
+        "CREATE TRIGGER fact_rollups_facts_insert AFTER INSERT ON facts"
+        " BEGIN{} END"
+    ).format(FACT_ROLLUPS_MARK_DIRTY.format(row='NEW')),
+    (
+        "CREATE TRIGGER fact_rollups_facts_update AFTER UPDATE OF"
+        " deleted, start_time, end_time, start_epoch, end_epoch, activity_id"
+        " ON facts"
+        " BEGIN{}{} END"
+    ).format(
+        FACT_ROLLUPS_MARK_DIRTY.format(row='OLD'),
+        FACT_ROLLUPS_MARK_DIRTY.format(row='NEW'),
+    ),
+    (
+        "CREATE TRIGGER fact_rollups_facts_delete AFTER DELETE ON facts"
+        " BEGIN{} END"
+    ).format(FACT_ROLLUPS_MARK_DIRTY.format(row='OLD')),
+    (
+        "CREATE TRIGGER fact_rollups_fact_tags_insert AFTER INSERT ON fact_tags"
+        " BEGIN{} END"
+    ).format(FACT_ROLLUPS_MARK_DIRTY_BY_FACT_ID.format(row='NEW')),
+    (
+        "CREATE TRIGGER fact_rollups_fact_tags_delete AFTER DELETE ON fact_tags"
+        " BEGIN{} END"
+    ).format(FACT_ROLLUPS_MARK_DIRTY_BY_FACT_ID.format(row='OLD')),
+)
+
+
+# The change log records each write to the items, one row per item per write,
+# so that a client (e.g., a sync worker, or an export) can apply just the
+# changes since the revision it last saw, rather than re-reading everything.
+# - The revision is AUTOINCREMENT, so it only ever increases, even after the
+#   log is pruned (see ChangeLog.prune).
+# - The op is 'insert', 'update', or 'delete'. Marking an item deleted is
+#   logged as a 'delete' (as is the rare actual DELETE). And adding or removing
+#   a Fact's Tags is logged as an 'update' of the Fact.
+# - The log is written by the triggers below, so it records every write, from
+#   any of the managers (or from any other client of the database).
+# - Keep these definitions in sync with migration 009.
+changes = Table(
+    'changes', metadata,
+    Column('revision', Integer, primary_key=True),
+    Column('table_name', Unicode(16), nullable=False),
+    Column('item_id', Integer, nullable=False),
+    Column('op', Unicode(6), nullable=False),
+    sqlite_autoincrement=True,
+)
+
+# For finding an item's latest change (see ChangeLog.changes_since).
+Index(
+    'ix_changes_table_name_item_id_revision',
+    changes.c.table_name, changes.c.item_id, changes.c.revision,
+)
+
+CHANGES_LOG = (
+    " INSERT INTO changes (table_name, item_id, op)"
+    " VALUES ('{table}', {item_id}, {op});"
+)
+
+CHANGES_LOG_OP_UPDATE = "CASE WHEN NEW.deleted THEN 'delete' ELSE 'update' END"
+
+CHANGES_DDL = tuple(
+    ddl
+    for table_name in ('categories', 'activities', 'tags', 'facts')
+    for ddl in (
+        (
+            "CREATE TRIGGER changes_{table}_insert AFTER INSERT ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=CHANGES_LOG.format(
+            table=table_name, item_id='NEW.id', op="'insert'",
+        )),
+        (
+            "CREATE TRIGGER changes_{table}_update AFTER UPDATE ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=CHANGES_LOG.format(
+            table=table_name, item_id='NEW.id', op=CHANGES_LOG_OP_UPDATE,
+        )),
+        (
+            "CREATE TRIGGER changes_{table}_delete AFTER DELETE ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=CHANGES_LOG.format(
+            table=table_name, item_id='OLD.id', op="'delete'",
+        )),
+    )
+) + (
+    (
+        "CREATE TRIGGER changes_fact_tags_insert AFTER INSERT ON fact_tags"
+        " BEGIN{} END"
+    ).format(CHANGES_LOG.format(table='facts', item_id='NEW.fact_id', op="'update'")),
+    (
+        "CREATE TRIGGER changes_fact_tags_delete AFTER DELETE ON fact_tags"
+        " BEGIN{} END"
+    ).format(CHANGES_LOG.format(table='facts', item_id='OLD.fact_id', op="'update'")),
+)
+
+
+@event.listens_for(metadata, 'after_create')
+def metadata_after_create(target, connection, **kw):
+    # The rollup triggers span facts and fact_tags, so wait for all tables.
+    # (As do the change log triggers, which span all the item tables.)
+    if connection.dialect.name != 'sqlite':
+        return
+    for ddl in FACT_ROLLUPS_DDL + CHANGES_DDL:
+        connection.execute(ddl)
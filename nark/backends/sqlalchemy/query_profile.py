@@ -0,0 +1,188 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""``nark`` gather() query profile (see QueryTerms.explain and .profile)."""
+
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+__all__ = (
+    'QueryProfile',
+    'StatementProfile',
+)
+
+
+# - sql: The SQL, as sent to the database (with '?' placeholders).
+# - params: The bound parameter values, as sent to the database.
+# - exec_time: The seconds spent executing the statement (which, for SQLite,
+#   is just until the first row is ready, and not fetching all the rows).
+# - query_plan: The EXPLAIN QUERY PLAN rows, as (id, parent, detail) tuples.
+StatementProfile = namedtuple('StatementProfile', (
+    'sql',
+    'params',
+    'exec_time',
+    'query_plan',
+))
+
+
+class QueryProfile(object):
+    """The statements that one gather() ran, and how long they (and it) took.
+
+    Each SELECT that gather() runs is recorded as a StatementProfile, in the
+    order run (e.g., any lookups that decide how to answer, the main query,
+    and then any batch_tags queries). The query plans are only fetched if
+    ``explain``, after gather() is done, so that running EXPLAIN does not
+    count toward the timings.
+
+    Attributes:
+        statements: The StatementProfile of each SELECT that gather() ran.
+
+        main_index: The index in statements of the main query, i.e., the one
+            whose rows gather() returns (or None, if gather() ran no query).
+
+        sql_time: The seconds spent running the main query and fetching its
+            rows. (For raw and other ORM results, which SQLAlchemy loads as it
+            fetches the rows, this includes creating the AlchemyFacts.)
+
+        hydrate_time: The seconds spent building the results from the rows.
+
+        row_count: The number of rows the main query returned.
+
+    Note that a ``stream`` query runs as the caller iterates over the results,
+    i.e., after gather() returns, so its profile records nothing of the sort.
+    """
+
+    def __init__(self, explain=False):
+        self.explain = explain
+        self.statements = []
+        self.main_index = None
+        self.sql_time = 0.0
+        self.hydrate_time = 0.0
+        self.row_count = None
+
+    def __str__(self):
+        lines = [
+            'sql_time: {:.6f} / hydrate_time: {:.6f} / row_count: {}'.format(
+                self.sql_time, self.hydrate_time, self.row_count,
+            ),
+        ]
+        for stmt in self.statements:
+            lines.append('Query ({:.6f} s.): {}'.format(stmt.exec_time, stmt.sql))
+            lines.append('Params: {}'.format(stmt.params))
+            for _id, _parent, detail in stmt.query_plan or []:
+                lines.append('Plan: {}'.format(detail))
+        return '\n'.join(lines)
+
+    # ***
+
+    @property
+    def main_statement(self):
+        """The main query's StatementProfile (or None, if gather() ran no query)."""
+        if self.main_index is None:
+            return None
+        return self.statements[self.main_index]
+
+    @property
+    def sql(self):
+        """The main query's SQL (or None, if gather() ran no query)."""
+        return self.main_statement.sql if self.main_statement else None
+
+    @property
+    def params(self):
+        """The main query's bound parameter values."""
+        return self.main_statement.params if self.main_statement else None
+
+    @property
+    def query_plan(self):
+        """The main query's EXPLAIN QUERY PLAN rows (if ``explain``)."""
+        return self.main_statement.query_plan if self.main_statement else None
+
+    @property
+    def full_scans(self):
+        """The query plan steps that read every row of a table (without an index).
+
+        E.g., 'SCAN facts'. (Though note that SQLite also reports scanning a
+        subquery or CTE, e.g., the tags subquery, as a SCAN.)
+        """
+        return [
+            detail
+            for stmt in self.statements
+            for _id, _parent, detail in stmt.query_plan or []
+            if detail.startswith('SCAN ') and ' INDEX ' not in detail
+        ]
+
+    # ***
+
+    @contextmanager
+    def capture(self, engines):
+        """Record the SELECTs run on any of the engines until the context exits."""
+        def before_cursor_execute(conn, cursor, statement, params, context, many):
+            conn.info.setdefault('query_profile_start', []).append(time.perf_counter())
+
+        def after_cursor_execute(conn, cursor, statement, params, context, many):
+            exec_time = time.perf_counter() - conn.info['query_profile_start'].pop()
+            if many or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                # E.g., an autoflush INSERT or UPDATE.
+                return
+            # (lb): list.append is atomic, so the parallel_chunks threads can share.
+            self.statements.append(
+                StatementProfile(statement, params, exec_time, None)
+            )
+
+        listeners = (
+            ('before_cursor_execute', before_cursor_execute),
+            ('after_cursor_execute', after_cursor_execute),
+        )
+        for engine in engines:
+            for identifier, listener in listeners:
+                event.listen(engine, identifier, listener)
+        try:
+            yield self
+        finally:
+            for engine in engines:
+                for identifier, listener in listeners:
+                    event.remove(engine, identifier, listener)
+
+    @contextmanager
+    def timing(self, attr):
+        """Add the seconds spent in the context to the attribute, e.g., sql_time."""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            setattr(self, attr, getattr(self, attr) + time.perf_counter() - started)
+
+    def explain_statements(self, connection):
+        """Fetch each recorded statement's EXPLAIN QUERY PLAN (SQLite only).
+
+        Args:
+            connection: The SQLAlchemy Connection to run EXPLAIN on. (The
+                statement is sent to the DBAPI cursor as-is, so EXPLAIN does
+                not itself get recorded.)
+        """
+        cursor = connection.connection.cursor()
+        try:
+            for idx, stmt in enumerate(self.statements):
+                cursor.execute('EXPLAIN QUERY PLAN ' + stmt.sql, stmt.params)
+                query_plan = [tuple(row[:2]) + (row[-1],) for row in cursor.fetchall()]
+                self.statements[idx] = stmt._replace(query_plan=query_plan)
+        finally:
+            cursor.close()
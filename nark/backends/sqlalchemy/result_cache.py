@@ -0,0 +1,134 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""``nark`` gather() result cache."""
+
+import copy
+from collections import OrderedDict
+
+__all__ = (
+    'ResultCache',
+)
+
+
+class ResultCache(object):
+    """LRU cache of gather() results, invalidated whenever the store is written.
+
+    Each entry is tagged with the store's write generation at the time it was
+    cached. Every write (add, update, or remove) bumps the generation, which
+    invalidates all cached entries at once (they are dropped lazily on lookup,
+    and eagerly on the next put).
+
+    Args:
+        max_entries (int): The number of results to keep, after which the least
+            recently used result is evicted. 0 disables the cache.
+
+        max_rows (int): The largest result (number of rows) that will be
+            cached. Larger results are returned but not cached. 0 for no limit.
+    """
+
+    def __init__(self, max_entries=0, max_rows=0):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def bump_generation(self):
+        """Invalidate all cached results. Call after every store write."""
+        self.generation += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        return {
+            'generation': self.generation,
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    # ***
+
+    def get(self, key):
+        """Returns (True, results) on a hit, otherwise (False, None)."""
+        try:
+            generation, results = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        if generation != self.generation:
+            del self.entries[key]
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, self.copy_results(results)
+
+    def put(self, key, results):
+        if self.max_rows and isinstance(results, list) and len(results) > self.max_rows:
+            return
+        if self.entries:
+            # The first entry is the least recently used, so if it's stale, so
+            # might others be; and if it's fresh, so are the rest.
+            _lru_key, (generation, _results) = next(iter(self.entries.items()))
+            if generation != self.generation:
+                self.entries.clear()
+        self.entries[key] = (self.generation, self.copy_results(results))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def copy_results(self, results):
+        # Copy the list (and any list subclass attributes, e.g., a ResultsPage's
+        # continuation), and the items, too, so the caller can sort or trim the
+        # list, or edit its items (e.g., a Fact's description), without affecting
+        # the cache. (The items are hydrated, and not bound to the session, and
+        # deepcopy keeps the items that share, e.g., an Activity, sharing a copy.)
+        return copy.deepcopy(results)
+
+    # ***
+
+    @classmethod
+    def normalize_key(cls, value):
+        """Returns a hashable form of the value, e.g., replacing lists with tuples.
+
+        Raises TypeError if the value (or some part of it) cannot be hashed.
+        """
+        if isinstance(value, (list, tuple, set, frozenset)):
+            normalized = tuple(cls.normalize_key(elem) for elem in value)
+            if isinstance(value, (set, frozenset)):
+                normalized = tuple(sorted(normalized, key=repr))
+            return normalized
+        if isinstance(value, dict):
+            return tuple(sorted(
+                (key, cls.normalize_key(val)) for key, val in value.items()
+            ))
+        hash(value)
+        return value
@@ -22,20 +22,27 @@
 from gettext import gettext as _
 
 import os.path
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # Profiling: load create_engine: ~ 0.100 secs.
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.exc import OperationalError
 # Profiling: load sessionmaker: ~ 0.050 secs.
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import SingletonThreadPool
 
 from . import objects
+from ...config import SQLITE_PRAGMA_NAMES, SQLITE_PRAGMA_PROFILES
 from ...manager import BaseStore
+from .change_log import ChangeLog
+from .integrity import IntegrityChecker
 from .managers.activity import ActivityManager
 from .managers.category import CategoryManager
 from .managers.fact import FactManager
 from .managers.migrate import MigrationsManager
 from .managers.tag import TagManager
+from .result_cache import ResultCache
 
 __all__ = ('SQLAlchemyStore', )
 
@@ -72,6 +79,14 @@ class SQLAlchemyStore(BaseStore):
         """
         super(SQLAlchemyStore, self).__init__(config)
         self.create_item_managers()
+        self.create_result_cache()
+        self.change_log = ChangeLog(self)
+        # True while gather_many holds its read transaction open.
+        self.read_snapshot_active = False
+        # The connection's total_changes when the read transaction began.
+        self.read_snapshot_changes = None
+        # The QueryProfile of the latest gather() run with explain or profile.
+        self.last_query_profile = None
 
     def standup(self, session=None):
         """
@@ -216,8 +231,20 @@ class SQLAlchemyStore(BaseStore):
         # It takes more deliberation to decide how to handle engine creation
         # if we receive a session. Should be require the session to bring
         # its own engine?
-        engine = create_engine(self.db_url)
+        pragmas = self.sqlite_pragmas
+        engine_kwargs = {}
+        if pragmas:
+            # SQLAlchemy defaults to NullPool for SQLite files, which opens a
+            # new connection for every transaction. But the page cache and the
+            # memory-map are per-connection, so they'd be discarded after each
+            # transaction, and the PRAGMAs would be re-run on every reconnect.
+            # - SingletonThreadPool keeps one connection per thread (and the
+            #   sqlite3 module won't share a connection between threads).
+            engine_kwargs['poolclass'] = SingletonThreadPool
+        engine = create_engine(self.db_url, **engine_kwargs)
         self.logger.debug(_('Engine created.'))
+        if pragmas:
+            self.listen_sqlite_pragmas(engine, pragmas)
         # NOTE: (lb): I succeeded at setting the ORM (Sqlite3) logger level,
         # but it didn't log anything (I was hoping to see all statements).
         #
@@ -225,6 +252,51 @@ class SQLAlchemyStore(BaseStore):
         #  engine.logger.setLevel(logging.DEBUG)
         return engine
 
+    @property
+    def sqlite_pragmas(self):
+        """
+        Return the SQLite PRAGMA values to set on each new connection.
+
+        Starts with the ``db.pragma_profile`` preset, and then applies any
+        individual PRAGMA settings (``db.journal_mode``, ``db.synchronous``,
+        ``db.cache_size``, ``db.mmap_size``, ``db.temp_store``, and
+        ``db.busy_timeout``) that are not ``''``.
+
+        Returns:
+            OrderedDict: PRAGMA name-value pairs, in SQLITE_PRAGMA_NAMES order;
+            empty if nothing to set (or if ``db.engine`` is not 'sqlite').
+        """
+        pragmas = OrderedDict()
+        if self.config['db.engine'] != 'sqlite':
+            return pragmas
+        profile = SQLITE_PRAGMA_PROFILES[self.config['db.pragma_profile']]
+        for pragma in SQLITE_PRAGMA_NAMES:
+            value = self.config['db.{}'.format(pragma)]
+            if value == '':
+                value = profile.get(pragma, '')
+            if value != '':
+                pragmas[pragma] = value
+        return pragmas
+
+    def listen_sqlite_pragmas(self, engine, pragmas):
+        # (lb): PRAGMA values cannot be bound parameters, but they're
+        # validated by the config (see NarkConfigurableDb), so all's well.
+        statements = [
+            'PRAGMA {} = {}'.format(pragma, value) for pragma, value in pragmas.items()
+        ]
+
+        # Each pooled DBAPI connection is new to SQLite, and most of these
+        # PRAGMAs are per-connection (only journal_mode=wal persists), so
+        # set them whenever the pool connects.
+        def sqlite_on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+
+        event.listen(engine, 'connect', sqlite_on_connect)
+        self.logger.debug(_('SQLite PRAGMAs: {}').format(', '.join(statements)))
+
     def create_storage_tables(self, engine):
         # Such magic: Stash the Engine() object in the SQLAlchemy package
         # where the Alchemy items will find it and use it by default.
@@ -259,6 +331,13 @@ class SQLAlchemyStore(BaseStore):
             self.logger.debug(_("Instantiated session."))
         else:
             self.session = session
+        event.listen(self.session, 'before_commit', self.session_before_commit)
+
+    def session_before_commit(self, session):
+        # Refresh the daily rollups as part of each write, so that reads
+        # never have to (see GatherRollupManager.refresh_rollups).
+        if self.facts.has_fact_rollups:
+            self.facts.refresh_rollups()
 
     def create_item_managers(self):
         self.migrations = MigrationsManager(self)
@@ -269,3 +348,163 @@ class SQLAlchemyStore(BaseStore):
         self.facts = FactManager(self, localize=localize)
         self.fact_cls = None
 
+    def create_result_cache(self):
+        self.result_cache = ResultCache(
+            max_entries=self.config['db.result_cache_size'],
+            max_rows=self.config['db.result_cache_rows'],
+        )
+
+    def bump_write_generation(self):
+        """Invalidates cached get_all() results. Called after every write."""
+        self.result_cache.bump_generation()
+
+    @property
+    def write_generation(self):
+        return self.result_cache.generation
+
+    @property
+    def result_cache_hits(self):
+        return self.result_cache.hits
+
+    @property
+    def result_cache_misses(self):
+        return self.result_cache.misses
+
+    # ***
+
+    def gather_many(self, requests):
+        """
+        Run several get_all() queries against one consistent snapshot of the data.
+
+        E.g., a status screen that lists the latest Facts, and the Activities,
+        Categories, and Tags by usage, sees the same data for each list, even if
+        another process writes to the database in between the queries.
+
+        Args:
+            requests: A sequence of (manager, query_terms) pairs, e.g.,
+                ``[(store.facts, QueryTerms(limit=10)), ...]``. The manager
+                may also be named, e.g., ``('tags', QueryTerms())``. And the
+                query_terms may be None (for the get_all() defaults).
+
+        Returns:
+            list: The get_all() results of each request, in the same order.
+            (Identical requests are only queried once, but each gets its own
+            copy of the results list.)
+        """
+        results = []
+        seen = {}
+        with self.read_snapshot():
+            for manager, query_terms in requests:
+                if isinstance(manager, str):
+                    manager = getattr(self, manager)
+                try:
+                    terms_key = query_terms and query_terms.as_tuple()
+                    request_key = (manager, ResultCache.normalize_key(terms_key))
+                    found = seen.get(request_key)
+                except TypeError:
+                    # Unhashable query term.
+                    request_key = found = None
+                if found is not None:
+                    results.append(self.result_cache.copy_results(found))
+                    continue
+                found = manager.get_all(query_terms)
+                if request_key is not None:
+                    seen[request_key] = found
+                results.append(found)
+        return results
+
+    @property
+    def revision(self):
+        """The store's latest change log revision (see changes_since)."""
+        return self.change_log.revision
+
+    def changes_since(self, revision=0, compact=True):
+        """
+        Stream the changes made to the items since the revision, oldest first.
+
+        E.g., a sync worker (or a cache, or an export) that saved the store's
+        revision the last time it ran can apply just the changes since then::
+
+            for change in store.changes_since(last_revision):
+                ...  # Re-fetch (or remove) the change.table_name item.
+                last_revision = change.revision
+
+        Args:
+            revision (int): The revision of the last change already applied.
+            compact (bool): If True (the default), only include each item's
+                latest change.
+
+        Returns:
+            An iterator over the Change (revision, table_name, item_id, op)
+            tuples. (See ChangeLog.changes_since.)
+        """
+        return self.change_log.changes_since(revision, compact=compact)
+
+    def check_integrity(self, parallel_chunks=0):
+        """
+        Check the whole store for problems that the item managers would not allow.
+
+        E.g., overlapping Facts, more than one active Fact, references to missing
+        items, and broken split_from chains. See IntegrityChecker.ISSUE_KINDS.
+
+        Args:
+            parallel_chunks (int): If more than 1, check the Facts for overlaps
+                in this many time chunks, in parallel (SQLite file stores only).
+
+        Returns:
+            An iterator over the IntegrityIssue (kind, pks, message) tuples.
+        """
+        return IntegrityChecker(self).check(parallel_chunks=parallel_chunks)
+
+    def write_pending(self):
+        """Return True if the session's connection holds uncommitted writes.
+
+        (SQLite only; always False otherwise.) Flushed but uncommitted writes
+        hold SQLite's write lock, and they're not seen by other connections.
+        The read_snapshot's own transaction does not count, unless something
+        wrote within it.
+        """
+        if self.config['db.engine'] != 'sqlite':
+            return False
+        dbapi_conn = self.session.connection().connection.connection
+        if not dbapi_conn.in_transaction:
+            return False
+        if not self.read_snapshot_active:
+            return True
+        return dbapi_conn.total_changes != self.read_snapshot_changes
+
+    @contextmanager
+    def read_snapshot(self):
+        """Run the context's queries in one read transaction (SQLite only).
+
+        The sqlite3 module does not begin a transaction until a statement
+        writes, so each SELECT otherwise sees whatever was committed when it
+        ran. If no transaction is open, this begins one, and then ends it after,
+        unless the queries wrote, in which case it's left open to be committed
+        (or not) with the session.
+        """
+        session = self.session
+        if session.autoflush:
+            # Flush now, lest an autoflush write in the middle of the snapshot.
+            session.flush()
+        dbapi_conn = session.connection().connection.connection
+        begin = (
+            self.config['db.engine'] == 'sqlite'
+            and not self.read_snapshot_active
+            and not dbapi_conn.in_transaction
+        )
+        if not begin:
+            yield
+            return
+        dbapi_conn.execute('BEGIN')
+        total_changes = dbapi_conn.total_changes
+        self.read_snapshot_changes = total_changes
+        self.read_snapshot_active = True
+        try:
+            yield
+        finally:
+            self.read_snapshot_active = False
+            self.read_snapshot_changes = None
+            if dbapi_conn.in_transaction and dbapi_conn.total_changes == total_changes:
+                dbapi_conn.rollback()
+
@@ -33,6 +33,8 @@ from .log_levels import get_log_level_safe, get_log_name_safe, must_verify_log_l
 
 __all__ = (
     'REGISTERED_BACKENDS',
+    'SQLITE_PRAGMA_NAMES',
+    'SQLITE_PRAGMA_PROFILES',
     'ConfigRoot',
     'decorate_config',
     # PRIVATE:
@@ -52,6 +54,51 @@ REGISTERED_BACKENDS = {
     ),
 }
 
+# The db.pragma_profile presets, each a set of SQLite PRAGMA values, which
+# the individual db.* PRAGMA settings (e.g., db.journal_mode) can override.
+# - The '' (default) profile leaves SQLite's defaults as they are, i.e., a
+#   rollback journal, full fsync, a 2 MiB page cache, and no memory-mapping.
+# - The 'throughput' profile trades a little durability (a power loss might
+#   lose the last few commits, but will not corrupt the database) for much
+#   faster writes (WAL, with fsync only at checkpoints) and faster reads
+#   (a 64 MiB page cache, and a 256 MiB memory-map of the database file).
+SQLITE_PRAGMA_PROFILES = {
+    '': {},
+    'throughput': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        # A negative cache_size is in KiB, not pages: -65536 = 64 MiB.
+        'cache_size': '-65536',
+        'mmap_size': '268435456',
+        'temp_store': 'memory',
+        'busy_timeout': '5000',
+    },
+}
+
+
+# The db.* settings that map to the SQLite PRAGMA of the same name.
+SQLITE_PRAGMA_NAMES = (
+    'journal_mode',
+    'synchronous',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'busy_timeout',
+)
+
+
+def must_verify_pragma_integer(value):
+    if value == '':
+        return True
+    try:
+        int(value)
+    except ValueError:
+        msg = _(" (Expected an integer, or ‘’ for the default, not “{}”.)").format(
+            value,
+        )
+        raise ValueError(msg)
+    return True
+
 
 # ***
 # *** Top-level, root config object.
@@ -177,6 +224,87 @@ class NarkConfigurableDb(object):
     def password(self):
         return ''
 
+    # ***
+
+    # The PRAGMA settings only apply when db.engine is 'sqlite'. Each defaults
+    # to '', which defers to the db.pragma_profile (and then to SQLite itself).
+    # - The values are interpolated into the PRAGMA statements (which cannot
+    #   be parameterized), so each is validated against what SQLite accepts.
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite PRAGMA preset, either ‘’ (SQLite defaults) or ‘throughput’"
+            " (WAL, relaxed fsync, large cache, memory-mapped reads)."),
+        choices=SQLITE_PRAGMA_PROFILES,
+    )
+    def pragma_profile(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite journal_mode PRAGMA (e.g., ‘wal’), or ‘’ to use the profile’s."),
+        choices=['', 'delete', 'truncate', 'persist', 'memory', 'wal', 'off'],
+    )
+    def journal_mode(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite synchronous PRAGMA (e.g., ‘normal’), or ‘’ to use the profile’s."),
+        choices=['', 'off', 'normal', 'full', 'extra'],
+    )
+    def synchronous(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite cache_size PRAGMA (pages, or KiB if negative),"
+            " or ‘’ to use the profile’s."),
+        validate=must_verify_pragma_integer,
+    )
+    def cache_size(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite mmap_size PRAGMA (bytes), or ‘’ to use the profile’s."),
+        validate=must_verify_pragma_integer,
+    )
+    def mmap_size(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite temp_store PRAGMA (e.g., ‘memory’), or ‘’ to use the profile’s."),
+        choices=['', 'default', 'file', 'memory'],
+    )
+    def temp_store(self):
+        return ''
+
+    @property
+    @ConfigRoot.setting(
+        _("SQLite busy_timeout PRAGMA (milliseconds), or ‘’ to use the profile’s."),
+        validate=must_verify_pragma_integer,
+    )
+    def busy_timeout(self):
+        return ''
+
+    # ***
+
+    @property
+    @ConfigRoot.setting(
+        _("Number of get_all() results to cache between writes (0 disables)."),
+    )
+    def result_cache_size(self):
+        return 0
+
+    @property
+    @ConfigRoot.setting(
+        _("Largest get_all() result (rows) that will be cached (0 for no limit)."),
+    )
+    def result_cache_rows(self):
+        return 10000
+
 
 # ***
 
@@ -19,6 +19,8 @@
 
 from gettext import gettext as _
 
+import copy
+
 from ansiwrap import ansilen  # See also: click._compat.term_len
 from collections import namedtuple
 from collections import Counter
@@ -253,6 +255,21 @@ class Fact(BaseItem):
             new_fact.pk = self.pk
         return new_fact
 
+    def unshare_items(self):
+        """
+        Give this Fact its own copies of its Activity, Category, and Tags.
+
+        The Facts that gather() returns share their item instances (unless
+        you ask for ``QueryTerms.private_items``), so call this before editing
+        a Fact's items in place (e.g., ``fact.activity.name = 'foo'``), lest
+        you edit the other Facts' items, too.
+        """
+        if self.activity is not None:
+            self.activity = copy.copy(self.activity)
+            if self.activity.category is not None:
+                self.activity.category = copy.copy(self.activity.category)
+        self.tags = [copy.copy(tag) for tag in self.tags]
+
     def equal_fields(self, other):
         """
         Compare this instances fields with another fact. This excludes comparing the PK.
@@ -113,6 +113,12 @@ class BaseManager(object):
 
     # ***
 
+    def _get_all_gather(self, query_terms, **kwargs):
+        # Hook for backends to wrap gather (e.g., to cache results).
+        return self.gather(query_terms, **kwargs)
+
+    # ***
+
     def get_all(self, query_terms=None, **kwargs):
         """
         Return all items and any requested stats matching the given search criteria.
@@ -134,7 +140,7 @@ class BaseManager(object):
             # MAYBE: get_all has a side-effect of mutating qt.since and qt.until,
             #   which is not necessarily desirable.
             qt.since, qt.until = _must_parse_since_until(qt.since, qt.until)
-            return self.gather(qt, **kwargs)
+            return self._get_all_gather(qt, **kwargs)
 
         def _must_parse_since_until(since, until):
             self.store.logger.debug('since: {} / until: {}'.format(since, until))
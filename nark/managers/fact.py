@@ -106,6 +106,26 @@ class BaseFactManager(BaseManager):
 
     # ***
 
+    def add_many(self, facts, batch_size=1000, skip_commit=False):
+        """
+        Add many new Facts to the backend, e.g., when importing, and commit once.
+
+        Args:
+            facts (list): The ``nark.Fact`` items to add.
+
+            batch_size (int): The number of Facts to validate and insert at once.
+
+            skip_commit (bool): If True, leave the caller to commit.
+
+        Returns:
+            list: A (pk, error) tuple for each Fact, in the order passed: Either
+                the new Fact's PK, and None; or None, and the exception that
+                kept the Fact out (e.g., a ValueError if it overlaps another).
+        """
+        raise NotImplementedError
+
+    # ***
+
     def _update(self, fact):
         """
         Update and existing fact with new values.
@@ -459,6 +479,53 @@ class BaseFactManager(BaseManager):
 
     # ***
 
+    def neighbors(self, fact=None, ref_time=None, before=1, after=1):
+        """
+        Return the Facts preceding and following the indicated Fact, in one query.
+
+        Args:
+            fact (nark.Fact):
+                The Fact to reference.
+
+            ref_time (datetime.datetime):
+                In lieu of fact, pass the datetime to reference.
+
+            before (int): The number of preceding Facts to find.
+
+            after (int): The number of following Facts to find.
+
+        Returns:
+            tuple: The (antecedents, subsequents) lists of nark.Fact, each
+            ordered nearest Fact first, the same as calling antecedent (or
+            subsequent) repeatedly would find them.
+
+        Raises:
+            ValueError: If neither ``start`` nor ``end`` is set on fact.
+        """
+        raise NotImplementedError
+
+    # ***
+
+    def gaps(self, since=None, until=None, min_gap=None):
+        """
+        Yield the untracked time between Facts, optionally within a time window.
+
+        Args:
+            since (datetime.datetime): If set, also find the gap between since
+                and the first Fact.
+
+            until (datetime.datetime): If set, also find the gap between the
+                final Fact and until.
+
+            min_gap (datetime.timedelta): If set, skip gaps shorter than this.
+
+        Returns:
+            An iterator over the (gap_start, gap_end) datetimes, ordered by time.
+        """
+        raise NotImplementedError
+
+    # ***
+
     def strictly_during(self, start, end, result_limit=1000):
         """
         Return the fact(s) strictly contained within a start and end time.
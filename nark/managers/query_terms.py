@@ -24,6 +24,14 @@ QueryTermsTuple = namedtuple('QueryTermsTuple', (
     'named_tuples',
     'include_stats',
     'count_results',
+    'stream',
+    'yield_per',
+    'bulk_hydrate',
+    'private_items',
+    'batch_tags',
+    'parallel_chunks',
+    'explain',
+    'profile',
     'key',
     'since',
     'until',
@@ -40,10 +48,15 @@ QueryTermsTuple = namedtuple('QueryTermsTuple', (
     'group_category',
     'group_tags',
     'group_days',
+    'group_hours',
+    'group_weeks',
+    'group_months',
+    'splice_days',
     'sort_cols',
     'sort_orders',
     'limit',
     'offset',
+    'seek',
 ))
 
 
@@ -63,6 +76,14 @@ class QueryTerms(object):
             'named?: {}'.format(self.named_tuples),
             'stats?: {}'.format(self.include_stats),
             'count?: {}'.format(self.count_results),
+            'stream?: {}'.format(self.stream),
+            'yield-per: {}'.format(self.yield_per),
+            'bulk?: {}'.format(self.bulk_hydrate),
+            'private?: {}'.format(self.private_items),
+            'batch-tags?: {}'.format(self.batch_tags),
+            'parallel: {}'.format(self.parallel_chunks),
+            'explain?: {}'.format(self.explain),
+            'profile?: {}'.format(self.profile),
             'key: {}'.format(self.key),
             'since: {}'.format(self.since),
             'until: {}'.format(self.until),
@@ -79,10 +100,15 @@ class QueryTerms(object):
             'grp-cats?: {}'.format(self.group_category),
             'grp-tags?: {}'.format(self.group_tags),
             'grp-days?: {}'.format(self.group_days),
+            'grp-hours?: {}'.format(self.group_hours),
+            'grp-weeks?: {}'.format(self.group_weeks),
+            'grp-months?: {}'.format(self.group_months),
+            'splice?: {}'.format(self.splice_days),
             'cols: {}'.format(self.sort_cols),
             'ords: {}'.format(self.sort_orders),
             'limit: {}'.format(self.limit),
             'offset: {}'.format(self.offset),
+            'seek: {}'.format(self.seek),
         ])
 
     def setup_terms(
@@ -94,6 +120,15 @@ class QueryTerms(object):
 
         count_results=False,
 
+        stream=False,
+        yield_per=None,
+        bulk_hydrate=False,
+        private_items=False,
+        batch_tags=False,
+        parallel_chunks=0,
+        explain=False,
+        profile=False,
+
         key=None,
         since=None,
         until=None,
@@ -125,6 +160,10 @@ class QueryTerms(object):
         group_category=False,
         group_tags=False,
         group_days=False,
+        group_hours=False,
+        group_weeks=False,
+        group_months=False,
+        splice_days=False,
 
         # - (lb): I added grouping support to FactManager.get_all via the options:
         #     group_activity
@@ -141,7 +180,8 @@ class QueryTerms(object):
         sort_orders=None,
 
         limit=None,
-        offset=None
+        offset=None,
+        seek=None,
     ):
         """
         Configures query parameters for item.get_all() and item.get_all_by_usage().
@@ -170,6 +210,42 @@ class QueryTerms(object):
                 By default, count_results is False, and the method returns a list of
                 results (of either items or tuples, depending on include_stats).
 
+            stream: If True, return an iterator instead of a list, which fetches
+                and hydrates results in batches (of yield_per rows), so that memory
+                use stays flat no matter how many results match. Note that the
+                iterator holds a database cursor open until it's exhausted, so do
+                not write to the store until you've finished iterating. (The
+                stream option only applies to Facts.)
+            yield_per (int, optional): The number of rows to fetch per batch when
+                streaming results. Defaults to 1000.
+            bulk_hydrate: If True, select plain Fact, Activity, and Category
+                columns and build each Fact directly from its row, rather than
+                loading AlchemyFacts into the session and converting them. This
+                is much faster for large results, e.g., exports, but the Facts'
+                split_from is the ID of the original Fact, and not the item.
+                (Does not apply to raw results, and only applies to Facts.)
+            private_items: If True, give each Fact its own Activity, Category, and
+                Tag items. Otherwise, the Facts that reference the same item share
+                the one instance (which saves lots of memory for large results),
+                so treat the items as read-only, or call ``Fact.unshare_items``
+                on a Fact before editing its items in place.
+            batch_tags: If True, load the Facts' Tags, complete with their PKs, in
+                a second query (one per 500 Facts), rather than concatenating just
+                the Tag names in the main query. Does not apply to raw or grouped
+                results. (Unlike gather's lazy_tags, which runs one query per Fact.)
+            parallel_chunks: If more than 1, and if grouping results, split the time
+                window into this many chunks (by Fact start), aggregate each chunk
+                on its own read-only connection, in parallel, and merge the chunks'
+                groups. Only applies to SQLite file stores, only sees committed
+                Facts, and only supports the 'start', 'time', 'usage', and 'day'
+                sort_cols. Otherwise, gather() runs the usual single query.
+            explain: If True, record the SQL that gather() runs, with its bound
+                parameters and SQLite's EXPLAIN QUERY PLAN, in a QueryProfile,
+                which gather() saves as the store's ``last_query_profile``.
+            profile: If True, record gather()'s SQL execution time, row count,
+                and Python hydration time in the ``last_query_profile``. (Either
+                option also skips the result cache, so the queries always run.)
+
             key: If specified, look for an item with this PK. See also the get()
                 method, if you do not need aggregate results.
             since: Restrict Facts to those that start at or after this time.
@@ -223,7 +299,23 @@ class QueryTerms(object):
             group_category: If True, GROUP BY the Category PK.
             group_tags: If True, group by the Tag PK.
             group_days: If True, group by the Fact start date (e.g., 1999-12-31,
-                i.e., truncating clock time).
+                i.e., truncating clock time). Note that this attributes the whole
+                of each Fact to the day it starts, even if it runs past midnight.
+                To split such Facts between the days instead, set splice_days.
+            group_hours: If True, group by the clock hour, splicing each Fact at
+                the top of each hour, so each hour gets just the time spent in it.
+            group_weeks: If True, group by the week (starting Mondays at the
+                config's time.day_start), splicing each Fact at week boundaries.
+            group_months: If True, group by the month (starting the first of the
+                month at time.day_start), splicing each Fact at month boundaries.
+            splice_days: If True, group by the day (starting at time.day_start),
+                like group_days, but splicing each Fact at day boundaries.
+                - If more than one of these time groupings is requested, the
+                  finest wins. Each result's start_date is the start date of
+                  its time period (or, for hours, the date and hour), and its
+                  duration, first_start, and final_end are those of the spliced
+                  Fact parts (the active Fact, if included, ends 'now'). The
+                  time window (since and until) also splices the Facts.
 
             sort_cols (str list, optional): Which column(s) to sort by.
                 - If not aggregating results, defaults to 'name' and orders
@@ -233,7 +325,7 @@ class QueryTerms(object):
                 - Choices include: 'start', 'time', 'day', 'name', 'activity,
                   'category', 'tag', 'usage', and 'fact'.
                 - Note that 'start' and 'usage' only apply if include_stats,
-                  and 'day' is only valid when group_days is True.
+                  and 'day' is only valid when grouping by time (e.g., group_days).
             sort_orders (str list, optional): Specifies the direction of each
                 sort specified by sort_cols. Use the string 'asc' or 'desc'
                 in the corresponding index of sort_orders that you want applied
@@ -243,6 +335,12 @@ class QueryTerms(object):
 
             limit (int, optional): Query "limit".
             offset (int, optional): Query "offset".
+            seek (str, optional): The continuation token from the previous page of
+                results (see ResultsPage), to fetch the next page of Facts after
+                it (i.e., keyset pagination). Unlike offset, which reads and
+                discards every Fact before the page, seek jumps right to the
+                page, so each page costs the same no matter how deep it is.
+                Only applies to ungrouped Facts sorted by 'start' (the default).
         """
         self.raw = raw
         self.named_tuples = named_tuples
@@ -250,6 +348,15 @@ class QueryTerms(object):
 
         self.count_results = count_results
 
+        self.stream = stream
+        self.yield_per = yield_per
+        self.bulk_hydrate = bulk_hydrate
+        self.private_items = private_items
+        self.batch_tags = batch_tags
+        self.parallel_chunks = parallel_chunks
+        self.explain = explain
+        self.profile = profile
+
         self.key = key
         self.since = since
         self.until = until
@@ -269,12 +376,17 @@ class QueryTerms(object):
         self.group_category = group_category
         self.group_tags = group_tags
         self.group_days = group_days
+        self.group_hours = group_hours
+        self.group_weeks = group_weeks
+        self.group_months = group_months
+        self.splice_days = splice_days
 
         self.sort_cols = sort_cols
         self.sort_orders = sort_orders
 
         self.limit = limit
         self.offset = offset
+        self.seek = seek
 
     # ***
 
@@ -284,6 +396,14 @@ class QueryTerms(object):
             named_tuples=self.named_tuples,
             include_stats=self.include_stats,
             count_results=self.count_results,
+            stream=self.stream,
+            yield_per=self.yield_per,
+            bulk_hydrate=self.bulk_hydrate,
+            private_items=self.private_items,
+            batch_tags=self.batch_tags,
+            parallel_chunks=self.parallel_chunks,
+            explain=self.explain,
+            profile=self.profile,
             key=self.key,
             since=self.since,
             until=self.until,
@@ -300,10 +420,15 @@ class QueryTerms(object):
             group_category=self.group_category,
             group_tags=self.group_tags,
             group_days=self.group_days,
+            group_hours=self.group_hours,
+            group_weeks=self.group_weeks,
+            group_months=self.group_months,
+            splice_days=self.splice_days,
             sort_cols=self.sort_cols,
             sort_orders=self.sort_orders,
             limit=self.limit,
             offset=self.offset,
+            seek=self.seek,
         )
 
     def __eq__(self, other):
@@ -320,9 +445,30 @@ class QueryTerms(object):
             or self.group_category
             or self.group_tags
             or self.group_days
+            or self.time_bucket is not None
         )
         return is_grouped
 
+    @property
+    def time_bucket(self):
+        """The time period that Facts are spliced and grouped by, if any.
+
+        Returns 'hour', 'day', 'week', or 'month' (the finest requested), or None.
+        """
+        if self.group_hours:
+            return 'hour'
+        if self.splice_days:
+            return 'day'
+        if self.group_weeks:
+            return 'week'
+        if self.group_months:
+            return 'month'
+        return None
+
+    @property
+    def is_grouped_by_time(self):
+        return bool(self.group_days or self.time_bucket)
+
     def sort_cols_has_any(self, *args):
         return set(self.sort_cols or []).intersection(set(args))
 
@@ -330,3 +476,27 @@ class QueryTerms(object):
     def sorts_cols_has_stat(self):
         return self.sort_cols_has_any('usage', 'time', 'day')
 
+    @property
+    def is_seekable(self):
+        """True if the results can be paged by seek (see ResultsPage)."""
+        return (
+            not self.is_grouped
+            and not self.sorts_cols_has_stat
+            and set(self.sort_cols or []).issubset(set(['start']))
+            and len(self.sort_cols or []) <= 1
+        )
+
+
+class ResultsPage(list):
+    """
+    A page of (limited) gather() results, which knows where the next page starts.
+
+    Pass the continuation token to a new QueryTerms as ``seek`` (along with the
+    same query and limit) to fetch the next page. The continuation is None if
+    this is the last page.
+    """
+
+    def __init__(self, results, continuation=None):
+        super(ResultsPage, self).__init__(results)
+        self.continuation = continuation
+
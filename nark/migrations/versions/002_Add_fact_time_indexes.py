@@ -0,0 +1,70 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy import Index, MetaData, Table
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the Fact time window and fact_tags indexes. Until now, every
+# gather(), antecedent(), subsequent(), surrounding() and overlap check
+# was a full table scan.
+#
+# - Keep these definitions in sync with the Index() definitions in
+#   nark/backends/sqlalchemy/objects.py, which are used for new stores.
+
+
+def indexes(meta):
+    facts = Table('facts', meta, autoload=True)
+    fact_tags = Table('fact_tags', meta, autoload=True)
+    return [
+        Index(
+            'ix_facts_deleted_start_time_end_time',
+            facts.c.deleted, facts.c.start_time, facts.c.end_time,
+        ),
+        Index(
+            'ix_facts_deleted_end_time_start_time',
+            facts.c.deleted, facts.c.end_time, facts.c.start_time,
+        ),
+        Index(
+            'ix_facts_activity_id_start_time',
+            facts.c.activity_id, facts.c.start_time,
+        ),
+        Index('ix_facts_split_from_id', facts.c.split_from_id),
+        Index(
+            'ix_fact_tags_fact_id_tag_id',
+            fact_tags.c.fact_id, fact_tags.c.tag_id,
+        ),
+        Index(
+            'ix_fact_tags_tag_id_fact_id',
+            fact_tags.c.tag_id, fact_tags.c.fact_id,
+        ),
+    ]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in indexes(meta):
+        index.create(migrate_engine)
+    # Let the query planner know about the new indexes.
+    migrate_engine.execute('ANALYZE')
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for index in indexes(meta):
+        index.drop(migrate_engine)
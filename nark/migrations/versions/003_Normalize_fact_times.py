@@ -0,0 +1,54 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Normalize the Fact start and end times to the canonical storage format,
+# "YYYY-MM-DD HH:MM:SS". Legacy Hamster rows are stored without fractional
+# seconds, but older nark releases stored microseconds (".ffffff"), so the
+# managers used to wrap every time column in func.datetime() just to compare
+# them, which defeated the indexes added in 002.
+#
+# - SQLite's datetime() returns the canonical format (and drops the fraction),
+#   or NULL if it cannot parse the value, in which case the row is left as-is.
+#
+# - Keep this format in sync with FactDateTime in
+#   nark/backends/sqlalchemy/objects.py.
+
+
+def normalize_sql(column):
+    return (
+        'UPDATE facts SET {col} = datetime({col})'
+        ' WHERE {col} IS NOT NULL'
+        ' AND datetime({col}) IS NOT NULL'
+        ' AND {col} != datetime({col})'
+    ).format(col=column)
+
+
+def upgrade(migrate_engine):
+    migrate_engine.execute(normalize_sql('start_time'))
+    migrate_engine.execute(normalize_sql('end_time'))
+    # Refresh the planner statistics, now that the index keys have changed.
+    migrate_engine.execute('ANALYZE')
+
+
+def downgrade(migrate_engine):
+    # The canonical format is also valid for older releases, so there's
+    # nothing to undo (and the dropped fractional seconds were always 0,
+    # as nark strips microseconds from Fact times before saving them).
+    pass
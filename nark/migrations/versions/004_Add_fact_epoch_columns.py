@@ -0,0 +1,50 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy import Column, Integer, MetaData, Table
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the start_epoch and end_epoch columns, the integer (seconds since the
+# epoch) shadows of start_time and end_time, which the gather queries use to
+# compute durations without parsing two text timestamps per row.
+#
+# - The columns are backfilled using strftime('%s'), which treats the naive
+#   times as UTC, same as fact_time_epoch in nark/backends/sqlalchemy/objects.py.
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    facts = Table('facts', meta, autoload=True)
+
+    Column('start_epoch', Integer, nullable=True).create(facts)
+    Column('end_epoch', Integer, nullable=True).create(facts)
+
+    migrate_engine.execute(
+        "UPDATE facts SET"
+        " start_epoch = CAST(strftime('%s', start_time) AS INTEGER),"
+        " end_epoch = CAST(strftime('%s', end_time) AS INTEGER)"
+    )
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    facts = Table('facts', meta, autoload=True)
+
+    facts.c.end_epoch.drop()
+    facts.c.start_epoch.drop()
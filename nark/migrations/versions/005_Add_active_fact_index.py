@@ -0,0 +1,46 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy import Index, MetaData, Table, and_, false
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the active Fact partial index, which holds just the ongoing Fact,
+# so that get_current_fact() is a single index probe.
+#
+# - Keep this definition in sync with the Index() definition in
+#   nark/backends/sqlalchemy/objects.py, which is used for new stores.
+
+
+def index(meta):
+    facts = Table('facts', meta, autoload=True)
+    return Index(
+        'ix_facts_active',
+        facts.c.end_time,
+        sqlite_where=and_(facts.c.end_time.is_(None), facts.c.deleted == false()),
+    )
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    index(meta).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    index(meta).drop(migrate_engine)
@@ -0,0 +1,110 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+import sqlite3
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the optional facts_rtree, an R*Tree interval index over the undeleted
+# Facts' epoch bounds, and the triggers that keep it in sync. If SQLite was
+# built without the R*Tree module, this migration does nothing, and the
+# FactManager continues to use the (slower) B-tree indexes.
+#
+# - Keep these definitions in sync with FACTS_RTREE_DDL in
+#   nark/backends/sqlalchemy/objects.py, which is used for new stores.
+
+END_OF_TIME = 253402300799  # 9999-12-31 23:59:59.
+
+START_EPOCH = "CAST(strftime('%s', NEW.start_time) AS INTEGER)"
+
+END_EPOCH = (
+    "COALESCE(CAST(strftime('%s', NEW.end_time) AS INTEGER), {})"
+    .format(END_OF_TIME)
+)
+
+# The R*Tree rejects an interval that ends before it starts, which a legacy
+# (Hamster) store might have, so store the bounds as min() and max().
+EPOCHS = "min({0}, {1}), max({0}, {1})".format(START_EPOCH, END_EPOCH)
+
+DDL = (
+    "CREATE VIRTUAL TABLE facts_rtree USING rtree(id, start_epoch, end_epoch)",
+    (
+        "CREATE TRIGGER facts_rtree_insert AFTER INSERT ON facts"
+        " WHEN NOT NEW.deleted AND NEW.start_time IS NOT NULL"
+        " BEGIN"
+        " INSERT INTO facts_rtree VALUES (NEW.id, {});"
+        " END"
+    ).format(EPOCHS),
+    (
+        "CREATE TRIGGER facts_rtree_update AFTER UPDATE ON facts"
+        " BEGIN"
+        " DELETE FROM facts_rtree WHERE id = OLD.id;"
+        " INSERT INTO facts_rtree SELECT NEW.id, {}"
+        " WHERE NOT NEW.deleted AND NEW.start_time IS NOT NULL;"
+        " END"
+    ).format(EPOCHS),
+    (
+        "CREATE TRIGGER facts_rtree_delete AFTER DELETE ON facts"
+        " BEGIN"
+        " DELETE FROM facts_rtree WHERE id = OLD.id;"
+        " END"
+    ),
+)
+
+BACKFILL = (
+    "INSERT INTO facts_rtree"
+    " SELECT id, {}"
+    " FROM facts AS NEW"
+    " WHERE NOT deleted AND start_time IS NOT NULL"
+).format(EPOCHS)
+
+
+def upgrade(migrate_engine):
+    # Create the table and triggers, and backfill, in one transaction, so that
+    # a failure leaves nothing half-applied. (The sqlite3 module would commit
+    # the DDL as it goes, so turn its transaction handling off and BEGIN.)
+    connection = migrate_engine.raw_connection()
+    dbapi_conn = connection.connection
+    isolation_level = dbapi_conn.isolation_level
+    dbapi_conn.isolation_level = None
+    try:
+        dbapi_conn.execute('BEGIN')
+        try:
+            dbapi_conn.execute(DDL[0])
+        except sqlite3.OperationalError:
+            # E.g., "no such module: rtree".
+            dbapi_conn.execute('ROLLBACK')
+            return
+        try:
+            for ddl in DDL[1:]:
+                dbapi_conn.execute(ddl)
+            dbapi_conn.execute(BACKFILL)
+        except Exception:
+            dbapi_conn.execute('ROLLBACK')
+            raise
+        dbapi_conn.execute('COMMIT')
+    finally:
+        dbapi_conn.isolation_level = isolation_level
+        connection.close()
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_rtree_delete')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_rtree_update')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_rtree_insert')
+    migrate_engine.execute('DROP TABLE IF EXISTS facts_rtree')
@@ -0,0 +1,79 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy.exc import OperationalError
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the optional facts_fts, an FTS5 (trigram) full-text index of the Fact
+# descriptions, and the triggers that keep it in sync. If SQLite does not
+# support FTS5 or the trigram tokenizer (added in SQLite 3.34.0), this
+# migration does nothing, and gather() continues to search using LIKE.
+#
+# - Keep these definitions in sync with FACTS_FTS_DDL in
+#   nark/backends/sqlalchemy/objects.py, which is used for new stores.
+
+DDL = (
+    (
+        "CREATE VIRTUAL TABLE facts_fts USING fts5("
+        "description, content='facts', content_rowid='id', tokenize='trigram'"
+        ")"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_insert AFTER INSERT ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (rowid, description)"
+        " VALUES (NEW.id, NEW.description);"
+        " END"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_update AFTER UPDATE OF description ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (facts_fts, rowid, description)"
+        " VALUES ('delete', OLD.id, OLD.description);"
+        " INSERT INTO facts_fts (rowid, description)"
+        " VALUES (NEW.id, NEW.description);"
+        " END"
+    ),
+    (
+        "CREATE TRIGGER facts_fts_delete AFTER DELETE ON facts"
+        " BEGIN"
+        " INSERT INTO facts_fts (facts_fts, rowid, description)"
+        " VALUES ('delete', OLD.id, OLD.description);"
+        " END"
+    ),
+)
+
+
+def upgrade(migrate_engine):
+    try:
+        migrate_engine.execute(DDL[0])
+    except OperationalError:
+        # E.g., "no such tokenizer: trigram".
+        return
+    for ddl in DDL[1:]:
+        migrate_engine.execute(ddl)
+    # Index the existing Facts.
+    migrate_engine.execute("INSERT INTO facts_fts (facts_fts) VALUES ('rebuild')")
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_fts_delete')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_fts_update')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS facts_fts_insert')
+    migrate_engine.execute('DROP TABLE IF EXISTS facts_fts')
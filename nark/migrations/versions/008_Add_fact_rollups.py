@@ -0,0 +1,148 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    Unicode,
+    UnicodeText,
+    UniqueConstraint
+)
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the fact_rollups table, the daily (pre-aggregated) totals of the Facts,
+# by (day, Activity, set of Tags), which gather() uses for day-grouped reports;
+# the fact_rollups_dirty table, which tracks which rollups need refreshing; and
+# the triggers that mark the rollups dirty whenever a Fact (or its Tags) change.
+#
+# - Keep these definitions in sync with fact_rollups, fact_rollups_dirty, and
+#   FACT_ROLLUPS_DDL in nark/backends/sqlalchemy/objects.py, and with
+#   FACT_ROLLUPS_AGGREGATE in nark/backends/sqlalchemy/managers/gather_rollup.py.
+
+MARK_DIRTY = (
+    " INSERT OR IGNORE INTO fact_rollups_dirty (day, activity_id)"
+    " SELECT date({row}.start_time), {row}.activity_id"
+    " WHERE {row}.start_time IS NOT NULL;"
+)
+
+MARK_DIRTY_BY_FACT_ID = (
+    " INSERT OR IGNORE INTO fact_rollups_dirty (day, activity_id)"
+    " SELECT date(start_time), activity_id FROM facts"
+    " WHERE id = {row}.fact_id AND start_time IS NOT NULL;"
+)
+
+DDL = (
+    (
+        "CREATE TRIGGER fact_rollups_facts_insert AFTER INSERT ON facts"
+        " BEGIN{} END"
+    ).format(MARK_DIRTY.format(row='NEW')),
+    (
+        "CREATE TRIGGER fact_rollups_facts_update AFTER UPDATE OF"
+        " deleted, start_time, end_time, start_epoch, end_epoch, activity_id"
+        " ON facts"
+        " BEGIN{}{} END"
+    ).format(
+        MARK_DIRTY.format(row='OLD'),
+        MARK_DIRTY.format(row='NEW'),
+    ),
+    (
+        "CREATE TRIGGER fact_rollups_facts_delete AFTER DELETE ON facts"
+        " BEGIN{} END"
+    ).format(MARK_DIRTY.format(row='OLD')),
+    (
+        "CREATE TRIGGER fact_rollups_fact_tags_insert AFTER INSERT ON fact_tags"
+        " BEGIN{} END"
+    ).format(MARK_DIRTY_BY_FACT_ID.format(row='NEW')),
+    (
+        "CREATE TRIGGER fact_rollups_fact_tags_delete AFTER DELETE ON fact_tags"
+        " BEGIN{} END"
+    ).format(MARK_DIRTY_BY_FACT_ID.format(row='OLD')),
+)
+
+BACKFILL = (
+    "INSERT INTO fact_rollups"
+    " (day, activity_id, tag_key, seconds, fact_count, first_start, final_end)"
+    " SELECT day, activity_id, tag_key,"
+    " SUM(end_epoch - start_epoch), COUNT(*), MIN(start_time), MAX(end_time)"
+    " FROM ("
+    "SELECT date(facts.start_time) AS day, facts.activity_id,"
+    " COALESCE(("
+    "SELECT group_concat(tag_id) FROM ("
+    "SELECT DISTINCT fact_tags.tag_id FROM fact_tags"
+    " WHERE fact_tags.fact_id = facts.id ORDER BY fact_tags.tag_id"
+    ")"
+    "), '') AS tag_key,"
+    " facts.start_epoch, facts.end_epoch, facts.start_time, facts.end_time"
+    " FROM facts"
+    " WHERE NOT facts.deleted"
+    " AND facts.start_time IS NOT NULL"
+    " AND facts.end_time IS NOT NULL"
+    ")"
+    " GROUP BY day, activity_id, tag_key"
+)
+
+
+def tables(meta):
+    activities = Table('activities', meta, autoload=True)
+    fact_rollups = Table(
+        'fact_rollups', meta,
+        Column('day', Unicode(10), nullable=False),
+        Column('activity_id', Integer, ForeignKey(activities.c.id), nullable=True),
+        Column('tag_key', UnicodeText(), nullable=False),
+        Column('seconds', Integer, nullable=False),
+        Column('fact_count', Integer, nullable=False),
+        Column('first_start', DateTime),
+        Column('final_end', DateTime),
+    )
+    Index(
+        'ix_fact_rollups_day_activity_id_tag_key',
+        fact_rollups.c.day, fact_rollups.c.activity_id, fact_rollups.c.tag_key,
+    )
+    fact_rollups_dirty = Table(
+        'fact_rollups_dirty', meta,
+        Column('day', Unicode(10), nullable=False),
+        Column('activity_id', Integer, nullable=True),
+        UniqueConstraint('day', 'activity_id'),
+    )
+    return [fact_rollups, fact_rollups_dirty]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    for new_table in tables(meta):
+        new_table.create()
+    for ddl in DDL:
+        migrate_engine.execute(ddl)
+    migrate_engine.execute(BACKFILL)
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute('DROP TRIGGER IF EXISTS fact_rollups_fact_tags_delete')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS fact_rollups_fact_tags_insert')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS fact_rollups_facts_delete')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS fact_rollups_facts_update')
+    migrate_engine.execute('DROP TRIGGER IF EXISTS fact_rollups_facts_insert')
+    meta = MetaData(bind=migrate_engine)
+    for old_table in reversed(tables(meta)):
+        old_table.drop()
@@ -0,0 +1,109 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All rights reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+from sqlalchemy import Column, Index, Integer, MetaData, Table, Unicode
+
+# USAGE: See 001_Add_deleted_columns.py, or run `dob migrate up`.
+
+# Add the changes table, the change log of every item write, which clients
+# read via store.changes_since(revision) to sync incrementally; and the
+# triggers that write it.
+#
+# - Keep these definitions in sync with changes and CHANGES_DDL in
+#   nark/backends/sqlalchemy/objects.py.
+# - The log starts empty, i.e., a client at revision 0 must read everything
+#   once, as it would have before, and can then ask for changes_since.
+
+ITEM_TABLES = ('categories', 'activities', 'tags', 'facts')
+
+LOG = (
+    " INSERT INTO changes (table_name, item_id, op)"
+    " VALUES ('{table}', {item_id}, {op});"
+)
+
+LOG_OP_UPDATE = "CASE WHEN NEW.deleted THEN 'delete' ELSE 'update' END"
+
+DDL = tuple(
+    ddl
+    for table_name in ITEM_TABLES
+    for ddl in (
+        (
+            "CREATE TRIGGER changes_{table}_insert AFTER INSERT ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=LOG.format(
+            table=table_name, item_id='NEW.id', op="'insert'",
+        )),
+        (
+            "CREATE TRIGGER changes_{table}_update AFTER UPDATE ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=LOG.format(
+            table=table_name, item_id='NEW.id', op=LOG_OP_UPDATE,
+        )),
+        (
+            "CREATE TRIGGER changes_{table}_delete AFTER DELETE ON {table}"
+            " BEGIN{log} END"
+        ).format(table=table_name, log=LOG.format(
+            table=table_name, item_id='OLD.id', op="'delete'",
+        )),
+    )
+) + (
+    (
+        "CREATE TRIGGER changes_fact_tags_insert AFTER INSERT ON fact_tags"
+        " BEGIN{} END"
+    ).format(LOG.format(table='facts', item_id='NEW.fact_id', op="'update'")),
+    (
+        "CREATE TRIGGER changes_fact_tags_delete AFTER DELETE ON fact_tags"
+        " BEGIN{} END"
+    ).format(LOG.format(table='facts', item_id='OLD.fact_id', op="'update'")),
+)
+
+TRIGGER_NAMES = tuple(
+    'changes_{}_{}'.format(table_name, op)
+    for table_name in ITEM_TABLES
+    for op in ('insert', 'update', 'delete')
+) + ('changes_fact_tags_insert', 'changes_fact_tags_delete')
+
+
+def table(meta):
+    changes = Table(
+        'changes', meta,
+        Column('revision', Integer, primary_key=True),
+        Column('table_name', Unicode(16), nullable=False),
+        Column('item_id', Integer, nullable=False),
+        Column('op', Unicode(6), nullable=False),
+        sqlite_autoincrement=True,
+    )
+    Index(
+        'ix_changes_table_name_item_id_revision',
+        changes.c.table_name, changes.c.item_id, changes.c.revision,
+    )
+    return changes
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+    table(meta).create()
+    for ddl in DDL:
+        migrate_engine.execute(ddl)
+
+
+def downgrade(migrate_engine):
+    for trigger_name in reversed(TRIGGER_NAMES):
+        migrate_engine.execute('DROP TRIGGER IF EXISTS {}'.format(trigger_name))
+    meta = MetaData(bind=migrate_engine)
+    table(meta).drop()
@@ -23,6 +23,10 @@ import pytest
 from freezegun import freeze_time
 
 from nark.backends.sqlalchemy.objects import AlchemyActivity, AlchemyFact, AlchemyTag
+from nark.items.activity import Activity
+from nark.items.category import Category
+from nark.items.fact import Fact
+from nark.items.tag import Tag
 
 
 class TestFactManager():
@@ -116,6 +120,13 @@ class TestFactManager():
         assert alchemy_store.session.query(AlchemyActivity).count() == 1
         assert db_instance.as_hamster(alchemy_store).equal_fields(fact)
 
+    def test_add_sets_epoch_columns(self, alchemy_store, fact):
+        """Make sure that adding a fact sets its integer epoch columns."""
+        result = alchemy_store.facts._add(fact)
+        db_instance = alchemy_store.session.query(AlchemyFact).get(result.pk)
+        span = db_instance.end_epoch - db_instance.start_epoch
+        assert span == (fact.end - fact.start).total_seconds()
+
     def test_add_fails_pk_not_none(self, alchemy_store, fact):
         """Make sure that passing a fact with a PK raises error."""
         fact.pk = 101
@@ -146,6 +157,15 @@ class TestFactManager():
         result.split_from = None
         assert result.equal_fields(fact)
 
+    def test_update_sets_epoch_columns(self, alchemy_store, alchemy_fact):
+        """Make sure that updating a fact maintains its integer epoch columns."""
+        fact = alchemy_fact.as_hamster(alchemy_store)
+        fact.end = None
+        result = alchemy_store.facts._update(fact)
+        db_instance = alchemy_store.session.query(AlchemyFact).get(result.pk)
+        assert db_instance.start_epoch is not None
+        assert db_instance.end_epoch is None
+
     def test_update_fails_pk_unknown(self, alchemy_store, alchemy_fact, new_fact_values):
         """Make sure that trying to update a fact that does not exist raises error."""
         fact = alchemy_fact.as_hamster(alchemy_store)
@@ -178,6 +198,108 @@ class TestFactManager():
 
     # ***
 
+    def test_add_many(self, alchemy_store, alchemy_fact_factory):
+        """Make sure add_many adds the valid Facts, and reports the others."""
+        base = datetime.datetime(2020, 5, 1, 9, 0)
+
+        def _at(minutes):
+            if minutes is None:
+                return None
+            return base + datetime.timedelta(minutes=minutes)
+
+        stored = alchemy_fact_factory(start=_at(0), end=_at(60))
+        act_a = Activity('act-a', category=Category('cat-a'))
+        solo = Activity('solo')
+
+        def _fact(start, end, activity=act_a, tags=(), pk=None):
+            tags = [Tag(name) for name in tags]
+            return Fact(activity, _at(start), _at(end), pk=pk, tags=tags)
+
+        facts = [
+            _fact(90, 120, tags=('x', 'y', 'x')),
+            # Overlaps the previous Fact.
+            _fact(100, 130),
+            # Overlaps the stored Fact.
+            _fact(30, 80),
+            # Ends before it starts.
+            _fact(300, 200),
+            _fact(130, 150, tags=('y', 'z')),
+            _fact(200, None, activity=solo),
+            # Already has a PK.
+            _fact(500, 510, pk=123),
+            # Overlaps a Fact added with an earlier batch.
+            _fact(95, 97),
+        ]
+        results = alchemy_store.facts.add_many(facts, batch_size=3)
+        assert [pk is not None for pk, _error in results] == [
+            True, False, False, False, True, True, False, False,
+        ]
+        assert all(
+            isinstance(error, ValueError)
+            for pk, error in results if pk is None
+        )
+        added = [alchemy_store.facts.get(pk) for pk, _error in results if pk]
+        assert [(fact.start, fact.end) for fact in added] == [
+            (_at(90), _at(120)), (_at(130), _at(150)), (_at(200), None),
+        ]
+        assert [fact.activity.name for fact in added] == ['act-a', 'act-a', 'solo']
+        assert added[0].activity.pk == added[1].activity.pk
+        assert added[0].activity.category.name == 'cat-a'
+        assert added[2].activity.category is None
+        assert [sorted(tag.name for tag in fact.tags) for fact in added] == [
+            ['x', 'y'], ['y', 'z'], [],
+        ]
+        # The Facts share the one new 'y' Tag.
+        tag_pks = [{tag.name: tag.pk for tag in fact.tags} for fact in added[:2]]
+        assert tag_pks[0]['y'] == tag_pks[1]['y']
+        # The results are no different than adding each Fact.
+        assert alchemy_store.facts.get(stored.pk).start == _at(0)
+        assert list(alchemy_store.check_integrity()) == []
+
+    def test_add_many_batch_statements(self, alchemy_store, mocker):
+        """Make sure add_many does not query per Fact, Activity, or Tag."""
+        base = datetime.datetime(2020, 5, 1, 9, 0)
+        facts = [
+            Fact(
+                Activity('act-{}'.format(idx % 7), category=Category('cat')),
+                base + datetime.timedelta(hours=idx),
+                base + datetime.timedelta(hours=idx, minutes=45),
+                tags=[Tag('tag-{}'.format(idx % 5)), Tag('tag-{}'.format(idx % 3))],
+            )
+            for idx in range(50)
+        ]
+        connection = alchemy_store.session.connection()
+        cursor_execute = mocker.spy(connection, '_execute_context')
+        # (Skip the commit, which the test session runs as a RELEASE SAVEPOINT.)
+        results = alchemy_store.facts.add_many(facts, skip_commit=True)
+        # One range query, plus (select, insert, select) for each of the
+        # Categories, Activities, and Tags, plus the Facts, the max ID before,
+        # the count of the new IDs, and the Fact Tags.
+        assert cursor_execute.call_count == 14
+        assert all(pk is not None for pk, _error in results)
+        assert len(alchemy_store.tags.get_all()) == 5
+        assert len(alchemy_store.activities.get_all()) == 7
+
+    def test_add_many_unexpected_pks(self, alchemy_store, alchemy_activity):
+        """Make sure add_many checks the new IDs before linking the Tags to them."""
+        # Once the max ID is taken, SQLite assigns new IDs at random.
+        alchemy_store.session.execute(
+            'INSERT INTO facts (id, activity_id, start_time, end_time, deleted)'
+            " VALUES (9223372036854775807, :activity_id,"
+            " '2020-05-01 08:00:00', '2020-05-01 09:00:00', 0)",
+            {'activity_id': alchemy_activity.pk},
+        )
+        start = datetime.datetime(2020, 5, 2, 8, 0)
+        fact = Fact(
+            Activity('act'), start, start + datetime.timedelta(hours=1),
+            tags=[Tag('tag')],
+        )
+        with pytest.raises(Exception) as excinfo:
+            alchemy_store.facts.add_many([fact], skip_commit=True)
+        assert 'Expected the 1 new Facts' in str(excinfo.value)
+
+    # ***
+
     def test_remove_normal(self, alchemy_store, alchemy_fact):
         """Make sure the fact but not its tags are removed."""
         count_before = alchemy_store.session.query(AlchemyFact).count()
@@ -295,6 +417,102 @@ class TestFactManager():
 
     # ***
 
+    @pytest.mark.parametrize('ref_index', (0, 2, 4))
+    def test_neighbors_matches_walking_each_way(
+        self,
+        alchemy_store,
+        set_of_alchemy_facts_active,
+        alchemy_fact_factory,
+        ref_index,
+    ):
+        """Make sure neighbors finds the Facts that antecedent and subsequent do."""
+        facts = set_of_alchemy_facts_active
+        # Add some momentaneous Facts, which share their moment with the Facts'
+        # ends and starts, and with one another.
+        for moment in (facts[1].end, facts[1].end, facts[3].start):
+            alchemy_fact_factory(start=moment, end=moment)
+        fact = facts[ref_index].as_hamster(alchemy_store)
+
+        def _walk(step):
+            found = []
+            neighbor = step(fact=fact)
+            while neighbor is not None:
+                found.append(neighbor)
+                neighbor = step(fact=neighbor)
+            return found
+
+        expect_before = _walk(alchemy_store.facts.antecedent)
+        expect_after = _walk(alchemy_store.facts.subsequent)
+        assert len(expect_before) + len(expect_after) == 7
+        antecedents, subsequents = alchemy_store.facts.neighbors(
+            fact, before=10, after=10,
+        )
+        assert antecedents == expect_before
+        assert subsequents == expect_after
+        antecedents, subsequents = alchemy_store.facts.neighbors(
+            fact, before=2, after=0,
+        )
+        assert antecedents == expect_before[:2]
+        assert subsequents == []
+
+    def test_neighbors_loads_items_in_one_query(
+        self, alchemy_store, set_of_alchemy_facts, mocker,
+    ):
+        """Make sure neighbors does not lazy-load each Fact's Activity or Tags."""
+        fact = set_of_alchemy_facts[2].as_hamster(alchemy_store)
+        alchemy_store.session.expire_all()
+        execute = mocker.spy(alchemy_store.session, 'execute')
+        connection = alchemy_store.session.connection()
+        cursor_execute = mocker.spy(connection, '_execute_context')
+        antecedents, subsequents = alchemy_store.facts.neighbors(
+            fact, before=2, after=2,
+        )
+        assert antecedents == [
+            set_of_alchemy_facts[1].as_hamster(alchemy_store),
+            set_of_alchemy_facts[0].as_hamster(alchemy_store),
+        ]
+        assert len(subsequents) == 2
+        assert subsequents[0].tags
+        assert execute.call_count == 0
+        assert cursor_execute.call_count == 1
+
+    # ***
+
+    def test_gaps_between_facts(self, alchemy_store, alchemy_fact_factory):
+        """Make sure gaps finds the time between Facts, but not within overlaps."""
+        base = datetime.datetime(2020, 5, 1, 9, 0)
+
+        def _at(minutes):
+            return base + datetime.timedelta(minutes=minutes)
+
+        for start, end in ((0, 60), (90, 120), (100, 110), (105, 150), (150, 150)):
+            alchemy_fact_factory(start=_at(start), end=_at(end))
+        alchemy_fact_factory(start=_at(180), end=None)
+        # The gap before the overlapping Facts, and the one before the active Fact.
+        assert list(alchemy_store.facts.gaps()) == [
+            (_at(60), _at(90)),
+            (_at(150), _at(180)),
+        ]
+        # The window adds the gap before the first Fact; and the active Fact
+        # is considered to end now, which the window ends after.
+        now = alchemy_store.now.replace(microsecond=0)
+        gaps = alchemy_store.facts.gaps(
+            since=_at(-30), until=now + datetime.timedelta(hours=1),
+        )
+        assert list(gaps) == [
+            (_at(-30), _at(0)),
+            (_at(60), _at(90)),
+            (_at(150), _at(180)),
+            (now, now + datetime.timedelta(hours=1)),
+        ]
+        # The window clips the Facts that surround it.
+        gaps = alchemy_store.facts.gaps(since=_at(30), until=_at(100))
+        assert list(gaps) == [(_at(60), _at(90))]
+        gaps = alchemy_store.facts.gaps(min_gap=datetime.timedelta(minutes=31))
+        assert list(gaps) == []
+
+    # ***
+
     def test_strictly_during(self, alchemy_store, set_of_alchemy_facts):
         """Verify FactManager.strictly_during finds a range of Facts."""
         assert len(set_of_alchemy_facts) == 5
@@ -322,6 +540,129 @@ class TestFactManager():
         results = alchemy_store.facts.surrounding(fact_time=fact_time, inclusive=False)
         assert results[0] == any_fact
 
+    def test_surrounding_exclusive_inner_sans_rtree(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Verify surrounding works the same if the store has no R*Tree."""
+        alchemy_store.facts._has_facts_rtree = False
+        any_fact = set_of_alchemy_facts[2]
+        fact_time = any_fact.end - ((any_fact.end - any_fact.start) / 2)
+        results = alchemy_store.facts.surrounding(fact_time=fact_time, inclusive=False)
+        assert results == [any_fact]
+
+    def test_facts_rtree_candidates(self, alchemy_store, set_of_alchemy_facts):
+        """Verify the R*Tree tracks undeleted Facts, and finds overlapping ones."""
+        assert alchemy_store.facts.has_facts_rtree
+        any_fact = set_of_alchemy_facts[2]
+        since, until = any_fact.start, any_fact.end
+        assert any_fact.pk in alchemy_store.facts.facts_rtree_candidates(since, until)
+        any_fact.deleted = True
+        alchemy_store.session.flush()
+        assert any_fact.pk not in alchemy_store.facts.facts_rtree_candidates(
+            since, until,
+        )
+
+    def test_facts_rtree_candidates_inverted(self, alchemy_store, set_of_alchemy_facts):
+        """Verify the R*Tree accepts a (legacy) Fact that ends before it starts."""
+        assert alchemy_store.facts.has_facts_rtree
+        any_fact = set_of_alchemy_facts[2]
+        since, until = any_fact.start, any_fact.end
+        # Invert the Fact in place (the update trigger), and then raw-insert
+        # another inverted Fact, as a legacy store might have (the insert trigger).
+        any_fact.start, any_fact.end = until, since
+        alchemy_store.session.flush()
+        alchemy_store.session.execute(
+            'INSERT INTO facts (activity_id, start_time, end_time, deleted)'
+            ' VALUES (:activity_id, :start, :end, 0)',
+            {
+                'activity_id': any_fact.activity.pk,
+                'start': until.strftime('%Y-%m-%d %H:%M:%S'),
+                'end': since.strftime('%Y-%m-%d %H:%M:%S'),
+            },
+        )
+        legacy_pk = alchemy_store.session.execute('SELECT MAX(id) FROM facts').scalar()
+        candidates = alchemy_store.facts.facts_rtree_candidates(since, until)
+        assert any_fact.pk in candidates
+        assert legacy_pk in candidates
+
+    def test_facts_rtree_migration_inverted(self, tmpdir):
+        """Verify migration 006 backfills inverted Facts, else leaves no trace."""
+        import importlib
+        from sqlalchemy import create_engine
+
+        migration = importlib.import_module(
+            'nark.migrations.versions.006_Add_facts_rtree'
+        )
+        engine = create_engine('sqlite:///{}'.format(tmpdir.join('legacy.sqlite')))
+        engine.execute(
+            'CREATE TABLE facts (id INTEGER PRIMARY KEY,'
+            ' start_time DATETIME, end_time DATETIME, deleted BOOLEAN)'
+        )
+        engine.execute(
+            "INSERT INTO facts VALUES"
+            " (1, '2020-01-01 10:00:00', '2020-01-01 09:00:00', 0),"
+            " (2, '2020-01-01 11:00:00', NULL, 0)"
+        )
+
+        def rtree_tables():
+            return engine.execute(
+                "SELECT name FROM sqlite_master WHERE name LIKE 'facts_rtree%'"
+            ).fetchall()
+
+        # A failure partway through (here, a trigger that exists already)
+        # rolls back the whole migration.
+        engine.execute(
+            'CREATE TRIGGER facts_rtree_update AFTER UPDATE ON facts'
+            ' BEGIN SELECT 1; END'
+        )
+        with pytest.raises(Exception):
+            migration.upgrade(engine)
+        assert rtree_tables() == [('facts_rtree_update',)]
+        engine.execute('DROP TRIGGER facts_rtree_update')
+
+        migration.upgrade(engine)
+        rtree_rows = engine.execute(
+            'SELECT id, start_epoch, end_epoch FROM facts_rtree ORDER BY id'
+        ).fetchall()
+        # (The R*Tree rounds its 32-bit float bounds outward.)
+        expect_rows = [
+            (1, 1577869200, 1577872800),
+            (2, 1577876400, migration.END_OF_TIME),
+        ]
+        assert [row[0] for row in rtree_rows] == [row[0] for row in expect_rows]
+        for (_pk, start_epoch, end_epoch), (_pk, since, until) in zip(
+            rtree_rows, expect_rows,
+        ):
+            assert start_epoch <= since < until <= end_epoch
+        engine.execute("UPDATE facts SET end_time = '2020-01-01 08:00:00' WHERE id = 1")
+        migration.downgrade(engine)
+        assert rtree_tables() == []
+
+    def test_facts_rtree_candidates_unflushed(self, alchemy_store, set_of_alchemy_facts):
+        """Verify the R*Tree candidates include the session's unflushed changes."""
+        assert alchemy_store.facts.has_facts_rtree
+        any_fact = set_of_alchemy_facts[2]
+        # After all the other Facts (the last of which might be active).
+        latest = max(fact.end or fact.start for fact in set_of_alchemy_facts)
+        start = latest + datetime.timedelta(days=1)
+        end = start + datetime.timedelta(hours=1)
+        alchemy_store.session.add(AlchemyFact(
+            pk=None,
+            activity=any_fact.activity,
+            start=start,
+            end=end,
+            description='Unflushed',
+            deleted=False,
+            split_from=None,
+        ))
+        overlapping = Fact(any_fact.activity.as_hamster(alchemy_store), start, end)
+        assert not alchemy_store.facts._timeframe_available_for_fact(overlapping)
+        # Likewise, an unflushed deletion leaves no stale candidate.
+        any_fact.deleted = True
+        assert any_fact.pk not in alchemy_store.facts.facts_rtree_candidates(
+            any_fact.start, any_fact.end,
+        )
+
     def test_surrounding_inclusive_outer(
         self, alchemy_store, set_of_alchemy_facts_contiguous,
     ):
@@ -352,5 +693,11 @@ class TestFactManager():
         results = alchemy_store.facts.endless()
         assert results[0] == expect
 
+    def test_endless_ignores_deleted(self, alchemy_store, set_of_alchemy_facts_active):
+        """Verify FactManager.endless skips a deleted active Fact."""
+        set_of_alchemy_facts_active[-1].deleted = True
+        results = alchemy_store.facts.endless()
+        assert results == []
+
     # ***
 
@@ -42,6 +42,36 @@ class TestGatherBaseAlchemyManager():
         count = alchemy_store.activities.get_all(count_results=True)
         assert count == len(set_of_alchemy_facts)
 
+    @pytest.mark.parametrize(
+        'query_kwargs',
+        (
+            {'limit': 3, 'offset': 1},
+            {'include_stats': True},
+            {'include_stats': True, 'sort_cols': ('usage',), 'limit': 2},
+        ),
+    )
+    def test_get_all_count_results_matches_results(
+        self, alchemy_store, set_of_alchemy_facts, query_kwargs,
+    ):
+        # Share an Activity, so that the Fact join yields a repeat Activity.
+        set_of_alchemy_facts[1].activity = set_of_alchemy_facts[0].activity
+        alchemy_store.session.flush()
+        results = alchemy_store.activities.get_all(**query_kwargs)
+        count = alchemy_store.activities.get_all(count_results=True, **query_kwargs)
+        assert count == len(results)
+
+    def test_get_all_explain_records_query_profile(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        results = alchemy_store.activities.get_all(
+            include_stats=True, explain=True, profile=True,
+        )
+        profile = alchemy_store.last_query_profile
+        assert 'FROM facts' in profile.sql
+        assert profile.row_count == len(results)
+        # Every Activity's usage means reading every Fact.
+        assert 'SCAN facts' in profile.full_scans
+
     def test_get_all_no_query_terms_raw(self, alchemy_store, set_of_alchemy_facts):
         """Test query_process_results._process_records_items_only second branch."""
         results = alchemy_store.activities.get_all(raw=True)
@@ -18,12 +18,22 @@
 # or visit <http://www.gnu.org/licenses/>.
 
 import datetime
+import os
+import sqlite3
 
 import pytest
 
-from nark.backends.sqlalchemy.objects import AlchemyFact
+from nark.backends.sqlalchemy.objects import (
+    AlchemyActivity,
+    AlchemyCategory,
+    AlchemyFact,
+    AlchemyTag
+)
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
 from nark.backends.sqlalchemy.managers.fact import FactManager
 from nark.backends.sqlalchemy.managers.gather_fact import GatherFactManager
+from nark.items.activity import Activity
+from nark.items.category import Category
 from nark.items.fact import Fact
 from nark.items.tag import Tag
 
@@ -165,6 +175,28 @@ class TestGatherFactManager():
         assert str(results[0]) == str(set_of_alchemy_facts[1])
         assert results == [set_of_alchemy_facts[1]]
 
+    @pytest.mark.parametrize(
+        ('has_facts_fts', 'term'),
+        (
+            (True, 'ZEBRA cross'),
+            (False, 'ZEBRA cross'),
+            # Terms too short for the trigram index fallback to LIKE.
+            (True, 'zE'),
+        ),
+    )
+    def test_get_all_search_matches_description_part(
+        self, alchemy_store, set_of_alchemy_facts, has_facts_fts, term,
+    ):
+        """Make sure search terms match any part of the description, any case."""
+        alchemy_store.facts._has_facts_fts = has_facts_fts
+        # Lest a random description happen to match, too.
+        for idx, alchemy_fact in enumerate(set_of_alchemy_facts):
+            alchemy_fact.description = 'Fact #{}'.format(idx)
+        set_of_alchemy_facts[1].description = 'A zebra crossing.'
+        alchemy_store.session.flush()
+        results = alchemy_store.facts.get_all(search_terms=[term], lazy_tags=True)
+        assert results == [set_of_alchemy_facts[1]]
+
     def test_get_all_search_matches_activity(self, alchemy_store, set_of_alchemy_facts):
         """Make sure facts with ``Fact.activity.name`` matching the term are returned."""
         assert len(set_of_alchemy_facts) == 5
@@ -189,6 +221,14 @@ class TestGatherFactManager():
         assert str(results[0]) == str(set_of_alchemy_facts[1])
         assert results == [set_of_alchemy_facts[1]]
 
+    def test_get_all_search_matches_tag(self, alchemy_store, set_of_alchemy_facts):
+        """Make sure facts with a ``Fact.tags`` name matching the term are returned."""
+        search_terms = [set_of_alchemy_facts[1].tags[0].name]
+        results = alchemy_store.facts.get_all(
+            search_terms=search_terms, broad_match=True, lazy_tags=True,
+        )
+        assert results == [set_of_alchemy_facts[1]]
+
     # ***
 
     def test__get_all_no_query_terms_not_lazy(self, alchemy_store, set_of_alchemy_facts):
@@ -226,6 +266,110 @@ class TestGatherFactManager():
         results = alchemy_store.facts.get_all(count_results=True)
         assert results == 5
 
+    @pytest.mark.parametrize(
+        'query_kwargs',
+        (
+            {},
+            {'limit': 2, 'offset': 1},
+            {'exclude_ongoing': True},
+            {'search_terms': ['a']},
+            {'group_activity': True},
+            {'group_category': True},
+            {'group_activity': True, 'group_category': True},
+            {'group_tags': True},
+            {'group_days': True},
+            {'splice_days': True, 'group_category': True},
+            {'group_tags': True, 'group_days': True, 'limit': 1},
+        ),
+    )
+    def test_get_all_count_results_matches_results(
+        self, alchemy_store, set_of_alchemy_facts_active, query_kwargs,
+    ):
+        """Make sure the count planner counts what get_all returns."""
+        # Give two Facts the same Activity, and two other Facts the same Tags,
+        # so that the groups collapse some Facts.
+        facts = set_of_alchemy_facts_active
+        facts[1].activity = facts[0].activity
+        facts[3].tags = facts[2].tags
+        alchemy_store.session.flush()
+        alchemy_store.facts._has_fact_rollups = False
+        results = alchemy_store.facts.get_all(**query_kwargs)
+        count = alchemy_store.facts.get_all(count_results=True, **query_kwargs)
+        assert count == len(results)
+
+    def test_get_all_count_results_skips_joins(
+        self, alchemy_store, set_of_alchemy_facts, mocker,
+    ):
+        """Make sure a plain count of Facts is just a COUNT of the facts table."""
+        trace = mocker.spy(alchemy_store.facts, 'query_prepared_trace')
+        count = alchemy_store.facts.get_all(
+            count_results=True, since=datetime.datetime(2000, 1, 1),
+        )
+        assert count == len(set_of_alchemy_facts)
+        sql = str(trace.call_args[0][0]).upper()
+        assert 'JOIN' not in sql
+        assert 'GROUP' not in sql
+        assert 'ORDER BY' not in sql
+
+    @pytest.mark.parametrize('bulk_hydrate', [True, False])
+    def test_get_all_explain_records_query_profile(
+        self, alchemy_store, set_of_alchemy_facts, bulk_hydrate,
+    ):
+        """Make sure explain records the SQL, its params, and its query plan."""
+        since = datetime.datetime(2000, 1, 1)
+        results = alchemy_store.facts.get_all(
+            since=since, explain=True, profile=True, bulk_hydrate=bulk_hydrate,
+        )
+        assert len(results) == len(set_of_alchemy_facts)
+        profile = alchemy_store.last_query_profile
+        assert 'FROM facts' in profile.sql
+        assert any(isinstance(param, str) and param.startswith('2000-01-01')
+                   for param in profile.params)
+        assert profile.query_plan
+        assert profile.row_count == len(set_of_alchemy_facts)
+        assert profile.sql_time > 0
+        assert profile.hydrate_time > 0
+
+    def test_get_all_explain_group_days_records_main_query(
+        self, alchemy_store, set_of_alchemy_facts_contiguous,
+    ):
+        """Make sure explain profiles the rollups query, not the lookups before it."""
+        for alchemy_fact in set_of_alchemy_facts_contiguous:
+            if alchemy_fact.end is None:
+                alchemy_fact.end = alchemy_fact.start + datetime.timedelta(hours=1)
+        alchemy_store.facts.refresh_rollups()
+        results = alchemy_store.facts.get_all(
+            group_days=True, include_stats=True, explain=True,
+        )
+        profile = alchemy_store.last_query_profile
+        # E.g., the endless() lookup ran first, to see if the rollups apply.
+        assert profile.main_index > 0
+        assert 'FROM fact_rollups' in profile.sql
+        assert profile.query_plan
+        assert profile.row_count >= len(results) > 0
+
+    def test_get_all_explain_finds_full_scans(self, alchemy_store, set_of_alchemy_facts):
+        """Make sure full_scans reports scanning a table but not an index search."""
+        alchemy_store.facts.get_all(search_terms=['foo'], explain=True)
+        profile = alchemy_store.last_query_profile
+        # The LIKE filter on the Activity name cannot use an index.
+        assert profile.full_scans
+        alchemy_store.facts.get_all(key=set_of_alchemy_facts[0].pk, explain=True)
+        profile = alchemy_store.last_query_profile
+        assert not [scan for scan in profile.full_scans if 'facts' in scan]
+
+    def test_get_all_profile_skips_result_cache(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Make sure a profiled gather always runs its query."""
+        alchemy_store.result_cache.max_entries = 10
+        alchemy_store.facts.get_all()
+        alchemy_store.facts.get_all(profile=True)
+        profile = alchemy_store.last_query_profile
+        assert len(profile.statements) == 1
+        assert profile.query_plan is None
+        assert alchemy_store.result_cache_hits == 0
+
     def test__get_all_include_stats_return_raw(
         self, alchemy_store, set_of_alchemy_facts,
     ):
@@ -325,6 +469,307 @@ class TestGatherFactManager():
 
     # ***
 
+    @pytest.mark.parametrize('include_stats', (False, True))
+    def test_get_all_stream_matches_list(
+        self, alchemy_store, set_of_alchemy_facts, include_stats,
+    ):
+        """Make sure streamed results are the same as the listed results."""
+        results = alchemy_store.facts.get_all(include_stats=include_stats)
+        streamed = alchemy_store.facts.get_all(
+            include_stats=include_stats, stream=True, yield_per=2,
+        )
+        assert not isinstance(streamed, list)
+        assert list(streamed) == results
+
+    def test_get_all_stream_expunges_loaded_facts(
+        self, alchemy_store, set_of_alchemy_facts, mocker,
+    ):
+        """Make sure streaming lets go of the AlchemyFacts that it loads."""
+        alchemy_store.session.flush()
+        # The set_of_alchemy_facts are already in the session, so they're not
+        # expunged (the caller might still be using them). Start fresh.
+        alchemy_store.session.expunge_all()
+        expunge = mocker.spy(alchemy_store.session, 'expunge')
+        streamed = alchemy_store.facts.get_all(stream=True, yield_per=2)
+        assert len(list(streamed)) == len(set_of_alchemy_facts)
+        assert expunge.call_count == len(set_of_alchemy_facts)
+
+    def test_get_all_stream_keeps_preloaded_facts(
+        self, alchemy_store, set_of_alchemy_facts, mocker,
+    ):
+        """Make sure streaming does not expunge the caller's AlchemyFacts."""
+        expunge = mocker.spy(alchemy_store.session, 'expunge')
+        streamed = alchemy_store.facts.get_all(stream=True)
+        assert len(list(streamed)) == len(set_of_alchemy_facts)
+        assert not expunge.called
+
+    # ***
+
+    @pytest.mark.parametrize(
+        'query_kwargs',
+        (
+            {},
+            {'include_stats': True},
+            {'group_activity': True, 'include_stats': True},
+            {'group_tags': True},
+            {'sort_cols': ['activity'], 'limit': 3},
+            {'stream': True, 'yield_per': 2},
+        ),
+    )
+    def test_get_all_bulk_hydrate_matches_orm(
+        self, alchemy_store, set_of_alchemy_facts, query_kwargs,
+    ):
+        """Make sure bulk hydrated results are the same as the ORM results."""
+        results = alchemy_store.facts.get_all(**query_kwargs)
+        hydrated = alchemy_store.facts.get_all(bulk_hydrate=True, **query_kwargs)
+        assert list(hydrated) == list(results)
+
+    def test_get_all_bulk_hydrate_skips_session(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Make sure bulk hydration does not load AlchemyFacts into the session."""
+        alchemy_store.session.flush()
+        alchemy_store.session.expunge_all()
+        results = alchemy_store.facts.get_all(bulk_hydrate=True)
+        assert len(results) == len(set_of_alchemy_facts)
+        assert not alchemy_store.session.identity_map
+
+    @pytest.mark.parametrize('bulk_hydrate', (False, True))
+    def test_get_all_shares_items(
+        self, alchemy_store, alchemy_fact_factory, bulk_hydrate,
+    ):
+        """Make sure Facts that use the same Activity and Tags share the items."""
+        alchemy_fact_1 = alchemy_fact_factory()
+        alchemy_fact_2 = alchemy_fact_factory()
+        alchemy_fact_2.activity = alchemy_fact_1.activity
+        alchemy_fact_2.tags = list(alchemy_fact_1.tags)
+        results = alchemy_store.facts.get_all(bulk_hydrate=bulk_hydrate)
+        assert len(results) == 2
+        fact_1, fact_2 = results
+        assert fact_1.activity is fact_2.activity
+        assert fact_1.category is fact_2.category
+        assert fact_1.tags
+        assert set(map(id, fact_1.tags)) == set(map(id, fact_2.tags))
+
+    @pytest.mark.parametrize(
+        'query_kwargs',
+        (
+            {},
+            {'bulk_hydrate': True},
+            {'include_stats': True},
+            {'sort_cols': ['tag']},
+            {'stream': True, 'yield_per': 2},
+            {'stream': True, 'yield_per': 2, 'bulk_hydrate': True},
+        ),
+    )
+    def test_get_all_batch_tags_matches_lazy_tags(
+        self, alchemy_store, set_of_alchemy_facts, query_kwargs,
+    ):
+        """Make sure batch_tags loads complete Tags, with PKs, like lazy_tags."""
+        results = alchemy_store.facts.get_all(lazy_tags=True)
+        batched = alchemy_store.facts.get_all(batch_tags=True, **query_kwargs)
+        if query_kwargs.get('include_stats'):
+            batched = [result[0] for result in batched]
+        assert sorted(batched, key=lambda fact: fact.pk) == results
+        assert all(tag.pk for fact in results for tag in fact.tags)
+
+    def test_get_all_batch_tags_chunks_queries(
+        self, alchemy_store, set_of_alchemy_facts, mocker,
+    ):
+        """Make sure batch_tags runs one Tags query per chunk of Facts."""
+        alchemy_store.facts.BATCH_TAGS_CHUNK_SIZE = 2
+        execute = mocker.spy(alchemy_store.session, 'execute')
+        results = alchemy_store.facts.get_all(batch_tags=True)
+        assert len(results) == 5
+        # The Facts query runs via Query, so these are just the Tags queries.
+        assert execute.call_count == 3
+
+    def test_get_all_private_items(self, alchemy_store, alchemy_fact_factory):
+        """Make sure Facts get their own items if the caller asks."""
+        alchemy_fact_1 = alchemy_fact_factory()
+        alchemy_fact_2 = alchemy_fact_factory()
+        alchemy_fact_2.activity = alchemy_fact_1.activity
+        results = alchemy_store.facts.get_all(private_items=True)
+        fact_1, fact_2 = results
+        assert fact_1.activity == fact_2.activity
+        assert fact_1.activity is not fact_2.activity
+
+    # ***
+
+    @pytest.mark.parametrize('sort_orders', (None, ['asc'], ['desc']))
+    def test_get_all_seek_pages(
+        self, alchemy_store, set_of_alchemy_facts_active, sort_orders,
+    ):
+        """Make sure seeking page-by-page finds the same Facts as one query."""
+        sort_cols = ['start'] if sort_orders else None
+        expect = alchemy_store.facts.get_all(
+            sort_cols=['start'], sort_orders=sort_orders,
+        )
+        assert expect[-1 if sort_orders != ['desc'] else 0].end is None
+        seek = None
+        pages = []
+        while True:
+            page = alchemy_store.facts.get_all(
+                sort_cols=sort_cols, sort_orders=sort_orders, limit=2, seek=seek,
+            )
+            pages.append(page)
+            seek = page.continuation
+            if seek is None:
+                break
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [fact for page in pages for fact in page] == expect
+
+    def test_get_all_seek_pages_exclude_ongoing(
+        self, alchemy_store, set_of_alchemy_facts_active,
+    ):
+        """Make sure seeking works when the tags subquery cannot be paged."""
+        page = alchemy_store.facts.get_all(exclude_ongoing=True, limit=3)
+        page = alchemy_store.facts.get_all(
+            exclude_ongoing=True, limit=3, seek=page.continuation,
+        )
+        assert [fact.pk for fact in page] == [set_of_alchemy_facts_active[3].pk]
+        assert page.continuation is None
+
+    def test_get_all_seek_include_stats(self, alchemy_store, set_of_alchemy_facts):
+        page = alchemy_store.facts.get_all(include_stats=True, limit=3)
+        assert page.continuation == alchemy_store.facts.seek_token(page[-1][0])
+        page = alchemy_store.facts.get_all(
+            include_stats=True, limit=3, seek=page.continuation,
+        )
+        assert len(page) == 2
+        assert page.continuation is None
+
+    def test_get_all_seek_grouped_raises(self, alchemy_store):
+        token = alchemy_store.facts.seek_token(
+            Fact(activity=None, start=datetime.datetime(2020, 1, 1), end=None),
+        )
+        with pytest.raises(ValueError):
+            alchemy_store.facts.get_all(group_activity=True, seek=token)
+
+    def test_get_all_seek_token_invalid_raises(self, alchemy_store):
+        with pytest.raises(ValueError):
+            alchemy_store.facts.get_all(seek='not a token!')
+
+    # ***
+
+    @pytest.mark.parametrize(
+        ('query_kind'),
+        ('times', 'search', 'activity', 'category', 'tag', 'key', 'offset'),
+    )
+    def test_get_all_reuses_query_with_new_params(
+        self, alchemy_store, set_of_alchemy_facts, query_kind,
+    ):
+        """Make sure a cached query shape is reused, with this call's values."""
+        by_start = sorted(set_of_alchemy_facts, key=lambda fact: fact.start)
+
+        def query_kwargs(fact, idx):
+            return {
+                'times': {'since': fact.start, 'until': fact.end},
+                'search': {'search_terms': [fact.description]},
+                'activity': {'match_activities': [fact.activity.name]},
+                'category': {'match_categories': [fact.category.name]},
+                'tag': {'match_tags': [fact.tags[0].name]},
+                'key': {'key': fact.pk},
+                'offset': {'limit': 1, 'offset': idx + 1},
+            }[query_kind]
+
+        def expected(fact, idx):
+            if query_kind == 'offset':
+                return [by_start[idx + 1].pk]
+            return [fact.pk]
+
+        cache = alchemy_store.facts.gather_bakery.cache
+        for idx, fact in enumerate(set_of_alchemy_facts[:3]):
+            results = alchemy_store.facts.get_all(**query_kwargs(fact, idx))
+            assert [result.pk for result in results] == expected(fact, idx)
+            if idx == 0:
+                cache_size = len(cache)
+            else:
+                assert len(cache) == cache_size
+
+    def test_get_all_result_cache_hit(self, alchemy_store, set_of_alchemy_facts):
+        """Make sure repeated queries are answered from the result cache."""
+        alchemy_store.result_cache.max_entries = 8
+        results = alchemy_store.facts.get_all(since='2015-01-01', include_stats=True)
+        assert alchemy_store.result_cache_misses == 1
+        assert alchemy_store.result_cache_hits == 0
+        again = alchemy_store.facts.get_all(since='2015-01-01', include_stats=True)
+        assert alchemy_store.result_cache_hits == 1
+        assert again == results
+        # The caller gets its own list.
+        assert again is not results
+
+    def test_get_all_result_cache_copies_items(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Make sure editing a cached result's items does not affect the cache."""
+        alchemy_store.result_cache.max_entries = 8
+        results = alchemy_store.facts.get_all()
+        expect = [str(fact) for fact in results]
+        results[0].description = 'Edited on miss.'
+        results[0].activity.name = 'Edited activity'
+        again = alchemy_store.facts.get_all()
+        assert alchemy_store.result_cache_hits == 1
+        assert [str(fact) for fact in again] == expect
+        again[0].description = 'Edited on hit.'
+        assert [str(fact) for fact in alchemy_store.facts.get_all()] == expect
+        assert alchemy_store.result_cache_hits == 2
+
+    @pytest.mark.parametrize(
+        ('write', 'count_delta'), (('add', 1), ('update', 0), ('remove', -1)),
+    )
+    def test_get_all_result_cache_invalidated_by_writes(
+        self, alchemy_store, set_of_alchemy_facts, write, count_delta,
+    ):
+        """Make sure adding, updating, or removing a Fact invalidates the cache."""
+        alchemy_store.result_cache.max_entries = 8
+        facts = alchemy_store.facts.get_all()
+        generation = alchemy_store.write_generation
+        fact = facts[0].copy()
+        if write == 'add':
+            fact.pk = None
+            fact.start = datetime.datetime(2010, 1, 1, 12)
+            fact.end = datetime.datetime(2010, 1, 1, 13)
+            alchemy_store.facts.save(fact)
+        elif write == 'update':
+            fact.description = 'Updated'
+            alchemy_store.facts.save(fact)
+        else:
+            alchemy_store.facts.remove(fact)
+        assert alchemy_store.write_generation > generation
+        results = alchemy_store.facts.get_all()
+        assert alchemy_store.result_cache_hits == 0
+        assert len(results) == len(facts) + count_delta
+        if write == 'update':
+            assert 'Updated' in [result.description for result in results]
+
+    def test_get_all_result_cache_lru_eviction(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Make sure the least recently used result is evicted when full."""
+        alchemy_store.result_cache.max_entries = 2
+        alchemy_store.facts.get_all(limit=1)
+        alchemy_store.facts.get_all(limit=2)
+        alchemy_store.facts.get_all(limit=1)
+        alchemy_store.facts.get_all(limit=3)
+        assert alchemy_store.result_cache_hits == 1
+        # The limit=2 results were evicted, but limit=1 was recently used.
+        alchemy_store.facts.get_all(limit=1)
+        assert alchemy_store.result_cache_hits == 2
+        alchemy_store.facts.get_all(limit=2)
+        assert alchemy_store.result_cache_hits == 2
+
+    def test_get_all_result_cache_skips_lazy_tags_and_stream(
+        self, alchemy_store, set_of_alchemy_facts,
+    ):
+        """Make sure results that reference session objects are not cached."""
+        alchemy_store.result_cache.max_entries = 8
+        alchemy_store.facts.get_all(lazy_tags=True)
+        list(alchemy_store.facts.get_all(stream=True))
+        assert alchemy_store.result_cache.stats['entries'] == 0
+
+    # ***
+
     @pytest.mark.parametrize(
         ('group_activity', 'group_category', 'group_tags', 'group_days'),
         (
@@ -365,6 +810,401 @@ class TestGatherFactManager():
             expect_count = 1
         assert len(results) == expect_count
 
+    @pytest.mark.parametrize(
+        ('group_activity', 'group_category', 'group_tags'),
+        (
+            (False, False, False),
+            (True, False, False),
+            (False, True, False),
+            (True, True, True),
+        )
+    )
+    def test_get_all_group_days_rollups_match_facts(
+        self,
+        alchemy_store,
+        set_of_alchemy_facts_contiguous,
+        group_activity,
+        group_category,
+        group_tags,
+    ):
+        """Make sure the daily rollups answer the same as the Facts do."""
+        def get_all_stats():
+            results = alchemy_store.facts.get_all(
+                group_activity=group_activity,
+                group_category=group_category,
+                group_tags=group_tags,
+                group_days=True,
+                # The rollups exclude the active Fact (it has no end yet).
+                exclude_ongoing=True,
+                include_stats=True,
+                named_tuples=True,
+            )
+            return sorted([
+                (
+                    stats[1:],
+                    sorted((tag.name, tag.freq) for tag in stats.fact.tags),
+                )
+                for stats in results
+            ], key=lambda result: result[0][2:4])
+
+        # (The factories flush but do not commit, which is what refreshes.)
+        alchemy_store.facts.refresh_rollups()
+        assert alchemy_store.facts.rollups_current()
+        rollups = get_all_stats()
+        assert rollups
+        alchemy_store.facts._has_fact_rollups = False
+        assert get_all_stats() == rollups
+
+    @pytest.mark.parametrize('sort_cols', [(), ('start',), ('usage',)])
+    @pytest.mark.parametrize('sort_order', ['asc', 'desc'])
+    def test_get_all_group_days_rollups_match_facts_order(
+        self,
+        alchemy_store,
+        alchemy_activity_factory,
+        alchemy_fact_factory,
+        sort_cols,
+        sort_order,
+    ):
+        """Make sure the rollups and the Facts page through the groups alike."""
+        activities = [alchemy_activity_factory() for _ in range(3)]
+        # Interleave the Activities, so each day's groups' first and last Facts
+        # are in different orders.
+        plan = [
+            (0, 1, 0), (0, 0, 2), (0, 1, 4), (0, 0, 6),
+            (1, 0, 0), (1, 2, 1), (1, 1, 3), (1, 0, 5),
+            (2, 2, 0), (2, 1, 2),
+        ]
+        for day, which, hour in plan:
+            alchemy_fact = alchemy_fact_factory()
+            alchemy_fact.activity = activities[which]
+            alchemy_fact.start = datetime.datetime(2020, 5, 1 + day, 8 + hour)
+            alchemy_fact.end = alchemy_fact.start + datetime.timedelta(minutes=50)
+        alchemy_store.session.flush()
+
+        def get_all_groups(**kwargs):
+            results = alchemy_store.facts.get_all(
+                group_activity=True,
+                group_days=True,
+                exclude_ongoing=True,
+                include_stats=True,
+                named_tuples=True,
+                sort_cols=sort_cols,
+                sort_orders=(sort_order,) * len(sort_cols),
+                **kwargs
+            )
+            return [(stats.start_date, stats.fact.activity.pk) for stats in results]
+
+        alchemy_store.facts.refresh_rollups()
+        rollups = get_all_groups()
+        rollups_page = get_all_groups(limit=3, offset=2)
+        assert len(rollups) == 7
+        assert rollups_page == rollups[2:5]
+        alchemy_store.facts._has_fact_rollups = False
+        assert get_all_groups() == rollups
+        assert get_all_groups(limit=3, offset=2) == rollups_page
+
+    def test_get_all_group_days_rollups_fallback_straddles_until(
+        self, alchemy_store, set_of_alchemy_facts_contiguous,
+    ):
+        """Make sure the rollups defer to the Facts if a Fact runs past until."""
+        fact = set_of_alchemy_facts_contiguous[0]
+        until = fact.start.replace(hour=0, minute=0, second=0) + datetime.timedelta(1)
+        fact.end = until + datetime.timedelta(minutes=1)
+        alchemy_store.facts.refresh_rollups()
+        results = alchemy_store.facts.get_all(
+            group_days=True, until=until, include_stats=True, named_tuples=True,
+        )
+        assert len(results) == 1
+        expect_count = len([
+            fact for fact in set_of_alchemy_facts_contiguous
+            if fact.end and fact.end <= until
+        ])
+        assert results[0].group_count == expect_count
+
+    def test_get_all_splice_days_splits_fact_at_midnight(
+        self, alchemy_store, alchemy_fact_factory,
+    ):
+        """Make sure a Fact that runs past midnight counts toward both days."""
+        alchemy_store.config['time.day_start'] = datetime.time(0, 0)
+        alchemy_fact = alchemy_fact_factory()
+        alchemy_fact.start = datetime.datetime(2020, 5, 1, 22, 0)
+        alchemy_fact.end = datetime.datetime(2020, 5, 2, 1, 0)
+        alchemy_store.session.flush()
+        results = alchemy_store.facts.get_all(
+            splice_days=True, include_stats=True, named_tuples=True, sort_cols=('day',),
+        )
+        assert [
+            (stats.start_date, stats.duration, stats.first_start, stats.final_end)
+            for stats in results
+        ] == [
+            (
+                '2020-05-01',
+                2 / 24,
+                datetime.datetime(2020, 5, 1, 22, 0),
+                datetime.datetime(2020, 5, 2, 0, 0),
+            ),
+            (
+                '2020-05-02',
+                1 / 24,
+                datetime.datetime(2020, 5, 2, 0, 0),
+                datetime.datetime(2020, 5, 2, 1, 0),
+            ),
+        ]
+
+    @pytest.mark.parametrize(
+        ('group_by', 'expect_buckets'),
+        (
+            ('group_hours', [
+                ('2020-05-31 23:00', 0.5 / 24),
+                ('2020-06-01 00:00', 1 / 24),
+                ('2020-06-01 01:00', 0.5 / 24),
+            ]),
+            ('group_weeks', [
+                ('2020-05-25', 0.5 / 24),
+                ('2020-06-01', 1.5 / 24),
+            ]),
+            ('group_months', [
+                ('2020-05-01', 0.5 / 24),
+                ('2020-06-01', 1.5 / 24),
+            ]),
+        ),
+    )
+    def test_get_all_time_buckets_splice_facts(
+        self, alchemy_store, alchemy_fact_factory, group_by, expect_buckets,
+    ):
+        # Sunday, May 31, 2020 23:30 until Monday, June 1, 2020 01:30.
+        alchemy_store.config['time.day_start'] = datetime.time(0, 0)
+        alchemy_fact = alchemy_fact_factory()
+        alchemy_fact.start = datetime.datetime(2020, 5, 31, 23, 30)
+        alchemy_fact.end = datetime.datetime(2020, 6, 1, 1, 30)
+        alchemy_store.session.flush()
+        results = alchemy_store.facts.get_all(
+            include_stats=True, named_tuples=True, sort_cols=('day',),
+            **{group_by: True}
+        )
+        assert [
+            (stats.start_date, pytest.approx(stats.duration)) for stats in results
+        ] == expect_buckets
+
+    def test_get_all_splice_days_honors_day_start(
+        self, alchemy_store, alchemy_fact_factory,
+    ):
+        alchemy_store.config['time.day_start'] = datetime.time(5, 0)
+        alchemy_fact = alchemy_fact_factory()
+        alchemy_fact.start = datetime.datetime(2020, 5, 2, 3, 0)
+        alchemy_fact.end = datetime.datetime(2020, 5, 2, 6, 0)
+        alchemy_store.session.flush()
+        results = alchemy_store.facts.get_all(
+            splice_days=True, include_stats=True, named_tuples=True, sort_cols=('day',),
+        )
+        assert [
+            (stats.start_date, pytest.approx(stats.duration)) for stats in results
+        ] == [('2020-05-01', 2 / 24), ('2020-05-02', 1 / 24)]
+
+    def test_get_all_splice_days_clips_to_since(
+        self, alchemy_store, alchemy_fact_factory,
+    ):
+        alchemy_store.config['time.day_start'] = datetime.time(0, 0)
+        alchemy_fact = alchemy_fact_factory()
+        alchemy_fact.start = datetime.datetime(2020, 5, 1, 22, 0)
+        alchemy_fact.end = datetime.datetime(2020, 5, 2, 0, 30)
+        alchemy_store.session.flush()
+        results = alchemy_store.facts.get_all(
+            splice_days=True,
+            since=datetime.datetime(2020, 5, 1, 23, 0),
+            partial=True,
+            include_stats=True,
+            named_tuples=True,
+            sort_cols=('day',),
+        )
+        assert [
+            (stats.start_date, pytest.approx(stats.duration)) for stats in results
+        ] == [('2020-05-01', 1 / 24), ('2020-05-02', 0.5 / 24)]
+
+    @pytest.mark.parametrize(
+        ('group_by'),
+        (
+            {'group_activity': True},
+            {'group_category': True},
+            {'group_activity': True, 'group_category': True},
+            {'group_tags': True},
+            {'group_days': True},
+            {'splice_days': True, 'group_category': True},
+        ),
+    )
+    def test_get_all_parallel_chunks_matches_serial(
+        self, alchemy_config, tmpdir, mocker, group_by,
+    ):
+        """Make sure the merged chunks answer the same as the one query does."""
+        # The chunks are read on other connections, so use a (committed) file store.
+        alchemy_config['db.path'] = os.path.join(tmpdir.strpath, 'parallel.sqlite')
+        store = SQLAlchemyStore(alchemy_config)
+        store.standup()
+        categories = [
+            AlchemyCategory(pk=None, name=name, deleted=False, hidden=False)
+            for name in ('cat-a', 'cat-b')
+        ]
+        activities = [
+            AlchemyActivity(
+                pk=None, name=name, category=category, deleted=False, hidden=False,
+            )
+            for name, category in (
+                ('act-a', categories[0]), ('act-b', categories[0]),
+                ('act-a', categories[1]),
+            )
+        ]
+        tags = [
+            AlchemyTag(pk=None, name=name, deleted=False, hidden=False)
+            for name in ('tag-a', 'tag-b')
+        ]
+        base = datetime.datetime(2020, 5, 1, 20, 0)
+        for idx in range(24):
+            start = base + datetime.timedelta(hours=5 * idx)
+            fact = AlchemyFact(
+                pk=None,
+                activity=activities[idx % 3],
+                start=start,
+                end=start + datetime.timedelta(hours=1 + (idx % 4)),
+                description='Fact #{}'.format(idx),
+                deleted=False,
+                split_from=None,
+            )
+            fact.tags = tags[:idx % 3]
+            store.session.add(fact)
+        store.session.commit()
+        # Skip the daily rollups, which would otherwise answer group_days.
+        store.facts._has_fact_rollups = False
+
+        # Unless grouping by day, start_date is just one of the group's Facts'.
+        n_stats = None if 'group_days' in group_by or 'splice_days' in group_by else -1
+
+        def get_all_stats(**kwargs):
+            results = store.facts.get_all(
+                include_stats=True, named_tuples=True, **group_by, **kwargs
+            )
+            return sorted([
+                (
+                    stats[1:n_stats],
+                    sorted((tag.name, tag.freq) for tag in stats.fact.tags),
+                )
+                for stats in results
+            ], key=lambda result: (result[0][2], str(result)))
+
+        fetch = mocker.spy(store.facts, 'gather_parallel_fetch')
+        parallel = get_all_stats(parallel_chunks=4)
+        assert fetch.call_count == 1
+        assert len(fetch.call_args[0][1]) == 4
+        assert parallel
+        assert parallel == get_all_stats()
+        store.session.close()
+
+    def test_get_all_parallel_chunks_skips_uncommitted(
+        self, alchemy_config, tmpdir, mocker,
+    ):
+        """Make sure the chunks are not read while the session has unseen writes."""
+        alchemy_config['db.path'] = os.path.join(tmpdir.strpath, 'parallel.sqlite')
+        store = SQLAlchemyStore(alchemy_config)
+        store.standup()
+        base = datetime.datetime(2020, 5, 1, 8, 0)
+
+        def new_facts(names, days):
+            facts = []
+            for idx, name in enumerate(names):
+                start = base + datetime.timedelta(days=days + idx)
+                end = start + datetime.timedelta(hours=1)
+                facts.append(Fact(Activity(name, category=Category('cat')), start, end))
+            return facts
+
+        def get_all_activities(**kwargs):
+            results = store.facts.get_all(
+                group_activity=True, include_stats=True, named_tuples=True, **kwargs
+            )
+            return sorted(stats.fact.activity.name for stats in results)
+
+        store.facts.add_many(new_facts(['act-a', 'act-b', 'act-c'], days=0))
+        # Flushed, but not committed, so the other connections cannot see it.
+        store.facts.add_many(new_facts(['act-d'], days=10), skip_commit=True)
+        assert not store.session.new
+        assert store.write_pending()
+        assert not store.facts.gather_parallel_store_eligible()
+        fetch = mocker.spy(store.facts, 'gather_parallel_fetch')
+        expect = ['act-a', 'act-b', 'act-c', 'act-d']
+        assert get_all_activities(parallel_chunks=4) == expect
+        assert fetch.call_count == 0
+        store.session.commit()
+        assert store.facts.gather_parallel_store_eligible()
+        assert get_all_activities(parallel_chunks=4) == expect
+        assert fetch.call_count == 1
+        store.session.close()
+
+    def test_check_rollups_and_rebuild_rollups(
+        self, alchemy_store, set_of_alchemy_facts_contiguous,
+    ):
+        """Make sure check_rollups finds a bad rollup and rebuild_rollups fixes it."""
+        alchemy_store.facts.refresh_rollups()
+        assert alchemy_store.facts.check_rollups() == []
+        alchemy_store.session.execute(
+            'UPDATE fact_rollups SET seconds = seconds + 1'
+            ' WHERE rowid = (SELECT MIN(rowid) FROM fact_rollups)'
+        )
+        mismatches = alchemy_store.facts.check_rollups()
+        assert len(mismatches) == 1
+        alchemy_store.facts.rebuild_rollups()
+        assert alchemy_store.facts.check_rollups() == []
+
+    def test_get_all_group_days_rollups_read_does_not_write(
+        self, alchemy_config, tmpdir,
+    ):
+        """Make sure a read uses the Facts, rather than refresh stale rollups."""
+        db_path = os.path.join(tmpdir.strpath, 'rollups.sqlite')
+        alchemy_config['db.path'] = db_path
+        store = SQLAlchemyStore(alchemy_config)
+        store.standup()
+        activity = Activity('act', category=Category('cat'))
+
+        def get_all_days():
+            return store.facts.get_all(
+                group_days=True, include_stats=True, named_tuples=True,
+            )
+
+        def count_dirty():
+            return store.session.execute(
+                'SELECT COUNT(*) FROM fact_rollups_dirty'
+            ).scalar()
+
+        def assert_not_locked():
+            dbapi_conn = store.session.connection().connection.connection
+            assert not dbapi_conn.in_transaction
+            other_conn = sqlite3.connect(db_path, timeout=0)
+            try:
+                other_conn.execute('BEGIN IMMEDIATE')
+                other_conn.rollback()
+            finally:
+                other_conn.close()
+
+        # The write refreshes the rollups as it commits.
+        start = datetime.datetime(2020, 5, 1, 8, 0)
+        store.facts.add_many([Fact(activity, start, start + datetime.timedelta(1))])
+        assert count_dirty() == 0
+        assert len(get_all_days()) == 1
+        # Another program adds a Fact (and leaves the rollups stale).
+        other_conn = sqlite3.connect(db_path)
+        try:
+            other_conn.execute(
+                "INSERT INTO facts (activity_id, start_time, end_time, deleted)"
+                " SELECT activity_id, '2020-05-02 08:00:00', '2020-05-02 09:00:00', 0"
+                " FROM facts"
+            )
+            other_conn.commit()
+        finally:
+            other_conn.close()
+        assert count_dirty() == 1
+        # The read answers from the Facts, and leaves the rollups be.
+        assert len(get_all_days()) == 2
+        assert_not_locked()
+        assert count_dirty() == 1
+        store.session.close()
+
     def test_get_all_group_by_tags_lazy_tags_raises(self, alchemy_store):
         with pytest.raises(Exception):
             alchemy_store.facts.get_all(group_tags=True, lazy_tags=True)
@@ -80,3 +80,11 @@ class TestAlchemyFact(object):
         fact = alchemy_fact.as_hamster(alchemy_store)
         assert fact.equal_fields(alchemy_fact)
 
+    def test_times_stored_canonical(self, alchemy_store, alchemy_fact):
+        """Make sure Fact times are stored without fractional seconds."""
+        alchemy_fact.start = alchemy_fact.start.replace(microsecond=123456)
+        alchemy_store.session.commit()
+        start_time = alchemy_store.session.execute(
+            'SELECT start_time FROM facts WHERE id = :pk', {'pk': alchemy_fact.pk},
+        ).scalar()
+        assert start_time == alchemy_fact.start.strftime('%Y-%m-%d %H:%M:%S')
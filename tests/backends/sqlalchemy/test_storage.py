@@ -17,11 +17,16 @@
 # You can find the GNU General Public License reprinted in the file titled 'LICENSE',
 # or visit <http://www.gnu.org/licenses/>.
 
+import datetime
+import os
+import sqlite3
+
 import pytest
 
-from nark.backends.sqlalchemy.objects import AlchemyCategory
+from nark.backends.sqlalchemy.objects import AlchemyCategory, fact_time_epoch
 from nark.backends.sqlalchemy.storage import SQLAlchemyStore
 from nark.config import decorate_config
+from nark.managers.query_terms import QueryTerms
 
 
 # The reason we see a great deal of count == 0 statements is to make sure that
@@ -91,3 +96,243 @@ class TestStore(object):
         alchemy_config['db.path'] = db_path_parametrized
         assert SQLAlchemyStore(alchemy_config)
 
+    def test_sqlite_pragmas_default_none(self, alchemy_config):
+        """Make sure that SQLite defaults are left alone unless configured."""
+        store = SQLAlchemyStore(alchemy_config)
+        assert store.sqlite_pragmas == {}
+
+    def test_sqlite_pragmas_profile_and_overrides(self, alchemy_config):
+        """Make sure that individual PRAGMA settings override the profile."""
+        alchemy_config['db.pragma_profile'] = 'throughput'
+        alchemy_config['db.synchronous'] = 'full'
+        store = SQLAlchemyStore(alchemy_config)
+        pragmas = store.sqlite_pragmas
+        assert pragmas['journal_mode'] == 'wal'
+        assert pragmas['synchronous'] == 'full'
+        assert pragmas['cache_size'] == '-65536'
+
+    def test_sqlite_pragmas_invalid_value(self, alchemy_config):
+        """Make sure that PRAGMA values are validated (they're not escaped)."""
+        with pytest.raises(ValueError):
+            alchemy_config['db.mmap_size'] = '0; DROP TABLE facts'
+            decorate_config(alchemy_config)
+
+    def test_sqlite_pragmas_applied_on_connect(self, alchemy_config, tmpdir):
+        """Make sure that each new connection has the configured PRAGMAs set."""
+        alchemy_config['db.path'] = os.path.join(tmpdir.strpath, 'pragmas.sqlite')
+        alchemy_config['db.pragma_profile'] = 'throughput'
+        alchemy_config['db.busy_timeout'] = '1234'
+        store = SQLAlchemyStore(alchemy_config)
+        engine = store.create_storage_engine()
+        with engine.connect() as conn:
+            assert conn.execute('PRAGMA journal_mode').scalar() == 'wal'
+            # synchronous: 0 = OFF, 1 = NORMAL, 2 = FULL, 3 = EXTRA.
+            assert conn.execute('PRAGMA synchronous').scalar() == 1
+            assert conn.execute('PRAGMA cache_size').scalar() == -65536
+            # temp_store: 0 = DEFAULT, 1 = FILE, 2 = MEMORY.
+            assert conn.execute('PRAGMA temp_store').scalar() == 2
+            assert conn.execute('PRAGMA busy_timeout').scalar() == 1234
+        engine.dispose()
+
+    # ***
+
+    def test_gather_many_results_in_order(self, alchemy_store, set_of_alchemy_facts):
+        """Make sure each request gets its own results, in order."""
+        results = alchemy_store.gather_many([
+            (alchemy_store.facts, QueryTerms(limit=2)),
+            ('activities', QueryTerms(include_stats=True)),
+            ('categories', None),
+            (alchemy_store.facts, QueryTerms(limit=2)),
+        ])
+        assert len(results) == 4
+        assert results[0] == alchemy_store.facts.get_all(limit=2)
+        assert len(results[1]) == len(set_of_alchemy_facts)
+        assert results[2] == alchemy_store.categories.get_all()
+        # The duplicate request is answered with a copy of the first's results.
+        assert results[3] == results[0]
+        assert results[3] is not results[0]
+        assert not alchemy_store.read_snapshot_active
+
+    def test_gather_many_reads_one_snapshot(self, alchemy_config, tmpdir, mocker):
+        """Make sure a write between the requests is not seen until after."""
+        alchemy_config['db.path'] = os.path.join(tmpdir.strpath, 'snapshot.sqlite')
+        # Let the other connection write while the snapshot is being read.
+        alchemy_config['db.pragma_profile'] = 'throughput'
+        store = SQLAlchemyStore(alchemy_config)
+        store.standup()
+        store.session.add(
+            AlchemyCategory(pk=None, name='cat-a', deleted=False, hidden=False)
+        )
+        store.session.commit()
+
+        get_all = store.categories.get_all
+
+        def get_all_then_write(query_terms=None, **kwargs):
+            results = get_all(query_terms, **kwargs)
+            with sqlite3.connect(alchemy_config['db.path']) as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO categories (name, deleted, hidden)"
+                    " VALUES ('cat-b', 0, 0)"
+                )
+            return results
+
+        mocker.patch.object(store.categories, 'get_all', side_effect=get_all_then_write)
+        before, during = store.gather_many([
+            ('categories', QueryTerms()),
+            ('categories', QueryTerms(sort_orders=('desc',))),
+        ])
+        after = get_all()
+        assert [category.name for category in before] == ['cat-a']
+        assert [category.name for category in during] == ['cat-a']
+        assert [category.name for category in after] == ['cat-a', 'cat-b']
+        store.session.close()
+
+    # ***
+
+    def insert_fact_rows(self, store, fact_rows):
+        """Insert the (id, start, end, deleted, split_from_id) Facts as-is."""
+        store.session.execute(
+            "INSERT INTO categories (id, name, deleted, hidden) VALUES (1, 'cat', 0, 0)"
+        )
+        store.session.execute(
+            'INSERT INTO activities (id, name, category_id, deleted, hidden)'
+            " VALUES (1, 'act', 1, 0, 0)"
+        )
+        base = datetime.datetime(2020, 1, 1, 8, 0)
+        for pk, start_mins, end_mins, deleted, split_from_id in fact_rows:
+            start = base + datetime.timedelta(minutes=start_mins)
+            end = None
+            if end_mins is not None:
+                end = base + datetime.timedelta(minutes=end_mins)
+            store.session.execute(
+                'INSERT INTO facts'
+                ' (id, start_time, end_time, start_epoch, end_epoch,'
+                '  activity_id, deleted, split_from_id)'
+                ' VALUES (:id, :start, :end, :start_epoch, :end_epoch,'
+                '  1, :deleted, :split_from_id)',
+                {
+                    'id': pk,
+                    'start': start,
+                    'end': end,
+                    'start_epoch': fact_time_epoch(start),
+                    'end_epoch': end and fact_time_epoch(end),
+                    'deleted': deleted,
+                    'split_from_id': split_from_id,
+                },
+            )
+        store.session.commit()
+
+    def test_check_integrity_clean(self, alchemy_store, set_of_alchemy_facts):
+        """Make sure a store of well-behaved Facts has no issues."""
+        assert list(alchemy_store.check_integrity()) == []
+
+    def test_check_integrity_issues(self, alchemy_store):
+        """Make sure each kind of problem is found, and only those."""
+        self.insert_fact_rows(alchemy_store, (
+            # A Fact that's fine, and one that overlaps it and the next.
+            (1, 0, 60, False, None),
+            (2, 30, 100, False, None),
+            (3, 90, 120, False, None),
+            # Facts contained wholly within another, one ending before the next,
+            # and the last overlapping two earlier Facts.
+            (4, 200, 300, False, None),
+            (5, 210, 220, False, None),
+            (10, 240, 270, False, None),
+            (11, 250, 260, False, None),
+            # A deleted Fact that overlaps, and a Fact split from it, which doesn't.
+            (6, 400, 500, True, None),
+            (7, 400, 450, False, 6),
+            # Two active Facts, the latter split from a Fact that's not deleted.
+            (8, 600, None, False, None),
+            (9, 700, None, False, 3),
+        ))
+        session = alchemy_store.session
+        session.execute('INSERT INTO fact_tags (fact_id, tag_id) VALUES (1, 99)')
+        session.execute(
+            'INSERT INTO activities (id, name, category_id, deleted, hidden)'
+            " VALUES (2, 'lost', 99, 0, 0)"
+        )
+        session.commit()
+
+        issues = list(alchemy_store.check_integrity())
+        assert [(issue.kind, issue.pks) for issue in issues] == [
+            ('overlap', (1, 2)),
+            ('overlap', (2, 3)),
+            ('overlap', (4, 5)),
+            ('overlap', (4, 10)),
+            ('overlap', (4, 11)),
+            ('overlap', (10, 11)),
+            ('overlap', (8, 9)),
+            ('endless', (8, 9)),
+            ('orphan_fact_tag', (1, 99)),
+            ('orphan_activity', (2, 99)),
+            ('split_from', (9, 3)),
+        ]
+        assert 'not deleted' in issues[-1].message
+
+    def test_check_integrity_parallel_chunks(self, alchemy_config, tmpdir, mocker):
+        """Make sure the chunked overlap check finds what the single sweep does."""
+        alchemy_config['db.path'] = os.path.join(tmpdir.strpath, 'integrity.sqlite')
+        store = SQLAlchemyStore(alchemy_config)
+        store.standup()
+        # Facts that straddle the chunk bounds, with an overlap every so often.
+        self.insert_fact_rows(store, [
+            (pk, pk * 50, pk * 50 + (70 if pk % 5 else 45), False, None)
+            for pk in range(1, 41)
+        ])
+        expect = [issue.pks for issue in store.check_integrity()]
+        assert expect
+        fetch = mocker.spy(store.facts, 'gather_parallel_fetch')
+        assert [
+            issue.pks for issue in store.check_integrity(parallel_chunks=4)
+        ] == expect
+        assert len(fetch.call_args[0][1]) == 4
+        store.session.close()
+
+    # ***
+
+    def test_changes_since_fact_edit(self, alchemy_store, alchemy_fact):
+        """Make sure editing a Fact logs the old version deleted, and the new one."""
+        revision = alchemy_store.revision
+        fact = alchemy_fact.as_hamster(alchemy_store)
+        fact.description = 'edited'
+        new_fact = alchemy_store.facts.save(fact)
+        assert alchemy_store.revision > revision
+        changes = list(alchemy_store.changes_since(revision))
+        assert [change[1:] for change in changes] == [
+            ('facts', fact.pk, 'delete'),
+            ('facts', new_fact.pk, 'insert'),
+        ]
+        assert changes[-1].revision == alchemy_store.revision
+        # Uncompacted, the new Fact's Tags are logged as changes, too.
+        every_change = list(alchemy_store.changes_since(revision, compact=False))
+        assert len(every_change) > len(changes)
+        # And there's nothing new since the latest change.
+        assert list(alchemy_store.changes_since(alchemy_store.revision)) == []
+
+    def test_changes_since_items(self, alchemy_store, alchemy_category_factory):
+        """Make sure the other items' writes are logged, and read in batches."""
+        categories = [alchemy_category_factory() for idx in range(3)]
+        revision = alchemy_store.revision
+        category = categories[1].as_hamster(alchemy_store)
+        category.name = 'renamed'
+        alchemy_store.categories.save(category)
+        alchemy_store.categories.remove(categories[2].as_hamster(alchemy_store))
+        changes = list(alchemy_store.change_log.changes_since(revision, batch_size=1))
+        assert [change[1:] for change in changes] == [
+            ('categories', categories[1].pk, 'update'),
+            ('categories', categories[2].pk, 'delete'),
+        ]
+
+    def test_changes_prune(self, alchemy_store, alchemy_category_factory):
+        """Make sure pruning the log does not reset the revision."""
+        alchemy_category_factory()
+        revision = alchemy_store.revision
+        alchemy_store.change_log.prune(revision)
+        assert alchemy_store.revision == revision
+        assert alchemy_store.change_log.oldest_revision == revision
+        assert list(alchemy_store.changes_since()) == []
+        category = alchemy_category_factory()
+        assert list(alchemy_store.changes_since()) == [
+            (revision + 1, 'categories', category.pk, 'insert'),
+        ]
@@ -0,0 +1,124 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark importing Facts with add_many versus adding each Fact with _add.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_add_many [num_facts] [num_slow]
+
+This creates a new SQLite database file, and adds ``num_facts`` Facts, one
+after another, each with one of 50 Activities (in 10 Categories) and a few
+of 100 Tags, using ``FactManager.add_many``. Then it adds ``num_slow`` more
+Facts into another new database one at a time with ``FactManager._add``, and
+extrapolates the time to add ``num_facts`` that way. It also counts the SQL
+statements that each approach runs, per Fact.
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import decorate_config
+from nark.items.activity import Activity
+from nark.items.category import Category
+from nark.items.fact import Fact
+from nark.items.tag import Tag
+
+
+def build_facts(num_facts):
+    base = datetime.datetime(2000, 1, 1, 8, 0)
+    facts = []
+    for idx in range(num_facts):
+        start = base + datetime.timedelta(hours=idx)
+        activity = Activity(
+            'act-{}'.format(idx % 50), category=Category('cat-{}'.format(idx % 10)),
+        )
+        tags = [Tag('tag-{}'.format((idx * step) % 100)) for step in (1, 7, 13)]
+        facts.append(Fact(
+            activity, start, start + datetime.timedelta(minutes=45), tags=tags,
+        ))
+    return facts
+
+
+def new_store(tmpdir, name):
+    config = decorate_config({
+        'db': {
+            'orm': 'sqlalchemy',
+            'engine': 'sqlite',
+            'path': os.path.join(tmpdir, name),
+        },
+    })
+    store = SQLAlchemyStore(config)
+    store.standup()
+    return store
+
+
+def time_and_count(store, func):
+    statements = []
+
+    def count_statement(*args, **kwargs):
+        statements.append(1)
+
+    engine = store.session.get_bind()
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    began = time.time()
+    func()
+    secs = time.time() - began
+    event.remove(engine, 'before_cursor_execute', count_statement)
+    return secs, len(statements)
+
+
+def main(argv):
+    num_facts = int(argv[1]) if len(argv) > 1 else 100000
+    num_slow = int(argv[2]) if len(argv) > 2 else 1000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print('{:<12} {:>8} {:>12} {:>12} {:>14}'.format(
+            'method', 'facts', 'seconds', 'stmts/fact', 'est. seconds',
+        ))
+
+        store = new_store(tmpdir, 'bench-add-many.sqlite')
+        facts = build_facts(num_facts)
+        secs, num_stmts = time_and_count(store, lambda: store.facts.add_many(facts))
+        print('{:<12} {:>8} {:>12.3f} {:>12.2f} {:>14.3f}'.format(
+            'add_many', num_facts, secs, num_stmts / num_facts, secs,
+        ))
+        store.session.close()
+
+        store = new_store(tmpdir, 'bench-add.sqlite')
+        facts = build_facts(num_slow)
+
+        def add_each():
+            for fact in facts:
+                store.facts._add(fact)
+
+        secs, num_stmts = time_and_count(store, add_each)
+        print('{:<12} {:>8} {:>12.3f} {:>12.2f} {:>14.3f}'.format(
+            '_add', num_slow, secs, num_stmts / num_slow, secs * num_facts / num_slow,
+        ))
+        store.session.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,168 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark Fact hydration throughput and memory, ORM (as_hamster) versus bulk
+(Core rows), and shared (interned) versus private Activity, Category, and Tags.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_bulk_hydrate [num_facts] [num_runs]
+
+This creates a new SQLite database file, inserts ``num_facts`` Facts (with
+two Tags each) directly via SQL (saving them one at a time through the store
+would take far longer than the benchmark itself), and then times ``get_all``
+fetching all Facts, with and without ``bulk_hydrate`` and ``private_items``
+(and with ``batch_tags``), ``num_runs`` times each (a new session each run, so
+no run benefits from the last one's identity map). Then it fetches all Facts
+once more for each mode with ``tracemalloc`` running, and reports the memory
+held by the results, and the peak memory used while fetching them.
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import decorate_config
+
+
+def populate_store(store, num_facts):
+    session = store.session
+    session.execute(
+        'INSERT INTO categories (id, name, deleted, hidden) VALUES (:pk, :name, 0, 0)',
+        [{'pk': idx + 1, 'name': 'category-{}'.format(idx)} for idx in range(5)],
+    )
+    session.execute(
+        'INSERT INTO activities (id, name, category_id, deleted, hidden)'
+        ' VALUES (:pk, :name, :category_id, 0, 0)',
+        [
+            {
+                'pk': idx + 1,
+                'name': 'activity-{}'.format(idx),
+                'category_id': (idx % 5) + 1,
+            }
+            for idx in range(20)
+        ],
+    )
+    session.execute(
+        'INSERT INTO tags (id, name, deleted, hidden) VALUES (:pk, :name, 0, 0)',
+        [{'pk': idx + 1, 'name': 'tag-{}'.format(idx)} for idx in range(10)],
+    )
+
+    base = datetime.datetime(2000, 1, 1)
+    time_fmt = '%Y-%m-%d %H:%M:%S'
+    fact_rows = []
+    tag_rows = []
+    for idx in range(num_facts):
+        start = base + datetime.timedelta(minutes=30 * idx)
+        end = start + datetime.timedelta(minutes=30)
+        fact_rows.append({
+            'pk': idx + 1,
+            'start': start.strftime(time_fmt),
+            'end': end.strftime(time_fmt),
+            'start_epoch': int(start.timestamp()),
+            'end_epoch': int(end.timestamp()),
+            'activity_id': (idx % 20) + 1,
+            'description': 'Fact #{}'.format(idx),
+        })
+        tag_rows.append({'fact_id': idx + 1, 'tag_id': (idx % 10) + 1})
+        tag_rows.append({'fact_id': idx + 1, 'tag_id': ((idx + 5) % 10) + 1})
+    session.execute(
+        'INSERT INTO facts'
+        ' (id, deleted, start_time, end_time, start_epoch, end_epoch,'
+        '  activity_id, description)'
+        ' VALUES (:pk, 0, :start, :end, :start_epoch, :end_epoch,'
+        '  :activity_id, :description)',
+        fact_rows,
+    )
+    session.execute(
+        'INSERT INTO fact_tags (fact_id, tag_id) VALUES (:fact_id, :tag_id)',
+        tag_rows,
+    )
+    session.commit()
+
+
+def time_get_all(store, num_runs, **kwargs):
+    best_secs = None
+    for _run in range(num_runs):
+        store.session.expunge_all()
+        began = time.time()
+        results = store.facts.get_all(**kwargs)
+        secs = time.time() - began
+        if best_secs is None or secs < best_secs:
+            best_secs = secs
+    return best_secs, len(results)
+
+
+def measure_get_all(store, **kwargs):
+    store.session.expunge_all()
+    tracemalloc.start()
+    results = store.facts.get_all(**kwargs)
+    held_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return held_bytes, peak_bytes
+
+
+def main(argv):
+    num_facts = int(argv[1]) if len(argv) > 1 else 100000
+    num_runs = int(argv[2]) if len(argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = decorate_config({
+            'db': {
+                'orm': 'sqlalchemy',
+                'engine': 'sqlite',
+                'path': os.path.join(tmpdir, 'bench-hydrate.sqlite'),
+            },
+        })
+        store = SQLAlchemyStore(config)
+        store.standup()
+        populate_store(store, num_facts)
+
+        modes = (
+            ('orm', {'private_items': True}),
+            ('orm-shared', {}),
+            ('bulk', {'bulk_hydrate': True, 'private_items': True}),
+            ('bulk-shared', {'bulk_hydrate': True}),
+            ('batch-tags', {'bulk_hydrate': True, 'batch_tags': True}),
+        )
+
+        print('{:<12} {:>12} {:>12} {:>12} {:>12}'.format(
+            'mode', 'seconds', 'rows/sec', 'held MiB', 'peak MiB',
+        ))
+        for mode, kwargs in modes:
+            secs, num_rows = time_get_all(store, num_runs, **kwargs)
+            assert num_rows == num_facts
+            held_bytes, peak_bytes = measure_get_all(store, **kwargs)
+            print('{:<12} {:>12.3f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+                mode,
+                secs,
+                num_rows / secs,
+                held_bytes / (1024 * 1024),
+                peak_bytes / (1024 * 1024),
+            ))
+
+        store.session.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
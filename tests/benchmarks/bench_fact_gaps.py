@@ -0,0 +1,145 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark finding the gaps between Facts, one query versus walking the Facts.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_fact_gaps [num_years] [num_runs]
+
+This creates a new SQLite database file with ``num_years`` of Facts, eight
+each day, with a 15-minute gap between most of them, and a longer gap every
+so often. Then it times ``FactManager.gaps`` over the final month, the final
+year, and all the years, ``num_runs`` times each, and compares it to walking
+the final month's Facts with ``subsequent``, as a client would otherwise
+(which is far too slow to walk the years).
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from nark.backends.sqlalchemy.objects import fact_time_epoch
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import decorate_config
+
+
+def populate_store(store, num_years):
+    session = store.session
+    session.execute(
+        "INSERT INTO categories (id, name, deleted, hidden) VALUES (1, 'cat', 0, 0)"
+    )
+    session.execute(
+        'INSERT INTO activities (id, name, category_id, deleted, hidden)'
+        " VALUES (1, 'act', 1, 0, 0)"
+    )
+    base = datetime.datetime(2000, 1, 1, 8, 0)
+    time_fmt = '%Y-%m-%d %H:%M:%S'
+    fact_rows = []
+    for day in range(num_years * 365):
+        start = base + datetime.timedelta(days=day)
+        for idx in range(8):
+            end = start + datetime.timedelta(minutes=45)
+            fact_rows.append({
+                'start': start.strftime(time_fmt),
+                'end': end.strftime(time_fmt),
+                'start_epoch': fact_time_epoch(start),
+                'end_epoch': fact_time_epoch(end),
+            })
+            # Every so often, a longer break.
+            gap_mins = 15 if (day + idx) % 7 else 75
+            start = end + datetime.timedelta(minutes=gap_mins)
+    session.execute(
+        'INSERT INTO facts'
+        ' (deleted, start_time, end_time, start_epoch, end_epoch, activity_id)'
+        ' VALUES (0, :start, :end, :start_epoch, :end_epoch, 1)',
+        fact_rows,
+    )
+    session.commit()
+    return len(fact_rows), base + datetime.timedelta(days=num_years * 365)
+
+
+def time_best(num_runs, func):
+    best_secs = None
+    for _run in range(num_runs):
+        began = time.time()
+        count = func()
+        secs = time.time() - began
+        if best_secs is None or secs < best_secs:
+            best_secs = secs
+    return best_secs, count
+
+
+def walk_gaps(store, since, until, min_gap):
+    # The client-side approach: step from Fact to Fact, comparing the times.
+    count = 0
+    fact = store.facts.subsequent(ref_time=since)
+    while fact is not None and fact.start < until:
+        following = store.facts.subsequent(fact=fact)
+        if following is None:
+            break
+        if following.start - fact.end >= min_gap:
+            count += 1
+        fact = following
+    return count
+
+
+def main(argv):
+    num_years = int(argv[1]) if len(argv) > 1 else 5
+    num_runs = int(argv[2]) if len(argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = decorate_config({
+            'db': {
+                'orm': 'sqlalchemy',
+                'engine': 'sqlite',
+                'path': os.path.join(tmpdir, 'bench-gaps.sqlite'),
+            },
+        })
+        store = SQLAlchemyStore(config)
+        store.standup()
+        num_facts, until = populate_store(store, num_years)
+        min_gap = datetime.timedelta(minutes=30)
+
+        print('Facts: {}'.format(num_facts))
+        print('{:<24} {:>12} {:>12}'.format('method', 'seconds', 'gaps'))
+        windows = (
+            ('month', until - datetime.timedelta(days=30)),
+            ('year', until - datetime.timedelta(days=365)),
+            ('all', None),
+        )
+        for window, since in windows:
+            secs, count = time_best(num_runs, lambda: len(list(
+                store.facts.gaps(since=since, until=until, min_gap=min_gap)
+            )))
+            print('{:<24} {:>12.3f} {:>12}'.format(
+                'gaps ({})'.format(window), secs, count,
+            ))
+        since = until - datetime.timedelta(days=30)
+        secs, count = time_best(
+            num_runs, lambda: walk_gaps(store, since, until, min_gap),
+        )
+        print('{:<24} {:>12.3f} {:>12}'.format('subsequent (month)', secs, count))
+
+        store.session.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
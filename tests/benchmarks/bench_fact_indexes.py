@@ -0,0 +1,239 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark the Fact lookups with and without the Fact indexes, as the store grows.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_fact_indexes [max_facts] [num_runs]
+
+For 10K Facts, then 100K, and so on up to ``max_facts`` (1M by default), this
+creates a new SQLite database file with that many Facts, eight each day, the
+last of which is active. Then it times (the best of ``num_runs``) each lookup:
+the active Fact (``get_current_fact``, and the OR query that ``endless`` used
+to run); and, at a time in the middle of the store, ``antecedent``,
+``subsequent``, ``surrounding``, the overlap check that saving a Fact runs
+(``_timeframe_available_for_fact``), and the Facts of a day and of a week.
+Then it drops the Fact indexes (see FACT_INDEXES), and times the lookups
+again, as the store was before them. With the indexes, the times hold steady
+as the store grows; without, most grow with it. (The lookups that use the
+R*Tree, e.g., ``surrounding``, hold steady either way.)
+
+It also prints the query plan of each lookup's SQL, with and without the
+indexes, for the largest store (or for every store, with ``--plans``).
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import and_, event, or_
+
+from nark.backends.sqlalchemy.objects import AlchemyFact, fact_time_epoch
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import decorate_config
+from nark.items.activity import Activity
+from nark.items.fact import Fact
+
+# The indexes the lookups rely on, which 'before' runs without.
+FACT_INDEXES = (
+    'ix_facts_active',
+    'ix_facts_deleted_start_time_end_time',
+    'ix_facts_deleted_end_time_start_time',
+    'ix_facts_activity_id_start_time',
+    'ix_fact_tags_fact_id_tag_id',
+    'ix_fact_tags_tag_id_fact_id',
+)
+
+
+def populate_store(store, num_facts):
+    session = store.session
+    session.execute(
+        "INSERT INTO categories (id, name, deleted, hidden) VALUES (1, 'cat', 0, 0)"
+    )
+    session.execute(
+        'INSERT INTO activities (id, name, category_id, deleted, hidden)'
+        " VALUES (1, 'act', 1, 0, 0)"
+    )
+    base = datetime.datetime(2000, 1, 1, 8, 0)
+    time_fmt = '%Y-%m-%d %H:%M:%S'
+    fact_rows = []
+    for idx in range(num_facts):
+        day, nth = divmod(idx, 8)
+        start = base + datetime.timedelta(days=day, hours=nth)
+        end = start + datetime.timedelta(minutes=45)
+        if idx == num_facts - 1:
+            end = None
+        fact_rows.append({
+            'start': start.strftime(time_fmt),
+            'end': end and end.strftime(time_fmt),
+            'start_epoch': fact_time_epoch(start),
+            'end_epoch': fact_time_epoch(end),
+        })
+        if len(fact_rows) == 10000:
+            insert_facts(session, fact_rows)
+            fact_rows = []
+    insert_facts(session, fact_rows)
+    session.commit()
+    session.execute('ANALYZE')
+    session.commit()
+    return base + datetime.timedelta(days=num_facts // 8 // 2, hours=-4)
+
+
+def insert_facts(session, fact_rows):
+    if not fact_rows:
+        return
+    session.execute(
+        'INSERT INTO facts'
+        ' (deleted, start_time, end_time, start_epoch, end_epoch, activity_id)'
+        ' VALUES (0, :start, :end, :start_epoch, :end_epoch, 1)',
+        fact_rows,
+    )
+
+
+def endless_or(store):
+    # The query endless() ran before the active Fact index, OR-ing its terms.
+    return store.session.query(AlchemyFact).filter(and_(
+        or_(AlchemyFact.start == None, AlchemyFact.end == None),  # noqa: E711
+        AlchemyFact.deleted == False,  # noqa: E712
+    )).all()
+
+
+def lookups(store, mid):
+    new_fact = Fact(Activity('act'), mid, mid + datetime.timedelta(minutes=30))
+    return (
+        ('get_current_fact', lambda: store.facts.get_current_fact()),
+        ('endless (as OR)', lambda: endless_or(store)),
+        ('antecedent', lambda: store.facts.antecedent(ref_time=mid)),
+        ('subsequent', lambda: store.facts.subsequent(ref_time=mid)),
+        ('surrounding', lambda: store.facts.surrounding(fact_time=mid)),
+        ('timeframe_available', lambda: (
+            store.facts._timeframe_available_for_fact(new_fact)
+        )),
+        ('strictly_during (day)', lambda: store.facts.strictly_during(
+            mid, mid + datetime.timedelta(days=1),
+        )),
+        ('get_all (week)', lambda: store.facts.get_all(
+            since=mid, until=mid + datetime.timedelta(days=7),
+        )),
+    )
+
+
+def time_best(num_runs, func):
+    best_secs = None
+    for _run in range(num_runs):
+        began = time.time()
+        func()
+        secs = time.time() - began
+        if best_secs is None or secs < best_secs:
+            best_secs = secs
+    return best_secs
+
+
+def query_plans(store, func):
+    # Capture the SELECTs that the lookup runs, and explain each.
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith('SELECT') and 'facts' in statement:
+            statements.append((statement, parameters))
+
+    engine = store.session.get_bind()
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    dbapi_conn = store.session.connection().connection.connection
+    plans = []
+    for statement, parameters in statements:
+        rows = dbapi_conn.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        plans.append([row[-1] for row in rows])
+    return plans
+
+
+def print_plans(label, plans):
+    print('  {}:'.format(label))
+    for plan in plans:
+        for detail in plan:
+            print('    {}'.format(detail))
+
+
+def bench_store(tmpdir, num_facts, num_runs, show_plans):
+    config = decorate_config({
+        'db': {
+            'orm': 'sqlalchemy',
+            'engine': 'sqlite',
+            'path': os.path.join(tmpdir, 'bench-indexes-{}.sqlite'.format(num_facts)),
+        },
+    })
+    store = SQLAlchemyStore(config)
+    store.standup()
+    mid = populate_store(store, num_facts)
+    store_lookups = lookups(store, mid)
+
+    after = {}
+    after_plans = {}
+    for name, func in store_lookups:
+        after[name] = time_best(num_runs, func)
+        if show_plans:
+            after_plans[name] = query_plans(store, func)
+
+    for index_name in FACT_INDEXES:
+        store.session.execute('DROP INDEX {}'.format(index_name))
+    store.session.commit()
+
+    print('Facts: {}'.format(num_facts))
+    print('{:<24} {:>12} {:>12}'.format('lookup (ms)', 'before', 'after'))
+    for name, func in store_lookups:
+        before = time_best(num_runs, func)
+        print('{:<24} {:>12.2f} {:>12.2f}'.format(
+            name, before * 1000, after[name] * 1000,
+        ))
+        if show_plans:
+            print_plans('before', query_plans(store, func))
+            print_plans('after', after_plans[name])
+    print()
+
+    store.session.close()
+    os.unlink(config['db.path'])
+
+
+def main(argv):
+    show_plans = '--plans' in argv
+    args = [arg for arg in argv[1:] if arg != '--plans']
+    max_facts = int(args[0]) if len(args) > 0 else 1000000
+    num_runs = int(args[1]) if len(args) > 1 else 20
+    sizes = []
+    num_facts = 10000
+    while num_facts < max_facts:
+        sizes.append(num_facts)
+        num_facts *= 10
+    sizes.append(max_facts)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for num_facts in sizes:
+            bench_store(
+                tmpdir, num_facts, num_runs, show_plans or num_facts == max_facts,
+            )
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,85 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark grouped Fact reports, run as one query versus as parallel time chunks.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_parallel_gather [num_facts] [num_runs]
+
+This creates a new SQLite database file with ``num_facts`` Facts (see
+bench_bulk_hydrate.populate_store), and then times ``get_all`` grouping all
+the Facts by Activity and Tags, and by Category and (spliced) day, with
+``parallel_chunks`` of 0 (the one query), 2, 4, and 8, ``num_runs`` times
+each. (The chunks run on as many threads as there are CPUs, so there's no
+speedup to expect on a single-CPU machine.)
+"""
+
+import os
+import sys
+import tempfile
+
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import decorate_config
+
+from .bench_bulk_hydrate import populate_store, time_get_all
+
+
+def main(argv):
+    num_facts = int(argv[1]) if len(argv) > 1 else 100000
+    num_runs = int(argv[2]) if len(argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = decorate_config({
+            'db': {
+                'orm': 'sqlalchemy',
+                'engine': 'sqlite',
+                'path': os.path.join(tmpdir, 'bench-parallel.sqlite'),
+            },
+        })
+        store = SQLAlchemyStore(config)
+        store.standup()
+        populate_store(store, num_facts)
+
+        reports = (
+            ('act-tags', {'group_activity': True, 'group_tags': True}),
+            ('cat-days', {'group_category': True, 'splice_days': True}),
+        )
+
+        print('CPUs: {}'.format(os.cpu_count()))
+        print('{:<12} {:>8} {:>12} {:>12}'.format(
+            'report', 'chunks', 'seconds', 'groups',
+        ))
+        for report, kwargs in reports:
+            for parallel_chunks in (0, 2, 4, 8):
+                secs, num_groups = time_get_all(
+                    store,
+                    num_runs,
+                    include_stats=True,
+                    parallel_chunks=parallel_chunks,
+                    **kwargs
+                )
+                print('{:<12} {:>8} {:>12.3f} {:>12}'.format(
+                    report, parallel_chunks, secs, num_groups,
+                ))
+
+        store.session.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,126 @@
+# This file exists within 'nark':
+#
+#   https://github.com/tallybark/nark
+#
+# Copyright © 2018-2020 Landon Bouma
+# All  rights  reserved.
+#
+# 'nark' is free software: you can redistribute it and/or modify it under the terms
+# of the GNU General Public License  as  published by the Free Software Foundation,
+# either version 3  of the License,  or  (at your option)  any   later    version.
+#
+# 'nark' is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY  or  FITNESS FOR A PARTICULAR
+# PURPOSE.  See  the  GNU General Public License  for  more details.
+#
+# You can find the GNU General Public License reprinted in the file titled 'LICENSE',
+# or visit <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark Fact write and read throughput under each SQLite PRAGMA profile.
+
+Run from the project root, e.g.,
+
+    python -m tests.benchmarks.bench_sqlite_pragmas [num_facts] [num_reads]
+
+For each ``db.pragma_profile`` (see ``SQLITE_PRAGMA_PROFILES``), this creates
+a new SQLite database file, saves ``num_facts`` Facts one at a time (each its
+own commit, like ``dob`` does); then commits ``num_facts`` single-row updates
+(which isolates the journal and fsync costs from the ORM and validation costs
+of saving a Fact); and then runs ``num_reads`` ``get_all`` queries.
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from nark.backends.sqlalchemy.storage import SQLAlchemyStore
+from nark.config import SQLITE_PRAGMA_PROFILES, decorate_config
+from nark.items.activity import Activity
+from nark.items.category import Category
+from nark.items.fact import Fact
+from nark.items.tag import Tag
+
+
+def benchmark_profile(profile, db_path, num_facts, num_reads):
+    config = decorate_config({
+        'db': {
+            'orm': 'sqlalchemy',
+            'engine': 'sqlite',
+            'path': db_path,
+            'pragma_profile': profile,
+        },
+    })
+    store = SQLAlchemyStore(config)
+    store.standup()
+
+    categories = [Category(name='category-{}'.format(idx)) for idx in range(5)]
+    activities = [
+        Activity(name='activity-{}'.format(idx), category=categories[idx % 5])
+        for idx in range(20)
+    ]
+    tags = [Tag(name='tag-{}'.format(idx)) for idx in range(10)]
+
+    start = datetime.datetime(2020, 1, 1)
+    write_began = time.time()
+    for idx in range(num_facts):
+        end = start + datetime.timedelta(minutes=30)
+        fact = Fact(
+            activity=activities[idx % 20],
+            start=start,
+            end=end,
+            description='Fact #{}'.format(idx),
+            tags=[tags[idx % 10], tags[(idx * 7) % 10]],
+        )
+        store.facts.save(fact)
+        start = end
+    write_secs = time.time() - write_began
+
+    commit_began = time.time()
+    for idx in range(num_facts):
+        store.session.execute(
+            'UPDATE facts SET description = :description WHERE id = :pk',
+            {'description': 'Fact #{} (edited)'.format(idx), 'pk': idx + 1},
+        )
+        store.session.commit()
+    commit_secs = time.time() - commit_began
+
+    read_began = time.time()
+    for idx in range(num_reads):
+        store.facts.get_all(
+            since=datetime.datetime(2020, 1, 1) + datetime.timedelta(hours=idx),
+            until=start,
+            group_activity=True,
+            include_stats=True,
+        )
+    read_secs = time.time() - read_began
+
+    store.session.close()
+    return write_secs, commit_secs, read_secs
+
+
+def main(argv):
+    num_facts = int(argv[1]) if len(argv) > 1 else 2000
+    num_reads = int(argv[2]) if len(argv) > 2 else 50
+    print('{:<12} {:>12} {:>12} {:>12}'.format(
+        'profile', 'saves/sec', 'commits/sec', 'reads/sec',
+    ))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in sorted(SQLITE_PRAGMA_PROFILES):
+            db_name = 'bench-{}.sqlite'.format(profile or 'default')
+            db_path = os.path.join(tmpdir, db_name)
+            write_secs, commit_secs, read_secs = benchmark_profile(
+                profile, db_path, num_facts, num_reads,
+            )
+            print('{:<12} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+                profile or "''",
+                num_facts / write_secs,
+                num_facts / commit_secs,
+                num_reads / read_secs,
+            ))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -71,6 +71,15 @@ def configobj_instance(request):
             'name': 'hamster',
             'user': 'hamster',
             'password': 'hamster',
+            'pragma_profile': '',
+            'journal_mode': '',
+            'synchronous': '',
+            'cache_size': '',
+            'mmap_size': '',
+            'temp_store': '',
+            'busy_timeout': '',
+            'result_cache_size': 0,
+            'result_cache_rows': 10000,
         },
         'dev': {
             # Devmode catch_errors could be deadly under test, as it sets a trace trap.
@@ -427,6 +427,15 @@ class TestFact(object):
         new_fact = fact.copy(include_pk=True)
         assert new_fact == fact
 
+    def test_unshare_items(self, fact):
+        new_fact = fact.copy(include_pk=True)
+        new_fact.unshare_items()
+        assert new_fact == fact
+        assert new_fact.activity is not fact.activity
+        assert new_fact.category is not fact.category
+        new_fact.activity.name = 'foo'
+        assert fact.activity.name != 'foo'
+
     def test_as_tuple_include_pk(self, fact):
         """Make sure that conversion to a tuple matches our expectations."""
         assert fact.as_tuple() == (
@@ -62,6 +62,10 @@ class TestFactManager:
         with pytest.raises(NotImplementedError):
             basestore.facts._add(fact)
 
+    def test_add_many_not_implemented(self, basestore):
+        with pytest.raises(NotImplementedError):
+            basestore.facts.add_many([])
+
     def test_update_not_implemented(self, basestore, fact):
         with pytest.raises(NotImplementedError):
             basestore.facts._update(fact)
@@ -438,6 +442,14 @@ class TestFactManager:
         with pytest.raises(NotImplementedError):
             basestore.facts.subsequent()
 
+    def test_neighbors_not_implemented(self, basestore):
+        with pytest.raises(NotImplementedError):
+            basestore.facts.neighbors()
+
+    def test_gaps_not_implemented(self, basestore):
+        with pytest.raises(NotImplementedError):
+            basestore.facts.gaps()
+
     def test_strictly_during_not_implemented(self, basestore):
         with pytest.raises(NotImplementedError):
             basestore.facts.strictly_during(start=None, end=None)